@@ -0,0 +1,316 @@
+"""
+Python scripts to simulate the game "The Resistance: Coup designed by Rikki Tahta
+The purpose of this project is to model human personalities and predict/score
+behaviors and bluffs in order to win the game.
+
+One-way ANOVA and Tukey HSD from running aggregates.  Each group keeps
+only its count, mean and sum of squared deviations (Welford's update),
+which is all either test needs, so a study can take samples for days in
+constant memory and report at any point along the way.
+
+"""
+
+__author__ = "William Dizon"
+__license__ = "GNU GPL v3.0"
+__version__ = "0.0.1"
+__email__ = "wdchromium@gmail.com"
+
+class Running_Mean(object):
+    """count, mean and sum of squared deviations (m2) of the samples added so far"""
+    __slots__ = ('count', 'mean', 'm2')
+
+    def __init__(self, count=0, mean=0.0, m2=0.0):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / float(self.count)
+        self.m2 += delta * (value - self.mean)
+
+    def merge(self, other):
+        if other.count:
+            count = self.count + other.count
+            delta = other.mean - self.mean
+            self.mean += delta * other.count / float(count)
+            self.m2 += other.m2 + delta * delta * self.count * other.count / float(count)
+            self.count = count
+        return self
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else float('nan')
+
+    def __getstate__(self):
+        return (self.count, self.mean, self.m2)
+
+    def __setstate__(self, state):
+        self.count, self.mean, self.m2 = state
+
+    def __repr__(self):
+        return 'Running_Mean({0}, {1}, {2})'.format(self.count, self.mean, self.m2)
+
+def _incomplete_beta(x, a, b):
+    """regularized incomplete beta I_x(a, b), by continued fraction"""
+    from math import exp, log, lgamma
+
+    if x <= 0.0:
+        return 0.0
+    elif x >= 1.0:
+        return 1.0
+    elif x > (a + 1.0) / (a + b + 2.0):
+        return 1.0 - _incomplete_beta(1.0 - x, b, a)
+
+    front = exp(lgamma(a + b) - lgamma(a) - lgamma(b) + a * log(x) + b * log(1.0 - x)) / a
+    tiny = 1e-300
+    c, d = 1.0, 1.0 - (a + b) * x / (a + 1.0)
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    fraction = d
+    for m in range(1, 500):
+        for numerator in (m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+                          -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1))):
+            d = 1.0 + numerator * d
+            d = 1.0 / (d if abs(d) > tiny else tiny)
+            c = 1.0 + numerator / c
+            c = c if abs(c) > tiny else tiny
+            fraction *= c * d
+        if abs(c * d - 1.0) < 1e-15:
+            break
+    return front * fraction
+
+def f_sf(f, dfn, dfd):
+    """P(F > f) for the F distribution with dfn and dfd degrees of freedom"""
+    if f != f:
+        return float('nan')
+    elif f <= 0:
+        return 1.0
+    return _incomplete_beta(dfd / (dfd + dfn * f), dfd / 2.0, dfn / 2.0)
+
+def _normal_cdf(x):
+    """standard normal cdf of an array, from the Numerical Recipes erfc (error < 1.2e-7)"""
+    import numpy as np
+
+    z = np.abs(x) / np.sqrt(2.0)
+    t = 1.0 / (1.0 + .5 * z)
+    erfc = t * np.exp(-z * z - 1.26551223 + t * (1.00002368 + t * (.37409196 + t * (.09678418 +
+           t * (-.18628806 + t * (.27886807 + t * (-1.13520398 + t * (1.48851587 +
+           t * (-.82215223 + t * .17087277)))))))))
+    return np.where(x >= 0, 1.0 - erfc / 2.0, erfc / 2.0)
+
+def studentized_range(k, df):
+    """
+    survival function q -> P(Q > q) of the range of k means studentized
+    with df degrees of freedom, as used by Tukey HSD.  Integrates the
+    range of k normals over the distribution of the scale estimate
+    numerically; good to around 1e-6.
+    """
+    import numpy as np
+
+    z = np.linspace(-8.0, 8.0, 801)
+    w = np.linspace(0.0, 16.0, 801)
+    density = np.exp(-z * z / 2.0)
+    density /= density.sum()
+    cdf = _normal_cdf(z)
+    inside = np.clip(cdf[None, :] - _normal_cdf(z[None, :] - w[:, None]), 0.0, 1.0)
+    range_cdf = k * (density[None, :] * inside ** (k - 1)).sum(axis=1)
+
+    #the scale estimate s = sqrt(chi2(df) / df), integrated over t = log(s)
+    spread = 1.0 / np.sqrt(2.0 * df)
+    t = np.linspace(-max(12.0 * spread, 40.0 / df), max(12.0 * spread, 2.5), 2001)
+    weights = df * t - df * np.exp(2.0 * t) / 2.0
+    weights = np.exp(weights - weights.max())
+    weights /= weights.sum()
+    scale = np.exp(t)
+
+    def sf(q):
+        return float(max(0.0, 1.0 - (weights * np.interp(q * scale, w, range_cdf, right=1.0)).sum()))
+    return sf
+
+def one_way(groups):
+    """(F statistic, p-value) of a one-way ANOVA over Running_Means"""
+    groups = [g for g in groups if g.count]
+    total = sum(g.count for g in groups)
+    dfn, dfd = len(groups) - 1, total - len(groups)
+    if dfn < 1 or dfd < 1:
+        return float('nan'), float('nan')
+
+    grand = sum(g.count * g.mean for g in groups) / float(total)
+    between = sum(g.count * (g.mean - grand) ** 2 for g in groups) / dfn
+    within = sum(g.m2 for g in groups) / dfd
+    if not within:
+        return (float('inf'), 0.0) if between else (float('nan'), float('nan'))
+    f = between / within
+    return f, f_sf(f, dfn, dfd)
+
+def tukey_hsd(groups, alpha=.05):
+    """
+    Tukey-Kramer comparison of every two of groups, a dict of name to
+    Running_Mean: one (name1, name2, meandiff, p-value, lower, upper,
+    reject) per pair, meandiff being name2's mean less name1's.
+    """
+    from math import sqrt
+
+    names = sorted(n for n, g in groups.items() if g.count)
+    k = len(names)
+    dfd = sum(groups[n].count for n in names) - k
+    if k < 2 or dfd < 1:
+        return []
+    within = sum(groups[n].m2 for n in names) / dfd
+
+    sf = studentized_range(k, dfd)
+    low, high = 0.0, 16.0
+    for _ in range(50):
+        middle = (low + high) / 2.0
+        if sf(middle) > alpha:
+            low = middle
+        else:
+            high = middle
+    critical = high
+
+    rows = []
+    for i, first in enumerate(names):
+        for second in names[i+1:]:
+            a, b = groups[first], groups[second]
+            difference = b.mean - a.mean
+            error = sqrt(within / 2.0 * (1.0 / a.count + 1.0 / b.count))
+            if error:
+                p = sf(abs(difference) / error)
+            else:
+                p = 0.0 if difference else 1.0
+            rows.append((first, second, difference, p,
+                         difference - critical * error, difference + critical * error, p <= alpha))
+    return rows
+
+class Study(object):
+    """
+    Running_Means of the wins of each hand under each heuristic, one
+    sample at a time.
+    """
+    __slots__ = ('hands', 'groups')
+
+    def __init__(self, hands):
+        self.hands = list(hands)
+        self.groups = {}
+
+    def add(self, heuristic, wins):
+        """one sample: wins per hand, over games played by heuristic; hands missing won none"""
+        for hand in self.hands:
+            self.groups.setdefault((hand, heuristic), Running_Mean()).add(wins.get(hand, 0))
+
+    def merge(self, other):
+        for key, group in other.groups.items():
+            self.groups.setdefault(key, Running_Mean()).merge(group)
+        return self
+
+    def heuristics(self, hand):
+        return dict((h, g) for (p, h), g in self.groups.items() if p == hand)
+
+    def samples(self, heuristic):
+        return max([g.count for (p, h), g in self.groups.items() if h == heuristic] or [0])
+
+    def anova(self, hand):
+        return one_way(self.heuristics(hand).values())
+
+    def tukey(self, hand, alpha=.05):
+        return tukey_hsd(self.heuristics(hand), alpha)
+
+    def __getstate__(self):
+        return (self.hands, self.groups)
+
+    def __setstate__(self, state):
+        self.hands, self.groups = state
+
+class Sequential_Study(Study):
+    """
+    Study that decides each hand as the samples come in, and says which
+    heuristic to sample next.
+
+    After every heuristic has minimum samples, decide() looks at each
+    undecided hand: its heuristics differ if the ANOVA p-value is at most
+    alpha, and are equivalent if every Tukey interval at that level lies
+    within tolerance wins; a hand is decided once the same conclusion
+    holds for stable looks running.  next_heuristic() favours the
+    heuristics whose means are least certain across the hands still
+    undecided, counting samples already handed out as taken.
+
+    Testing again and again as samples come in would let chance alone
+    decide a hand far more often than 1 - confidence, so the nth look
+    tests at alpha = (1 - confidence) / (n * (n + 1)).  These sum to
+    1 - confidence over however many looks are taken (Bonferroni), so
+    each hand's conclusion holds at confidence; later looks need
+    correspondingly more samples.
+    """
+    __slots__ = ('confidence', 'tolerance', 'stable', 'minimum', 'looks', 'streaks', 'decided', 'pending')
+
+    def __init__(self, hands, confidence=.99, tolerance=2.0, stable=3, minimum=5):
+        Study.__init__(self, hands)
+        self.confidence = confidence
+        self.tolerance = tolerance
+        self.stable = stable
+        self.minimum = max(minimum, 2)
+        self.looks = 0
+        self.streaks = {}
+        self.decided = {}
+        self.pending = {}
+
+    def add(self, heuristic, wins):
+        if self.pending.get(heuristic):
+            self.pending[heuristic] -= 1
+        Study.add(self, heuristic, wins)
+
+    @property
+    def alpha(self):
+        """the significance level of the current look"""
+        looks = max(self.looks, 1)
+        return (1.0 - self.confidence) / (looks * (looks + 1))
+
+    def conclusion(self, hand):
+        """'REJECT' or 'NULL' at the current look's alpha, None if neither yet"""
+        alpha = self.alpha
+        f, p = self.anova(hand)
+        if p <= alpha:
+            return 'REJECT'
+        rows = self.tukey(hand, alpha)
+        if rows and all(-self.tolerance <= r[4] and r[5] <= self.tolerance for r in rows):
+            return 'NULL'
+
+    def decide(self, heuristics):
+        """updates decided from the samples so far; True once every hand is decided"""
+        if all(self.samples(h) >= self.minimum for h in heuristics):
+            self.looks += 1
+            for hand in self.hands:
+                if hand in self.decided:
+                    continue
+                conclusion = self.conclusion(hand)
+                previous, streak = self.streaks.get(hand, (None, 0))
+                streak = streak + 1 if conclusion == previous else 1
+                self.streaks[hand] = (conclusion, streak)
+                if conclusion is not None and streak >= self.stable:
+                    self.decided[hand] = conclusion
+        return len(self.decided) == len(self.hands)
+
+    def next_heuristic(self, heuristics):
+        """the heuristic whose next sample should tell the undecided hands most"""
+        def taken(h):
+            return self.samples(h) + self.pending.get(h, 0)
+
+        short = [h for h in heuristics if taken(h) < self.minimum]
+        if short:
+            choice = min(short, key=taken)
+        else:
+            undecided = [hand for hand in self.hands if hand not in self.decided]
+
+            def uncertainty(h):
+                """variance of h's mean summed over the undecided hands; unknown until h has two samples"""
+                total = 0.0
+                for hand in undecided:
+                    group = self.groups.get((hand, h))
+                    if group is None or group.count < 2:
+                        return float('inf'), -taken(h)
+                    total += group.variance
+                return total / taken(h), -taken(h)
+            choice = max(heuristics, key=uncertainty)
+        self.pending[choice] = self.pending.get(choice, 0) + 1
+        return choice
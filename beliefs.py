@@ -0,0 +1,197 @@
+"""
+Python scripts to simulate the game "The Resistance: Coup designed by Rikki Tahta
+The purpose of this project is to model human personalities and predict/score
+behaviors and bluffs in order to win the game.
+
+Bayesian hand beliefs: for every player, the likelihood of each of the 15
+two-influence hands given everything the player has publicly done, and
+from any observer's seat the posterior over that player's hidden hand,
+given the observer's own cards and everything revealed.
+
+"""
+
+from __future__ import print_function
+from coup import *
+
+__author__ = "William Dizon"
+__license__ = "GNU GPL v3.0"
+__version__ = "0.0.1"
+__email__ = "wdchromium@gmail.com"
+
+def _backed(influences, unlikely):
+    """likelihood of an event for each of PAIRS: 1 if it holds any of influences, else unlikely"""
+    codes = set(INFLUENCE_NAMES.index(inf) for inf in influences)
+    return tuple(1.0 if codes.intersection(pair) else unlikely for pair in PAIRS)
+
+def _belied(influences, unlikely):
+    """likelihood of an event for each of PAIRS: unlikely if it holds any of influences, else 1"""
+    codes = set(INFLUENCE_NAMES.index(inf) for inf in influences)
+    return tuple(unlikely if codes.intersection(pair) else 1.0 for pair in PAIRS)
+
+def event_factors():
+    """
+    For each of Player.SUSPICION_LOGS, maps an action to its likelihood
+    vector over PAIRS, built once from heuristics.BELIEFS.
+    """
+    if Hand_Belief.EVENT_FACTORS is None:
+        from heuristics import BELIEFS, IMPLIED_INFORMATION
+
+        performed = dict((action, _backed([inf], BELIEFS['bluffed'])) \
+                         for action, inf in Influence.CLAIMED_BY.items())
+        for action, infs in IMPLIED_INFORMATION['suboptimal_move'].items():
+            performed[action] = _belied(infs, BELIEFS['suboptimal_move'])
+
+        blocks = IMPLIED_INFORMATION['block'].items()
+        blocked = dict((action, _backed(infs, BELIEFS['bluffed'])) for action, infs in blocks)
+        passed_as_victim = dict((action, _belied(infs, BELIEFS['passed_as_victim'])) for action, infs in blocks)
+        passed_as_spectator = dict((action, _belied(infs, BELIEFS['passed_as_spectator'])) for action, infs in blocks)
+
+        Hand_Belief.EVENT_FACTORS = (performed, blocked, blocked, passed_as_victim, passed_as_spectator)
+    return Hand_Belief.EVENT_FACTORS
+
+class Hand_Belief(object):
+    """
+    Likelihood of each of PAIRS as one player's hand, folded in one logged
+    event at a time (as Player._tally does for suspicion scores), so an
+    update costs the same 15 multiplications however long the game runs.
+    Exchanging or otherwise replacing a hidden influence starts over.
+    """
+    __slots__ = ('player', 'likelihood', '_read', '_cards')
+
+    EVENT_FACTORS = None
+
+    def __init__(self, player):
+        self.player = player
+        self._cards = (player.left, player.right)
+        self.relearn()
+
+    def _restart(self):
+        p = self.player
+        self.likelihood = [1.0] * len(PAIRS)
+        self._read = [(getattr(p, attr)[key], len(getattr(p, attr)[key])) for attr, key in Player.SUSPICION_LOGS]
+        self._cards = (p.left, p.right)
+
+    def relearn(self):
+        """refolds every logged event, if a log was replaced or rewritten directly"""
+        self.likelihood = [1.0] * len(PAIRS)
+        self._read = [(None, 0)] * len(Player.SUSPICION_LOGS)
+        self.update()
+
+    def observe(self, factors):
+        likelihood = self.likelihood
+        for idx, factor in enumerate(factors):
+            likelihood[idx] *= factor
+        top = max(likelihood)
+        if top < 1e-100: #rescale before repeated evidence underflows
+            for idx in range(len(likelihood)):
+                likelihood[idx] /= top
+
+    def update(self):
+        """folds in events logged since the last update"""
+        p = self.player
+        if (p.left, p.right) != self._cards:
+            return self._restart()
+
+        factors = event_factors()
+        for idx, (attr, key) in enumerate(Player.SUSPICION_LOGS):
+            log = getattr(p, attr)[key]
+            seen, count = self._read[idx]
+            if (seen is not None and seen is not log) or len(log) < count:
+                return self.relearn()
+            for action in log[count:]:
+                if idx == 0 and action == 'exchange':
+                    self.likelihood = [1.0] * len(PAIRS)
+                elif action in factors[idx]:
+                    self.observe(factors[idx][action])
+            self._read[idx] = (log, len(log))
+
+    def posterior(self, observer=None):
+        """
+        Chance of each of PAIRS being the player's hand as observer sees
+        it: unseen influences are dealt at random, weighted by likelihood.
+        """
+        self.update()
+        p = self.player
+
+        unseen = [Card_Counter.COPIES] * len(INFLUENCES)
+        if p.counter is not None:
+            for code, count in enumerate(p.counter.known(observer)):
+                unseen[code] -= count
+        else:
+            for card in (p.left, p.right):
+                if card.revealed:
+                    unseen[card.CODE] -= 1
+            if observer is not None:
+                for card in (observer.left, observer.right):
+                    unseen[card.CODE] -= 1
+        revealed = [card.CODE for card in (p.left, p.right) if card.revealed]
+
+        weights = []
+        for pair, likelihood in zip(PAIRS, self.likelihood):
+            hidden = list(pair)
+            for code in revealed:
+                if code not in hidden:
+                    hidden = None
+                    break
+                hidden.remove(code)
+
+            if hidden is None:
+                ways = 0
+            elif len(hidden) == 2 and hidden[0] == hidden[1]:
+                ways = unseen[hidden[0]] * (unseen[hidden[0]] - 1)
+            elif len(hidden) == 2:
+                ways = 2 * unseen[hidden[0]] * unseen[hidden[1]]
+            elif len(hidden) == 1:
+                ways = unseen[hidden[0]]
+            else:
+                ways = 1
+            weights.append(max(ways, 0) * likelihood)
+
+        total = sum(weights)
+        return [w / total for w in weights] if total else weights
+
+    def probability(self, observer, influence):
+        """chance the player holds influence unrevealed, as observer sees it"""
+        code = INFLUENCE_NAMES.index(influence)
+        revealed = [card.CODE for card in (self.player.left, self.player.right) if card.revealed]
+        chance = 0.0
+        for pair, weight in zip(PAIRS, self.posterior(observer)):
+            if weight and pair.count(code) > revealed.count(code):
+                chance += weight
+        return chance
+
+    def best_guess(self, observer=None):
+        """most likely unrevealed influences, in the form of Player.best_guess"""
+        weights = self.posterior(observer)
+        pair = PAIRS[weights.index(max(weights))]
+        hidden = [INFLUENCE_NAMES[code] for code in pair]
+        for card in (self.player.left, self.player.right):
+            if card.revealed and str(card) in hidden:
+                hidden.remove(str(card))
+        return ' '.join(sorted(hidden))
+
+def benchmark(events=(10, 100, 1000, 10000), repeat=3):
+    """seconds per folded event after games of increasing length"""
+    from timeit import default_timer
+
+    testgame = Play_Coup(2)
+    p, pp = testgame.players
+    results = []
+    for count in events:
+        best = None
+        for _ in range(repeat):
+            p.public_information['perform'] = []
+            belief = Hand_Belief(p)
+            start = default_timer()
+            for i in range(count):
+                p.public_information['perform'].append(('tax', 'steal', 'income')[i % 3])
+                belief.update()
+            elapsed = (default_timer() - start) / count
+            best = elapsed if best is None else min(best, elapsed)
+        results.append((count, best))
+    return results
+
+if __name__ == "__main__":
+    print('events'.ljust(10), 'seconds per update')
+    for count, seconds in benchmark():
+        print(str(count).ljust(10), '{0:.2e}'.format(seconds))
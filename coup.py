@@ -11,6 +11,8 @@ __version__ = "0.0.1"
 __email__ = "wdchromium@gmail.com"
 
 class Play_Coup(object):
+    __slots__ = ('_players', 'court_deck', 'rng', 'cards', 'turn', 'moves', '_undo', '_zobrist')
+
     ACTIONS = {
         'all': set(['income', 'foreign_aid', 'coup', 'steal', 'tax', 'assassinate', 'exchange']),
         'free': set(['income', 'foreign_aid', 'coup']),
@@ -20,55 +22,676 @@ class Play_Coup(object):
         'bluffable': set(['steal', 'tax', 'assassinate', 'exchange']),
         }
     
-    def __init__(self, player_count, personalities=[]):
-        from random import shuffle, choice
-        
+    def __init__(self, player_count, personalities=[], rng=None):
+        """
+        rng is a random.Random (or compatible) instance owning every random
+        decision in this game: the deal, the personalities and all players'
+        choices.  A fresh unseeded one is used if none is given.
+        """
+        from random import Random
+
+        self.rng = rng or Random()
+        self.turn = 0 #seat acting next in play()
+        self.moves = 0 #turns played so far
+        self._undo = [] #Undo_Records, innermost last
+        self._zobrist = None
+        self.cards = None
         self.players = []
-        
+        personalities = list(personalities)
+
         for i in range(player_count):
             if personalities:
-                self.players.append(AI_Persona(choice(personalities)))
+                self.players.append(AI_Persona(self.rng.choice(personalities)))
             else:
                 self.players.append(AI_Persona())
+            self.players[-1].rng = self.rng
 
-        self.court_deck = [Contessa() for _ in range(3)] + \
-                          [Ambassador() for _ in range(3)] + \
-                          [Duke() for _ in range(3)] + \
-                          [Assassin() for _ in range(3)] + \
-                          [Captain() for _ in range(3)]
-        
-        shuffle(self.court_deck)
+        deck = list(range(len(INFLUENCES))) * 3
+        self.rng.shuffle(deck)
+        self.court_deck = [INFLUENCES[code]() for code in deck]
 
         for p in range(player_count):
-            self.players[p].left = self.court_deck.pop()
-            self.players[p].right = self.court_deck.pop()
+            self.players[p].hold('left', self.court_deck.pop())
+            self.players[p].hold('right', self.court_deck.pop())
+
+        self.cards = Card_Counter(self)
             
     def __len__(self):
-        return sum(1 for p in self.players if p.influence_remaining)
+        return self.cards.remaining
+
+    @property
+    def players(self):
+        return self._players
+
+    @players.setter
+    def players(self, players):
+        self._players = Seats(self, players)
+        if self.cards is not None:
+            self.cards.recount()
+
+    def remaining_players(self, excluded=()):
+        """
+        Living players not in excluded, in random order.  The order is a
+        Fisher-Yates shuffle drawn lazily, so callers that stop at the
+        first suitable player only pay for the players they looked at.
+        """
+        players = self._players
+        seats = [seat for seat in self.cards.alive if players[seat] not in excluded]
+        random = self.rng.random
+        for i in range(len(seats) - 1):
+            j = i + int(random() * (len(seats) - i))
+            seats[i], seats[j] = seats[j], seats[i]
+            yield players[seats[i]]
+        if seats:
+            yield players[seats[-1]]
 
     def filter_out_players(self, list_of_players):
-        from random import shuffle
-        hits = [p for p in self.players if p not in list_of_players and p.influence_remaining]
-        shuffle(hits)
-        return hits
+        return list(self.remaining_players(list_of_players))
+
+    def play(self, policy, observer=None, trace=False):
+        """
+        Plays until one player remains, asking policy for every decision.
+        observer, if given, is called with each Outcome as it resolves;
+        an Observer is also told when the game begins and ends.
+        """
+        notify = isinstance(observer, Observer)
+        if notify:
+            observer.begin(self)
+
+        while self.step(policy, observer, trace):
+            pass
+
+        if notify:
+            observer.end(self)
+        return self
+
+    def step(self, policy, observer=None, trace=False):
+        """
+        Plays the next living player's turn, returning False instead
+        once only one player remains.
+        """
+        while 1:
+            acting_player = self.players[self.turn]
+            if acting_player.influence_remaining:
+                if len(self) == 1:
+                    return False
+                self.play_turn(acting_player, policy, observer, trace)
+                self.moves += 1
+                self.turn = (self.turn + 1) % len(self.players)
+                if isinstance(observer, Observer):
+                    observer.moved(self)
+                return True
+            self.turn = (self.turn + 1) % len(self.players)
+
+    def play_turn(self, acting_player, policy, observer=None, trace=False):
+        turn = Turn(self, acting_player, observer, trace)
+        policy.plan(turn)
+
+        while 1:
+            outcome = self.resolve(turn, policy.select_action(turn), policy)
+            if outcome.result not in (Outcome.ILLEGAL, Outcome.RETHINK):
+                return outcome
+
+    def resolve(self, turn, action, policy):
+        if action == 'foreign_aid':
+            outcome = None
+            savior = policy.savior(turn, action, None)
+            if savior:
+                outcome = self._intervene(turn, action, None, None, savior, policy)
+            return outcome or self._perform(turn, action, None, None, policy)
+        elif action in Play_Coup.ACTIONS['targets_influence'] or action in Play_Coup.ACTIONS['targets_player']:
+            return self._resolve_targeted(turn, action, policy)
+        return self._resolve_claim(turn, action, None, None, policy)
+
+    def _resolve_targeted(self, turn, action, policy):
+        actor = turn.player
+        victim = policy.target(turn, action)
+        card = None
+        if action in Play_Coup.ACTIONS['targets_influence']:
+            card = victim.random_remaining_influence[1]
+
+        if policy.checks_legality_first:
+            problem = actor.check(action, card or victim)
+            if problem:
+                outcome = Outcome(Outcome.ILLEGAL, action, actor, victim)
+                outcome.reason = problem
+                return turn.emit(outcome)
+
+        if action == 'coup':
+            return self._perform(turn, action, victim, card, policy)
+        elif policy.rethink(turn, action, victim):
+            return turn.emit(Outcome(Outcome.RETHINK, action, actor, victim))
+        elif policy.victim_blocks(turn, action, victim):
+            return turn.emit(self.block(action, actor, victim, None, turn.trace))
+
+        savior = policy.savior(turn, action, victim)
+        if savior:
+            outcome = self._intervene(turn, action, victim, card, savior, policy)
+            if outcome:
+                return outcome
+
+        outcome = self._resolve_claim(turn, action, victim, card, policy)
+        if outcome.result == Outcome.SUCCEEDED and policy.records_inaction:
+            self._record_inaction(action, *policy.unnoted(turn, action, victim))
+        return outcome
+
+    def _intervene(self, turn, action, victim, card, savior, policy):
+        """resolves savior blocking action, or returns None if the action goes ahead"""
+        if policy.records_inaction and action in policy.noted_interventions:
+            self._record_inaction(action, turn.player, victim, savior)
+
+        doubter = policy.block_doubter(turn, action, savior)
+        if doubter:
+            if action not in savior.valid_block_set:
+                self._perform(turn, action, victim, card, policy)
+            return turn.emit(self.challenge(doubter, savior, Influence.BLOCKED_BY[action],
+                                            'block_' + action, turn.trace))
+        elif policy.block_stands(turn, action, savior):
+            return turn.emit(self.block(action, turn.player, victim, savior, turn.trace))
+
+    def _resolve_claim(self, turn, action, victim, card, policy):
+        actor = turn.player
+        if action in policy.doubted:
+            doubter = policy.doubter(turn, action)
+            if doubter:
+                if action in actor.valid_action_set:
+                    outcome = self._perform(turn, action, victim, card, policy)
+                    if outcome.result == Outcome.ILLEGAL or \
+                       not doubter.influence_remaining: #doubter fell to the action itself
+                        return outcome
+                return turn.emit(self.challenge(doubter, actor, Influence.CLAIMED_BY[action],
+                                                action, turn.trace))
+            elif action in policy.lapses_undoubted:
+                return turn.emit(Outcome(Outcome.LAPSED, action, actor, victim))
+        return self._perform(turn, action, victim, card, policy)
+
+    def _perform(self, turn, action, victim, card, policy):
+        outcome = self.attempt(turn.player, action, card or victim, turn.trace)
+        if card is not None and policy.forgets_revealed and outcome.result == Outcome.SUCCEEDED:
+            victim.remove_suspicion(str(card))
+        return turn.emit(outcome)
+
+    def _record_inaction(self, action, *involved):
+        players = self._players
+        for seat in self.cards.alive:
+            if players[seat] not in involved:
+                players[seat].didnt_block_as['spectator'].append(action)
+
+    def attempt(self, performer, action, target=None, trace=False):
+        if action == 'exchange' and target is None:
+            target = self.court_deck
+        return Outcome.attempt(performer, action, target, trace)
+
+    def block(self, action, performer, victim=None, spectator=None, trace=False):
+        return Outcome.block(action, performer, victim, spectator, trace)
+
+    def challenge(self, doubter, alleged_bluffer, alleged_influence, action, trace=False):
+        return Outcome.challenge(doubter, alleged_bluffer, alleged_influence, self.court_deck, action, trace)
 
     @property
     def winner(self):
-        candidates = [p for p in self.players if p.influence_remaining]
-                
-        if len(candidates) == 1:
-            return candidates[0]
-        else:
-            return None
+        if self.cards.remaining == 1:
+            return self._players[self.cards.alive[0]]
+        return None
 
     @property
     def influence_binary(self):
         from itertools import chain
         return tuple(chain(*[p.influence_binary for p in self.players]))
 
+    @property
+    def state(self):
+        """a Game_State copy of this game; play itself reads and writes the objects"""
+        state = Game_State(len(self.players), len(self.court_deck))
+        state.turn = self.turn
+        state.moves = self.moves
+        for seat, p in enumerate(self.players):
+            state.hands[seat*2] = p.left.CODE
+            state.hands[seat*2+1] = p.right.CODE
+            state.revealed[seat*2] = p.left.revealed
+            state.revealed[seat*2+1] = p.right.revealed
+            state.coins[seat] = p.coins
+            state.logs.append(tuple(Game_State.encode_log(getattr(p, attr)[key]) \
+                                    for attr, key in Player.SUSPICION_LOGS))
+        for idx, card in enumerate(self.court_deck):
+            state.deck[idx] = card.CODE
+        return state
+
+    def load_state(self, state):
+        """
+        Rewinds or forwards this game to state, moving its own Influence
+        objects into place rather than dealing new ones.
+        """
+        pool = [[] for _ in INFLUENCES]
+        for p in self.players:
+            for card in (p.left, p.right):
+                if card is not None:
+                    pool[card.CODE].append(card)
+        for card in self.court_deck:
+            pool[card.CODE].append(card)
+
+        def take(code, revealed=False):
+            card = pool[code].pop() if pool[code] else INFLUENCES[code]()
+            card.holder = None
+            card.revealed = bool(revealed)
+            return card
+
+        for seat, p in enumerate(self.players):
+            p.hold('left', take(state.hands[seat*2], state.revealed[seat*2]))
+            p.hold('right', take(state.hands[seat*2+1], state.revealed[seat*2+1]))
+            p.coins = state.coins[seat]
+            if state.logs:
+                for (attr, key), log in zip(Player.SUSPICION_LOGS, state.logs[seat]):
+                    getattr(p, attr)[key][:] = Game_State.decode_log(log)
+                p._recount()
+                p._belief = None
+        self.court_deck[:] = [take(code) for code in state.deck]
+        self.turn = state.turn
+        self.moves = state.moves
+        self.cards.recount()
+
+    @property
+    def zobrist(self):
+        """64-bit hash of the hands, coins, seat to move and logs, kept up to date by State_Hash"""
+        if self._zobrist is None:
+            from transpositions import State_Hash
+            self._zobrist = State_Hash(self)
+        return self._zobrist.sync()
+
+    def zobrist_for(self, player):
+        """zobrist as player sees it, the hidden cards of everyone else hashing alike"""
+        if self._zobrist is None:
+            from transpositions import State_Hash
+            self._zobrist = State_Hash(self)
+        return self._zobrist.viewed_by(self.players.index(player))
+
+    def snapshot(self):
+        """the whole game as a few hundred bytes, for restore()"""
+        return self.state.to_bytes()
+
+    def restore(self, snapshot):
+        self.load_state(Game_State.from_bytes(snapshot))
+
+    def push(self):
+        """
+        Marks the game as it stands, so that undo() can put it back after
+        any number of attempts, blocks, challenges or turns played in place.
+        The rng is not rewound: what is played again may differ.
+        """
+        self._undo.append(Undo_Record(self))
+
+    def undo(self):
+        self._undo.pop().rewind(self)
+
+    def apply(self, performer, action, target=None, trace=False):
+        """attempt(), undoable by undo()"""
+        self.push()
+        return self.attempt(performer, action, target, trace)
+
+    def apply_turn(self, policy, observer=None, trace=False):
+        """step(), undoable by undo()"""
+        self.push()
+        return self.step(policy, observer, trace)
+
+class Undo_Record(object):
+    """
+    What Play_Coup.undo needs to rewind a game: turn and moves, each
+    seat's coins, cards and log lengths, which cards were revealed (a
+    bitmask over seats' left/right) and the court deck's order.  Logs
+    only grow, except through Player._forget, which hands its log over
+    to keep() before shrinking it.  The Card_Counter is recounted after.
+    """
+    __slots__ = ('turn', 'moves', 'players', 'coins', 'cards', 'revealed', 'deck',
+                 'lengths', 'forgotten')
+
+    def __init__(self, game):
+        self.turn = game.turn
+        self.moves = game.moves
+        self.players = tuple(game.players)
+        self.coins = tuple(p.coins for p in self.players)
+        self.cards = tuple((p.left, p.right) for p in self.players)
+        self.revealed = 0
+        for bit, card in enumerate(c for pair in self.cards for c in pair):
+            if card.revealed:
+                self.revealed |= 1 << bit
+        self.deck = tuple(game.court_deck)
+        self.lengths = tuple(tuple(len(getattr(p, attr)[key]) for attr, key in Player.SUSPICION_LOGS) \
+                             for p in self.players)
+        self.forgotten = {}
+
+    def keep(self, player, idx, log):
+        if (player, idx) not in self.forgotten:
+            self.forgotten[(player, idx)] = list(log)
+
+    def rewind(self, game):
+        game.turn = self.turn
+        game.moves = self.moves
+        for (player, idx), log in self.forgotten.items():
+            attr, key = Player.SUSPICION_LOGS[idx]
+            getattr(player, attr)[key][:] = log
+
+        bit = 0
+        for p, coins, (left, right), lengths in zip(self.players, self.coins, self.cards, self.lengths):
+            p.coins = coins
+            dealt = p.left is not left or p.right is not right
+            if dealt:
+                p.hold('left', left)
+                p.hold('right', right)
+            for card in (left, right):
+                revealed = bool(self.revealed & (1 << bit))
+                if card.revealed != revealed:
+                    card.reveal(revealed)
+                bit += 1
+
+            relogged = any(player is p for player, _ in self.forgotten)
+            for (attr, key), length in zip(Player.SUSPICION_LOGS, lengths):
+                log = getattr(p, attr)[key]
+                if len(log) != length:
+                    del log[length:]
+                    relogged = True
+            if relogged:
+                p._recount()
+            if dealt or relogged:
+                p._belief = None
+
+        for card in self.deck:
+            card.holder = None
+            card.revealed = False
+        game.court_deck[:] = self.deck
+        game.cards.recount() #a card may be held twice while hands are put back
+
+class Game_State(object):
+    """
+    Flat, integer-coded copy of a game's cards, coins, turn and
+    public-information logs.  Seat n holds hands[2n] (left) and
+    hands[2n+1] (right); card codes index into INFLUENCES and
+    logs[n] holds seat n's Player.SUSPICION_LOGS as LOGGED_ACTIONS codes.
+
+    A snapshot and interchange format (Play_Coup.state, snapshot(), the
+    event log), not the live game: Play_Coup and Player keep their own
+    slotted attributes, which read faster than any view onto arrays.
+    """
+    __slots__ = ('hands', 'revealed', 'coins', 'deck', 'turn', 'moves', 'logs')
+
+    LOGGED_ACTIONS = tuple(sorted(Play_Coup.ACTIONS['all']))
+    HEADER = '<BBBH' #player count, deck size, turn, moves
+
+    def __init__(self, player_count, deck_size=0):
+        from array import array
+        self.hands = array('b', [-1] * (player_count * 2))
+        self.revealed = array('b', [0] * (player_count * 2))
+        self.coins = array('h', [0] * player_count) #signed: a blocked assassination is paid for even on credit
+        self.deck = array('b', [-1] * deck_size)
+        self.turn = 0
+        self.moves = 0
+        self.logs = []
+
+    def __eq__(self, other):
+        return isinstance(other, Game_State) and \
+               (self.hands, self.revealed, self.coins, self.deck, self.turn, self.moves, self.logs) == \
+               (other.hands, other.revealed, other.coins, other.deck, other.turn, other.moves, other.logs)
+
+    def __ne__(self, other):
+        return not self == other
+
+    @classmethod
+    def encode_log(cls, log):
+        from array import array
+        return array('b', [cls.LOGGED_ACTIONS.index(action) for action in log])
+
+    @classmethod
+    def decode_log(cls, codes):
+        return [cls.LOGGED_ACTIONS[code] for code in codes]
+
+    def to_bytes(self):
+        from struct import pack
+
+        chunks = [pack(self.HEADER, len(self.coins), len(self.deck), self.turn, self.moves)]
+        chunks.extend(pack('<%db' % len(codes), *codes) for codes in (self.hands, self.revealed, self.deck))
+        chunks.append(pack('<%dh' % len(self.coins), *self.coins))
+        for logs in self.logs:
+            chunks.append(pack('<%dH' % len(logs), *[len(log) for log in logs]))
+            chunks.extend(pack('<%db' % len(log), *log) for log in logs)
+        return b''.join(chunks)
+
+    @classmethod
+    def from_bytes(cls, data):
+        from array import array
+        from struct import unpack_from, calcsize
+
+        player_count, deck_size, state_turn, moves = unpack_from(cls.HEADER, data)
+        state = cls(player_count, deck_size)
+        state.turn = state_turn
+        state.moves = moves
+        offset = calcsize(cls.HEADER)
+
+        for codes in (state.hands, state.revealed, state.deck):
+            size = len(codes)
+            codes[:] = array('b', unpack_from('<%db' % size, data, offset))
+            offset += size
+        state.coins[:] = array('h', unpack_from('<%dh' % player_count, data, offset))
+        offset += 2 * player_count
+
+        logged = len(Player.SUSPICION_LOGS)
+        while offset < len(data):
+            lengths = unpack_from('<%dH' % logged, data, offset)
+            offset += 2 * logged
+            logs = []
+            for length in lengths:
+                logs.append(array('b', unpack_from('<%db' % length, data, offset)))
+                offset += length
+            state.logs.append(tuple(logs))
+        return state
+
+class Seats(list):
+    """Play_Coup.players, recounting the game's Card_Counter whenever somebody is seated"""
+    __slots__ = ('game',)
+
+    def __init__(self, game, players=()):
+        list.__init__(self, players)
+        self.game = game
+
+    def _reseated(self):
+        if self.game.cards is not None:
+            self.game.cards.recount()
+
+    def __setitem__(self, key, value):
+        list.__setitem__(self, key, value)
+        self._reseated()
+
+    def __delitem__(self, key):
+        list.__delitem__(self, key)
+        self._reseated()
+
+    def append(self, player):
+        list.append(self, player)
+        self._reseated()
+
+    def extend(self, players):
+        list.extend(self, players)
+        self._reseated()
+
+    def insert(self, index, player):
+        list.insert(self, index, player)
+        self._reseated()
+
+    def remove(self, player):
+        list.remove(self, player)
+        self._reseated()
+
+    def pop(self, *index):
+        player = list.pop(self, *index)
+        self._reseated()
+        return player
+
+class Card_Counter(object):
+    """
+    Revealed influences of one game and the seats still in it, and the
+    chance of each player holding each influence as seen by a viewer:
+    their own hand plus everything revealed is known, the rest is drawn
+    from the unseen cards.
+
+    Each read of revealed or alive compares every seat's cards and
+    revealed flags with those it last saw, so cards assigned or revealed
+    directly count too, and resettles only the seats that changed.
+    """
+    __slots__ = ('game', '_revealed', '_seats', '_alive', '_cards')
+
+    COPIES = 3 #of each influence in the court deck
+    HYPERGEOMETRIC = {}
+
+    def __init__(self, game):
+        self.game = game
+        self._seats = ()
+        self.recount()
+
+    def recount(self):
+        """counts from scratch, if players were seated or cards moved directly"""
+        for p in self._seats:
+            if p.counter is self:
+                p.counter = None
+        self._seats = tuple(self.game.players)
+        self._alive = []
+        self._cards = [self, self, None, None] * len(self._seats) #left, right and their flags per seat, as last seen
+        self._revealed = [0] * len(INFLUENCES)
+        for p in self._seats:
+            p.counter = self
+
+    @property
+    def revealed(self):
+        """copies of each of INFLUENCES revealed, in that order"""
+        self._check()
+        return self._revealed
+
+    @property
+    def alive(self):
+        """seats of the players with influence remaining, in seat order"""
+        self._check()
+        return self._alive
+
+    def _check(self):
+        cards = self._cards
+        i = 0
+        for p in self._seats:
+            left, right = p.left, p.right
+            if cards[i] is not left or cards[i+1] is not right or \
+               cards[i+2] != left.revealed or cards[i+3] != right.revealed:
+                self._settle(i, p)
+            i += 4
+
+    def _settle(self, i, p):
+        from bisect import insort
+
+        revealed = self._revealed
+        for card, flag in ((self._cards[i], self._cards[i+2]), (self._cards[i+1], self._cards[i+3])):
+            if flag:
+                revealed[card.CODE] -= 1
+
+        left, right = p.left, p.right
+        if left is None or right is None:
+            self._cards[i:i+4] = [self, self, None, None] #not dealt yet: looked at again next read
+            live = False
+        else:
+            self._cards[i:i+4] = [left, right, left.revealed, right.revealed]
+            live = not (left.revealed and right.revealed)
+            for card in (left, right):
+                if card.revealed:
+                    revealed[card.CODE] += 1
+
+        seat, alive = i // 4, self._alive
+        if live:
+            if seat not in alive:
+                insort(alive, seat)
+        elif seat in alive:
+            alive.remove(seat)
+
+    @property
+    def remaining(self):
+        return len(self.alive)
+
+    @classmethod
+    def hypergeometric(cls, unseen, copies, draws):
+        """chances of drawing at least (0, 1, 2) of copies in draws from unseen cards"""
+        key = (unseen, copies, draws)
+        try:
+            return cls.HYPERGEOMETRIC[key]
+        except KeyError:
+            pass
+
+        def choose(n, k):
+            if k < 0 or k > n:
+                return 0
+            result = 1
+            for i in range(k):
+                result = result * (n - i) // (i + 1)
+            return result
+
+        exactly = [choose(copies, k) * choose(unseen - copies, draws - k) / float(choose(unseen, draws)) \
+                   for k in range(3)]
+        at_least = tuple(sum(exactly[k:]) for k in range(3))
+        cls.HYPERGEOMETRIC[key] = at_least
+        return at_least
+
+    def known(self, viewer):
+        """copies of each influence viewer knows the whereabouts of"""
+        known = list(self.revealed)
+        if viewer is not None:
+            for card in (viewer.left, viewer.right):
+                if not card.revealed:
+                    known[card.CODE] += 1
+        return known
+
+    def _row(self, known, unseen, viewer, player, copies):
+        hidden = player.influence_remaining
+        if player is viewer:
+            held = [0] * len(INFLUENCES)
+            for card in (player.left, player.right):
+                if not card.revealed:
+                    held[card.CODE] += 1
+            return [float(h >= copies) for h in held]
+        elif not hidden:
+            return [0.0] * len(INFLUENCES)
+        return [self.hypergeometric(unseen, self.COPIES - k, hidden)[copies] for k in known]
+
+    def matrix(self, viewer=None, copies=1):
+        """
+        For every seat, the chance of it holding at least copies (1 or 2)
+        of each of INFLUENCES, in that order, as viewer sees it.
+        """
+        known = self.known(viewer)
+        unseen = len(INFLUENCES) * self.COPIES - sum(known)
+        return [self._row(known, unseen, viewer, p, copies) for p in self.game.players]
+
+    def probability(self, viewer, target, influence, copies=1):
+        """one cell of matrix, by influence name"""
+        known = self.known(viewer)
+        code = INFLUENCE_NAMES.index(influence)
+        if target is viewer:
+            return self._row(known, 0, viewer, target, copies)[code]
+        elif not target.influence_remaining:
+            return 0.0
+        unseen = len(INFLUENCES) * self.COPIES - sum(known)
+        return self.hypergeometric(unseen, self.COPIES - known[code], target.influence_remaining)[copies]
+
 class Player(object):
+    __slots__ = ('coins', 'left', 'right', 'public_information', 'didnt_block_as',
+                 '_scores', '_tallied', '_edits', 'rng', 'counter', '_belief')
+
+    #logs feeding probable_influences and improbable_influences, in scoring order
+    SUSPICION_LOGS = (('public_information', 'perform'),
+                      ('public_information', 'victim'),
+                      ('public_information', 'spectator'),
+                      ('didnt_block_as', 'victim'),
+                      ('didnt_block_as', 'spectator'))
+    SUSPICION_EFFECTS = None
+
     def __init__(self):
+        import random
+
         self.coins = 2
+        self.rng = random #module-wide stream until a Play_Coup hands out its own
+        self.counter = None #Card_Counter of the game seating this player
+        self._belief = None
         self.left = None
         self.right = None
         self.public_information = { #increase likelihood
@@ -80,64 +703,153 @@ class Player(object):
             'victim': [], #player didnt block even while targetted
             'spectator': [] #didnt block an uninvolved action
             }
+        self._scores = ({}, {}) #running probable, improbable scores
+        self._tallied = [(None, 0)] * len(self.SUSPICION_LOGS)
+        self._edits = 0 #times a log was rescored other than by appending
+        self._recount()
 
     def __str__(self):
         return '{0} {1}'.format(self.left, self.right)
         
     def __contains__(self, inf):
-        return inf in [str(self.left), str(self.right)]
+        return type(self.left).__name__ == inf or type(self.right).__name__ == inf
 
     def perform(self, action, player_target=None):
-        from itertools import chain
+        problem = self.check(action, player_target)
+        if problem:
+            raise problem[0](problem[1])
+        self._execute(action, player_target)
 
+    def check(self, action, player_target=None):
+        """the (exception, message) performing this action would raise, or None"""
         if player_target and \
            (player_target is self.left or \
            player_target is self.right):
-            raise IllegalTarget("you may not target yourself")
-        
-        for inf in chain([Influence,], Influence.__subclasses__()):
-            if hasattr(inf, action):
-                if player_target is None:
-                    getattr(inf, action)(self)
-                else:
-                    getattr(inf, action)(self, player_target)
-                self.public_information['perform'].append(action)
-                break
+            return (IllegalTarget, "you may not target yourself")
+        elif action not in Influence.HANDLERS:
+            return (IllegalAction, "no action %s" % action)
+        elif player_target is None:
+            return None
+        elif action == 'coup':
+            if self.coins < 7:
+                return (IllegalAction, "insufficient currency to coup")
+        elif action == 'assassinate':
+            if self.coins < 3:
+                return (IllegalAction, "insufficient currency to assassinate")
+            elif player_target.revealed:
+                return (IllegalTarget, "influence target already eliminated")
+        return None
+
+    def _execute(self, action, player_target):
+        if player_target is None:
+            Influence.HANDLERS[action](self)
         else:
-            raise IllegalAction("no action %s" % action)
+            Influence.HANDLERS[action](self, player_target)
+        self.public_information['perform'].append(action)
 
     def influences(self, influence):
-        return (not self.left.revealed and str(self.left) == influence) or \
-               (not self.right.revealed and str(self.right) == influence)
+        return (not self.left.revealed and type(self.left).__name__ == influence) or \
+               (not self.right.revealed and type(self.right).__name__ == influence)
 
     def remove_suspicion(self, influence):
         from heuristics import IMPLIED_INFORMATION
-        
+
+        self._tally()
         for k,v in IMPLIED_INFORMATION['perform'].items():
             if influence in v:
-                self.public_information['perform'] = [a for a in self.public_information['perform'] if a != k]
+                self._forget(0, k)
                 break
         for k,v in IMPLIED_INFORMATION['block'].items():
             if influence in v:
-                self.public_information['victim'] = [a for a in self.public_information['victim'] if a != k]
-                self.public_information['spectator'] = [a for a in self.public_information['spectator'] if a != k]
+                self._forget(1, k)
+                self._forget(2, k)
                 break
+
+    @classmethod
+    def suspicion_effects(cls):
+        """
+        For each of SUSPICION_LOGS, maps an action to the
+        (score, influence, points) it adds when recorded, where score
+        0 is probable_influences and 1 is improbable_influences.
+        """
+        if cls.SUSPICION_EFFECTS is None:
+            from heuristics import IMPLIED_INFORMATION, WEIGHTS
+
+            def effects(implied, score, weight):
+                return dict((action, tuple((score, inf, abs(weight)) for inf in infs))
+                            for action, infs in IMPLIED_INFORMATION[implied].items() if infs)
+
+            performed = effects('perform', 0, WEIGHTS['performed_action'])
+            for action, effect in effects('suboptimal_move', 1, WEIGHTS['suboptimal_move']).items():
+                performed[action] = performed.get(action, ()) + effect
+
+            Player.SUSPICION_EFFECTS = (performed,
+                                        effects('block', 0, WEIGHTS['blocked_selfishly']),
+                                        effects('block', 0, WEIGHTS['blocked_selflessly']),
+                                        effects('block', 1, WEIGHTS['didnt_block_selfishly']),
+                                        effects('block', 1, WEIGHTS['didnt_block_selflessly']))
+        return cls.SUSPICION_EFFECTS
+
+    def _score(self, effects, times):
+        if not times:
+            return
+        for score, inf, points in effects:
+            scores = self._scores[score]
+            value = scores.get(inf, 0) + points * times
+            if value:
+                scores[inf] = value
+            else:
+                del scores[inf]
+
+    def _tally(self):
+        """folds events appended to the logs since the last read into the scores"""
+        effects = self.suspicion_effects()
+        tallied = self._tallied
+        for idx, (attr, key) in enumerate(self.SUSPICION_LOGS):
+            log = getattr(self, attr)[key]
+            seen, count = tallied[idx]
+            if seen is not log or len(log) < count:
+                return self._recount()
+            elif len(log) > count:
+                for action in log[count:]:
+                    self._score(effects[idx].get(action, ()), 1)
+                tallied[idx] = (log, len(log))
+
+    def _recount(self):
+        """rescores from scratch, if a log was replaced or shortened directly"""
+        self._edits += 1
+        self._scores = ({}, {})
+        for idx, (attr, key) in enumerate(self.SUSPICION_LOGS):
+            self._tallied[idx] = (getattr(self, attr)[key], 0)
+        self._tally()
+
+    def _forget(self, idx, action):
+        attr, key = self.SUSPICION_LOGS[idx]
+        log = getattr(self, attr)[key]
+        if self.counter is not None and self.counter.game._undo:
+            self.counter.game._undo[-1].keep(self, idx, log)
+        self._edits += 1
+        kept = [a for a in log if a != action]
+        self._score(self.suspicion_effects()[idx].get(action, ()), len(kept) - len(log))
+        log[:] = kept
+        self._tallied[idx] = (log, len(log))
             
     def restore(self, position, court_deck):
-        from random import shuffle
-
         card = getattr(self, position)
-        card.revealed = False
+        card.reveal(False)
         self.remove_suspicion(card)
         
         court_deck.append(card)
 
-        shuffle(court_deck)
-        setattr(self, position, court_deck.pop())
+        self.rng.shuffle(court_deck)
+        self.hold(position, court_deck.pop())
 
     @property
     def judge_player(self):
-        return {k:self.probable_influences.get(k, 0) - self.improbable_influences.get(k, 0) for k in set(self.probable_influences).union(set(self.improbable_influences))}
+        self._tally()
+        probable, improbable = self._scores
+        return dict((inf, probable.get(inf, 0) - improbable.get(inf, 0)) for inf in INFLUENCE_NAMES \
+                    if inf in probable or inf in improbable)
     
     @property
     def best_guess(self):
@@ -146,65 +858,49 @@ class Player(object):
     
     @property
     def probable_influences(self):
-        from collections import Counter, defaultdict
-        from itertools import chain
-        from heuristics import IMPLIED_INFORMATION, WEIGHTS
-        
-        performed = Counter(chain(*[IMPLIED_INFORMATION['perform'][i] for i in self.public_information['perform'] if IMPLIED_INFORMATION['perform'].get(i)]))
-        victim = Counter(chain(*[IMPLIED_INFORMATION['block'][i] for i in self.public_information['victim'] if IMPLIED_INFORMATION['block'].get(i)]))
-        spectator = Counter(chain(*[IMPLIED_INFORMATION['block'][i] for i in self.public_information['spectator'] if IMPLIED_INFORMATION['block'].get(i)]))
-
-        result = defaultdict(int)
-        for inf, val in performed.most_common():
-            result[inf] += val * WEIGHTS['performed_action']
-        
-        for inf, val in victim.most_common():
-            result[inf] += val * WEIGHTS['blocked_selfishly']
-        
-        for inf, val in spectator.most_common():
-            result[inf] += val * WEIGHTS['blocked_selflessly']
-
-        return result
+        self._tally()
+        return dict(self._scores[0])
 
     @property
     def improbable_influences(self):
-        from collections import Counter, defaultdict
-        from itertools import chain
-        from heuristics import IMPLIED_INFORMATION, WEIGHTS
-        
-        performed = Counter(chain(*[IMPLIED_INFORMATION['suboptimal_move'][i] for i in self.public_information['perform'] if IMPLIED_INFORMATION['suboptimal_move'].get(i)]))
-        victim = Counter(chain(*[IMPLIED_INFORMATION['block'][i] for i in self.didnt_block_as['victim'] if IMPLIED_INFORMATION['block'].get(i)]))
-        spectator = Counter(chain(*[IMPLIED_INFORMATION['block'][i] for i in self.didnt_block_as['spectator'] if IMPLIED_INFORMATION['block'].get(i)]))
-
-        result = defaultdict(int)
-        for inf, val in performed.most_common():
-            result[inf] += val * abs(WEIGHTS['suboptimal_move'])
-        
-        for inf, val in victim.most_common():
-            result[inf] += val * abs(WEIGHTS['didnt_block_selfishly'])
-        
-        for inf, val in spectator.most_common():
-            result[inf] += val * abs(WEIGHTS['didnt_block_selflessly'])
-
-        return result
+        self._tally()
+        return dict(self._scores[1])
 
     @property
     def valid_actions(self):
-        actions = set()
-        if not self.left.revealed:
-            actions.update(self.left.ACTIONS)
-        if not self.right.revealed:
-            actions.update(self.right.ACTIONS)
-        return list(actions)
+        return list(Influence.ACTION_SETS[self.live_mask])
 
     @property
     def valid_blocks(self):
-        blocks = set()
-        if not self.left.revealed:
-            blocks.update(self.left.BLOCKS)
-        if not self.right.revealed:
-            blocks.update(self.right.BLOCKS)
-        return list(blocks)
+        return list(Influence.BLOCK_SETS[self.live_mask])
+
+    @property
+    def valid_action_set(self):
+        return Influence.ACTION_SETS[self.live_mask]
+
+    @property
+    def valid_block_set(self):
+        return Influence.BLOCK_SETS[self.live_mask]
+
+    @property
+    def live_mask(self):
+        """bitmask of unrevealed influences"""
+        left, right = self.left, self.right
+        return (0 if left.revealed else left.MASK) | (0 if right.revealed else right.MASK)
+
+    def hold(self, position, card):
+        """
+        puts card in position ('left' or 'right') and makes this player its
+        holder; left and right may also be assigned directly when no
+        Outcome needs to name the victim of a card
+        """
+        old = getattr(self, position)
+        if old is not None and old is not (self.right if position == 'left' else self.left) \
+           and old.holder is self:
+            old.holder = None
+        if card is not None:
+            card.holder = self
+        setattr(self, position, card)
 
     @property
     def alpha(self):
@@ -220,34 +916,42 @@ class Player(object):
     
     @property
     def influence_binary(self):
-        influences = ['Ambassador', 'Assassin', 'Captain', 'Contessa', 'Duke']
-        return tuple(1 if inf in self else 0 for inf in influences)
+        mask = Influence.mask_for_influences(self)
+        return tuple((mask >> inf.CODE) & 1 for inf in INFLUENCES)
         
-    def calculate(self, likelihood, type_of_action):
+    @property
+    def belief(self):
+        """this player's beliefs.Hand_Belief, created on first use"""
+        if self._belief is None:
+            from beliefs import Hand_Belief
+            self._belief = Hand_Belief(self)
+        return self._belief
+
+    def calculate(self, likelihood, type_of_action, observer=None):
+        if likelihood == 'probable':
+            infs = sorted(self.probable_influences.items(), reverse=True, key=lambda i: i[1])
+            mask = Influence.mask_for_influences([inf for inf, score in infs[0:2]])
+        elif likelihood == 'improbable':
+            infs = sorted(self.improbable_influences.items(), reverse=True, key=lambda i: i[1])
+            mask = Influence.mask_for_influences([inf for inf, score in infs[0:2]])
+        elif likelihood == 'judge':
+            mask = Influence.mask_for_influences(self.best_guess)
+        elif likelihood == 'belief':
+            mask = Influence.mask_for_influences(self.belief.best_guess(observer))
+        else:
+            return None
+
         if type_of_action == 'actions':
-            if likelihood == 'probable':
-                infs = sorted(self.probable_influences.items(), reverse=True, key=lambda i: i[1])
-                infs = [inf for inf, score in infs[0:2]]
-                return Influence.actions_for_influences(infs)
-            elif likelihood == 'improbable':
-                infs = sorted(self.improbable_influences.items(), reverse=True, key=lambda i: i[1])
-                infs = [inf for inf, score in infs[0:2]]
-                return Influence.actions_for_influences(infs)
-            elif likelihood == 'judge':
-                return Influence.actions_for_influences(self.best_guess)
+            return list(Influence.ACTIONS_BY_MASK[mask])
         elif type_of_action == 'blocks':
-            if likelihood == 'probable':
-                infs = sorted(self.probable_influences.items(), reverse=True, key=lambda i: i[1])
-                infs = [inf for inf, score in infs[0:2]]
-                return Influence.blocks_for_influences(infs)
-            elif likelihood == 'improbable':
-                infs = sorted(self.improbable_influences.items(), reverse=True, key=lambda i: i[1])
-                infs = [inf for inf, score in infs[0:2]]
-                return Influence.blocks_for_influences(infs)
-            elif likelihood == 'judge':
-                return Influence.blocks_for_influences(self.best_guess)
+            return list(Influence.BLOCKS_BY_MASK[mask])
 
 class AI_Persona(Player):
+    __slots__ = ('_rules', 'saved_personality')
+
+    DUEL_TABLE = None #duels.Duel_Table consulted by wins_duel, once installed
+    DUEL_THRESHOLD = .5 #wins_duel needs better odds than this
+
     OFFENSIVE_PRIORITY = {
         'Ambassador': ['assassinate', 'coup'],
         'Assassin': ['steal', 'assassinate', 'coup'],
@@ -296,22 +1000,31 @@ class AI_Persona(Player):
     def __init__(self, personality='passive'):
         Player.__init__(self)
         self.personalize(personality)
-        self.will_win_against = {}
         
     def personalize(self, personality):
         from heuristics import PERSONALITIES
         
         self.rules = PERSONALITIES[personality]
         self.saved_personality = personality
+
+    @property
+    def rules(self):
+        return self._rules
+
+    @rules.setter
+    def rules(self, rules):
+        """any dict in the PERSONALITIES format, compiled unless it already is"""
+        from heuristics import Rules
+
+        self._rules = rules if isinstance(rules, Rules) else Rules(rules)
         
     def select_opponent(self, all_players):
-        from random import choice
-        return choice([v for v in all_players if v is not self and v.influence_remaining])
+        return self.rng.choice([v for v in all_players if v is not self and v.influence_remaining])
 
     def naive_priority(self):
         if self.coins >= 10:
             return 'coup'
-        if 'assassinate' in self.valid_actions:
+        if 'assassinate' in self.valid_action_set:
             if self.coins < 3:
                 return 'income'
             elif self.coins > 4:
@@ -319,14 +1032,14 @@ class AI_Persona(Player):
             elif self.coins >= 7:
                 return 'coup'
             return 'assassinate'
-        elif 'tax' in self.valid_actions:
+        elif 'tax' in self.valid_action_set:
             if self.coins < 7:
                 return 'tax'
             else:
                 return 'coup'
         elif self.influences('Ambassador'):
             return 'switch'
-        elif 'steal' in self.valid_actions:
+        elif 'steal' in self.valid_action_set:
             if self.coins < 7:
                 return 'coin'
             else:
@@ -338,14 +1051,13 @@ class AI_Persona(Player):
                 return 'coup'
 
     def random_naive_priority(self):
-        from random import choice
-
+        choice = self.rng.choice
         action = self.naive_priority()
 
         if action == 'switch':
             return choice(['exchange'] + ['foreign_aid'] * 3 + ['income'])
         elif action == 'coin':
-            if 'steal' in self.valid_actions:
+            if 'steal' in self.valid_action_set:
                 return choice(['steal'] * 3 + ['foreign_aid'] + ['income'])
             return choice(['steal'] + ['foreign_aid'] * 3 + ['income'])
         elif action == 'assassinate':
@@ -370,7 +1082,7 @@ class AI_Persona(Player):
                 action_plan.remove('assassinate')
         
         if honest:
-            return [a for a in action_plan if a in set(self.valid_actions).union(set(Play_Coup.ACTIONS['free']))]
+            return [a for a in action_plan if a in self.valid_action_set or a in Play_Coup.ACTIONS['free']]
         else:
             return action_plan
 
@@ -382,85 +1094,79 @@ class AI_Persona(Player):
         return set(Play_Coup.ACTIONS['all']) - set(blockable)
 
     def will_intervene(self, action, performer, victim=None):
-        try:
-            rules = self.rules['honest_intervention'][action].items()
-            
-            if action in self.valid_blocks and len(rules):
-                for participant, lambda_func in rules:
-                    if lambda_func and not lambda_func(locals()[participant]):
-                        break
-                else:
-                    if action == 'foreign_aid':
-                        return 'Duke'
-                    elif action == 'assassinate':
-                        return 'Contessa'
-                    elif action == 'steal':
-                        if 'Ambassador' in self and 'Captain' in self:
-                            from random import choice
-                            return choice(['Ambassador', 'Captain'])
-                        elif 'Ambassador' in self:
-                            return 'Ambassador'
-                        elif 'Captain' in self:
-                            return 'Captain'
-        except KeyError:
-            pass
+        compiled = self.rules.compiled
+        roles = (self, action, performer, victim) #as indexed by heuristics.Rules.ROLES
 
-        try:
-            rules = self.rules['calculated_intervention'][action].items()
-            
-            if len(rules):
-                for participant, lambda_func in rules:
-                    if lambda_func and not lambda_func(locals()[participant]):
-                        break
-                else:
-                    if action == 'foreign_aid':
-                        return 'Duke'
-                    elif action == 'assassinate':
-                        return 'Contessa'
-                    elif action == 'steal':
-                        if not victim.coins:
-                            return None
-                        from random import choice
-                        return choice(['Ambassador', 'Captain'])
-        except KeyError:
-            pass
+        checks = compiled['honest_intervention'].get(action)
+        if checks is not None and action in self.valid_block_set:
+            for role, check in checks:
+                if not check(roles[role]):
+                    break
+            else:
+                if action == 'foreign_aid':
+                    return 'Duke'
+                elif action == 'assassinate':
+                    return 'Contessa'
+                elif action == 'steal':
+                    if 'Ambassador' in self and 'Captain' in self:
+                        return self.rng.choice(['Ambassador', 'Captain'])
+                    elif 'Ambassador' in self:
+                        return 'Ambassador'
+                    elif 'Captain' in self:
+                        return 'Captain'
+
+        checks = compiled['calculated_intervention'].get(action)
+        if checks is not None:
+            for role, check in checks:
+                if not check(roles[role]):
+                    break
+            else:
+                if action == 'foreign_aid':
+                    return 'Duke'
+                elif action == 'assassinate':
+                    return 'Contessa'
+                elif action == 'steal':
+                    if not victim.coins:
+                        return None
+                    return self.rng.choice(['Ambassador', 'Captain'])
         
     def will_callout(self, action, performer):
         if action.startswith('block_'):
-            action = action[6:]
-            try:
-                if sum(len(v) for k,v in performer.public_information.items()) >= self.rules['callout']['min_actions'] and \
-                    sum(len(v) for k,v in performer.didnt_block_as.items()) >= self.rules['callout']['min_inactions'] and \
-                    performer.judge_player[[a.__name__ for a in Influence.__subclasses__() if action in a.BLOCKS][0]] <= self.rules['callout']['threshold']:
-                    return True
-            except KeyError:
-                pass
-            return False
+            influence = Influence.BLOCKED_BY.get(action[6:])
         else:
-            try:
-                if sum(len(v) for k,v in performer.public_information.items()) >= self.rules['callout']['min_actions'] and \
-                    sum(len(v) for k,v in performer.didnt_block_as.items()) >= self.rules['callout']['min_inactions'] and \
-                    performer.judge_player[[a.__name__ for a in Influence.__subclasses__() if action in a.ACTIONS][0]] <= self.rules['callout']['threshold']:
-                    return True
-            except KeyError:
-                pass
+            influence = Influence.CLAIMED_BY.get(action)
+
+        if 'belief_threshold' in self.rules['callout']:
+            return influence is not None and \
+                   performer.belief.probability(self, influence) <= self.rules['callout']['belief_threshold']
+
+        numbers = self.rules.compiled['callout']
+        if numbers is None or influence is None:
+            return False
+        min_actions, min_inactions, threshold = numbers
+        if sum(len(v) for k,v in performer.public_information.items()) < min_actions or \
+           sum(len(v) for k,v in performer.didnt_block_as.items()) < min_inactions:
             return False
+        score = performer.judge_player.get(influence)
+        return score is not None and score <= threshold
             
-    def wins_duel(self, opponent):
-        if (opponent, opponent.alpha) in self.will_win_against:
-            return self.will_win_against[(opponent, opponent.alpha)]
+    def win_probability(self, opponent):
+        """chance of winning a one-on-one duel against opponent, moving first"""
+        from duels import DUEL_CACHE, duel_key
 
-        from simulations import duel
-        
-        game = Play_Coup(2)
-        game.players[0] = self
-        game.players[1] = opponent
-        
-        game_result = duel(game)
-        
-        does_win = game_result.players[0] is game_result.winner
-        self.will_win_against[(opponent, opponent.alpha)] = does_win
-        return does_win
+        key = duel_key(self, opponent)
+        probability = DUEL_CACHE.get(key)
+        if probability is None:
+            if AI_Persona.DUEL_TABLE is not None:
+                probability = AI_Persona.DUEL_TABLE.probability(self, opponent)
+            else:
+                from duels import win_probability
+                probability = win_probability(self, opponent)
+            DUEL_CACHE.put(key, probability)
+        return probability
+
+    def wins_duel(self, opponent):
+        return self.win_probability(opponent) > self.DUEL_THRESHOLD
         
     @property
     def plays_numbers(self):
@@ -472,8 +1178,7 @@ class AI_Persona(Player):
     @property
     def random_remaining_influence(self):
         if self.influence_remaining == 2:
-            import random
-            choice = random.choice(['left', 'right'])
+            choice = self.rng.choice(['left', 'right'])
             return (choice, getattr(self, choice))
         elif self.influence_remaining == 1:
             if self.left.revealed:
@@ -485,8 +1190,9 @@ class AI_Persona(Player):
     def clone(self):
         n = AI_Persona()
         n.coins = self.coins
-        n.left = self.left.__class__()
-        n.right = self.right.__class__()
+        n.hold('left', self.left.__class__())
+        n.hold('right', self.right.__class__())
+        n.rng = self.rng
         return n 
 
     @staticmethod
@@ -511,14 +1217,20 @@ class AI_Persona(Player):
         return 1- probability_negation
 
 class Influence(object):
+    __slots__ = ('revealed', 'holder')
+    CODE = -1
+    MASK = 0
+
     def __init__(self):
         self.revealed = False
+        self.holder = None
 
     def __str__(self):
         return str(self.__class__.__name__)
 
-    def reveal(self):
-        self.revealed = True
+    def reveal(self, revealed=True):
+        """turns the card face up (or down again)"""
+        self.revealed = revealed
 
     @staticmethod
     def income(active_player):
@@ -537,22 +1249,43 @@ class Influence(object):
             raise IllegalAction("insufficient currency to coup")
 
     @classmethod
-    def actions_for_influences(cls, influences):
-        actions = []
-        for inf in cls.__subclasses__():
+    def mask_for_influences(cls, influences):
+        """
+        Bitmask of influences named by a hand/guess string ('Captain Duke'),
+        a list of influence names or a Player, indexing ACTIONS_BY_MASK
+        and BLOCKS_BY_MASK.
+        """
+        if isinstance(influences, str):
+            try:
+                return cls.HAND_MASKS[influences]
+            except KeyError:
+                mask = 0
+                for inf in INFLUENCES:
+                    if inf.__name__ in influences:
+                        mask |= inf.MASK
+                cls.HAND_MASKS[influences] = mask
+                return mask
+        elif isinstance(influences, Player):
+            return getattr(influences.left, 'MASK', 0) | getattr(influences.right, 'MASK', 0)
+
+        mask = 0
+        for inf in INFLUENCES:
             if inf.__name__ in influences:
-                actions.extend(inf.ACTIONS)
-        return sorted(actions)
+                mask |= inf.MASK
+        return mask
+
+    @classmethod
+    def actions_for_influences(cls, influences):
+        return list(cls.ACTIONS_BY_MASK[cls.mask_for_influences(influences)])
         
     @classmethod
     def blocks_for_influences(cls, influences):
-        blocks = []
-        for inf in cls.__subclasses__():
-            if inf.__name__ in influences:
-                blocks.extend(inf.BLOCKS)
-        return sorted(blocks)
+        return list(cls.BLOCKS_BY_MASK[cls.mask_for_influences(influences)])
 
 class Captain(Influence):
+    __slots__ = ()
+    CODE = 2
+    MASK = 1 << CODE
     ACTIONS = ['steal']
     BLOCKS = ['steal']
     
@@ -567,6 +1300,9 @@ class Captain(Influence):
             active_player.coins += available_coins
         
 class Duke(Influence):
+    __slots__ = ()
+    CODE = 4
+    MASK = 1 << CODE
     ACTIONS = ['tax']
     BLOCKS = ['foreign_aid']
     
@@ -575,6 +1311,9 @@ class Duke(Influence):
         active_player.coins += 3
 
 class Assassin(Influence):
+    __slots__ = ()
+    CODE = 1
+    MASK = 1 << CODE
     ACTIONS = ['assassinate']
     BLOCKS = []
     
@@ -590,12 +1329,15 @@ class Assassin(Influence):
             raise IllegalAction("insufficient currency to assassinate")
 
 class Ambassador(Influence):
+    __slots__ = ()
+    CODE = 0
+    MASK = 1 << CODE
     ACTIONS = ['exchange']
     BLOCKS = ['steal']
     
     @staticmethod
     def exchange(active_player, court_deck):
-        from random import randint
+        randint = active_player.rng.randint
 
         available_influence = []
         available_influence.append(court_deck.pop())
@@ -607,16 +1349,51 @@ class Ambassador(Influence):
             available_influence.append(active_player.right)
 
         if not active_player.left.revealed:
-            active_player.left = available_influence.pop(randint(0, len(available_influence)-1))
+            active_player.hold('left', available_influence.pop(randint(0, len(available_influence)-1)))
         if not active_player.right.revealed:
-            active_player.right = available_influence.pop(randint(0, len(available_influence)-1))
+            active_player.hold('right', available_influence.pop(randint(0, len(available_influence)-1)))
 
         court_deck.extend(available_influence)
 
 class Contessa(Influence):
+    __slots__ = ()
+    CODE = 3
+    MASK = 1 << CODE
     ACTIONS = []
     BLOCKS = ['assassinate']
 
+INFLUENCES = (Ambassador, Assassin, Captain, Contessa, Duke)
+INFLUENCE_NAMES = tuple(inf.__name__ for inf in INFLUENCES)
+
+#every two-influence hand, as sorted influence codes
+PAIRS = tuple((a, b) for a in range(len(INFLUENCES)) for b in range(a, len(INFLUENCES)))
+
+def _build_lookup_tables():
+    """tables keyed by action name or influence bitmask, built once at import"""
+    Influence.HANDLERS = {}
+    for action in sorted(Play_Coup.ACTIONS['all']):
+        for inf in (Influence,) + INFLUENCES:
+            if action in vars(inf):
+                Influence.HANDLERS[action] = getattr(inf, action)
+                break
+
+    Influence.CLAIMED_BY = {}
+    Influence.BLOCKED_BY = {}
+    for inf in Influence.__subclasses__():
+        for action in inf.ACTIONS:
+            Influence.CLAIMED_BY.setdefault(action, inf.__name__)
+        for action in inf.BLOCKS:
+            Influence.BLOCKED_BY.setdefault(action, inf.__name__)
+
+    masks = range(1 << len(INFLUENCES))
+    Influence.ACTIONS_BY_MASK = tuple(tuple(sorted(a for inf in INFLUENCES if mask & inf.MASK for a in inf.ACTIONS)) for mask in masks)
+    Influence.BLOCKS_BY_MASK = tuple(tuple(sorted(b for inf in INFLUENCES if mask & inf.MASK for b in inf.BLOCKS)) for mask in masks)
+    Influence.ACTION_SETS = tuple(frozenset(actions) for actions in Influence.ACTIONS_BY_MASK)
+    Influence.BLOCK_SETS = tuple(frozenset(blocks) for blocks in Influence.BLOCKS_BY_MASK)
+    Influence.HAND_MASKS = {}
+
+_build_lookup_tables()
+
 class IllegalAction(Exception):
     pass
 
@@ -629,7 +1406,9 @@ class RethinkAction(Exception):
         self.performer = performer
         self.victim = victim
 
-        self.message = '{0} rethinks {1} on {2}'.format(performer.status, action, victim.status)
+    @property
+    def message(self):
+        return '{0} rethinks {1} on {2}'.format(self.performer.status, self.action, self.victim.status)
 
 class BlockedAction(Exception):
     def __init__(self, action, performer, victim, spectator):
@@ -637,27 +1416,7 @@ class BlockedAction(Exception):
         self.performer = performer
         self.victim = victim
         self.spectator = spectator
-
-        if self.victim:
-            if action == 'assassinate':
-                self.performer.coins -= 3
-                
-            if not spectator:
-                self.message = "{0} blocks {1}'s {2}".format(self.victim,
-                                                             self.performer,
-                                                             self.action)
-                self.victim.public_information['victim'].append(action)
-            else:
-                self.message = '{0} performs {1} on {2}--blocked by {3}'.format(performer,
-                                                                                action,
-                                                                                victim,
-                                                                                spectator)
-                self.spectator.public_information['spectator'].append(action)
-        elif not self.victim:
-            self.message = "{0} blocks {1}'s {2}".format(spectator,
-                                                         performer,
-                                                         action)
-            self.spectator.public_information['spectator'].append(action)
+        self.message = Outcome.block(action, performer, victim, spectator, True).message
 
 class QuestionInfluence(Exception):
     def __init__(self, doubter, alleged_bluffer, alleged_influence, court_deck, action):
@@ -666,26 +1425,207 @@ class QuestionInfluence(Exception):
         self.alleged_influence = alleged_influence
         self.alleged_bluffer_original = str(alleged_bluffer)
         self.action = action
-        
+
+        outcome = Outcome.challenge(doubter, alleged_bluffer, alleged_influence, court_deck, action, True)
+        self.doubter_is_correct = outcome.doubter_is_correct
+        self.message = outcome.message
+
+class Outcome(object):
+    """
+    Record of one resolved action, block or challenge.
+
+    For challenges, performer is the alleged bluffer and influence the
+    influence claimed.  message is only formatted when trace is requested.
+    """
+    __slots__ = ('result', 'action', 'performer', 'victim', 'spectator', 'doubter',
+                 'influence', 'doubter_is_correct', 'reason', 'message')
+
+    SUCCEEDED = 'succeeded'
+    BLOCKED = 'blocked'
+    CHALLENGED = 'challenged'
+    ILLEGAL = 'illegal'
+    RETHINK = 'rethink'
+    LAPSED = 'lapsed' #went unchallenged, so nothing happened
+
+    def __init__(self, result, action, performer, victim=None, spectator=None):
+        self.result = result
+        self.action = action
+        self.performer = performer
+        self.victim = victim
+        self.spectator = spectator
+        self.doubter = None
+        self.influence = None
+        self.doubter_is_correct = None
+        self.reason = None
+        self.message = None
+
+    @classmethod
+    def attempt(cls, performer, action, target=None, trace=False):
+        problem = performer.check(action, target)
+        if problem:
+            outcome = cls(cls.ILLEGAL, action, performer)
+            outcome.reason = problem
+            if trace:
+                outcome.message = problem[1]
+            return outcome
+
+        victim = target if isinstance(target, Player) else getattr(target, 'holder', None)
+        performer._execute(action, target)
+
+        outcome = cls(cls.SUCCEEDED, action, performer, victim)
+        if trace:
+            if victim is None:
+                outcome.message = '{0} performs {1}'.format(performer, action)
+            else:
+                outcome.message = '{0} performs {1} on {2}'.format(performer, action, victim)
+        return outcome
+
+    @classmethod
+    def block(cls, action, performer, victim=None, spectator=None, trace=False):
+        outcome = cls(cls.BLOCKED, action, performer, victim, spectator)
+
+        if victim:
+            if action == 'assassinate':
+                performer.coins -= 3
+
+            if not spectator:
+                if trace:
+                    outcome.message = "{0} blocks {1}'s {2}".format(victim, performer, action)
+                victim.public_information['victim'].append(action)
+            else:
+                if trace:
+                    outcome.message = '{0} performs {1} on {2}--blocked by {3}'.format(performer,
+                                                                                       action,
+                                                                                       victim,
+                                                                                       spectator)
+                spectator.public_information['spectator'].append(action)
+        else:
+            if trace:
+                outcome.message = "{0} blocks {1}'s {2}".format(spectator, performer, action)
+            spectator.public_information['spectator'].append(action)
+        return outcome
+
+    @classmethod
+    def challenge(cls, doubter, alleged_bluffer, alleged_influence, court_deck, action, trace=False):
+        outcome = cls(cls.CHALLENGED, action, alleged_bluffer)
+        outcome.doubter = doubter
+        outcome.influence = alleged_influence
+
         if alleged_influence in alleged_bluffer:
-            self.message = "{0} doubts {1} influences a {2}: former loses one influence!".format(self.doubter,
-                                                                                                 self.alleged_bluffer_original,
-                                                                                                 self.alleged_influence)
-            self.doubter_is_correct = False
-            influence = self.doubter.random_remaining_influence[1]
+            if trace:
+                outcome.message = "{0} doubts {1} influences a {2}: former loses one influence!".format(doubter,
+                                                                                                        alleged_bluffer,
+                                                                                                        alleged_influence)
+            outcome.doubter_is_correct = False
+            influence = doubter.random_remaining_influence[1]
             influence.reveal()
-            self.doubter.remove_suspicion(str(influence))
-            
-            if str(self.doubter.left) == alleged_influence and not self.doubter.left.revealed: 
-                self.doubter.restore('left', court_deck)
-            elif str(self.doubter.right) == alleged_influence and not self.doubter.right.revealed: 
-                self.doubter.restore('right', court_deck)
+            doubter.remove_suspicion(str(influence))
+
+            if type(doubter.left).__name__ == alleged_influence and not doubter.left.revealed:
+                doubter.restore('left', court_deck)
+            elif type(doubter.right).__name__ == alleged_influence and not doubter.right.revealed:
+                doubter.restore('right', court_deck)
         else:
-            self.message = "{0} doubts {1} influences a {2}: latter loses one influence!".format(self.doubter,
-                                                                                                 self.alleged_bluffer_original,
-                                                                                                 self.alleged_influence)
-            self.doubter_is_correct = True
-            influence = self.alleged_bluffer.random_remaining_influence[1]
+            if trace:
+                outcome.message = "{0} doubts {1} influences a {2}: latter loses one influence!".format(doubter,
+                                                                                                        alleged_bluffer,
+                                                                                                        alleged_influence)
+            outcome.doubter_is_correct = True
+            influence = alleged_bluffer.random_remaining_influence[1]
             influence.reveal()
-            self.alleged_bluffer.remove_suspicion(str(influence))
-        
\ No newline at end of file
+            alleged_bluffer.remove_suspicion(str(influence))
+        return outcome
+
+class Observer(object):
+    """
+    Watches games played by Play_Coup.play: begin and end bracket each
+    game, every Outcome is passed to the call in between and moved
+    follows each completed turn.  Any plain callable can observe
+    outcomes too, without the notices.
+    """
+    __slots__ = ()
+
+    def begin(self, game):
+        pass
+
+    def __call__(self, outcome):
+        pass
+
+    def moved(self, game):
+        pass
+
+    def end(self, game):
+        pass
+
+class Turn(object):
+    """one player's turn of Play_Coup.play, as seen by a Policy"""
+    __slots__ = ('game', 'player', 'plan', 'opponent', 'observer', 'trace')
+
+    def __init__(self, game, player, observer=None, trace=False):
+        self.game = game
+        self.player = player
+        self.plan = []
+        self.opponent = None
+        self.observer = observer
+        self.trace = trace
+
+    def emit(self, outcome):
+        if self.observer is not None:
+            self.observer(outcome)
+        return outcome
+
+class Policy(object):
+    """
+    Decisions Play_Coup.play asks for during a game.  The defaults pick
+    uniformly random actions and targets and never block or doubt;
+    subclasses override only what differs.
+    """
+    ACTIONS = sorted(Play_Coup.ACTIONS['all'])
+
+    doubted = frozenset() #claimed actions other players may challenge
+    lapses_undoubted = frozenset() #doubted actions that do nothing unless challenged
+    rethought = frozenset() #actions reconsidered against a probable blocker
+    rethink_chance = 1.0
+    victims_block = False #victims block steal/assassinate when able
+    records_inaction = False #non-blockers are noted in didnt_block_as
+    noted_interventions = frozenset(Play_Coup.ACTIONS['blockable']) #...when a savior steps in against these
+    forgets_revealed = False #influence lost to coup/assassinate drops its suspicion
+    checks_legality_first = False #coins are checked before rethinks, blocks and doubts rather than on performing
+
+    def others(self, turn, *excluded):
+        return turn.game.remaining_players(excluded)
+
+    def plan(self, turn):
+        pass
+
+    def select_action(self, turn):
+        return turn.player.rng.choice(self.ACTIONS)
+
+    def target(self, turn, action):
+        return turn.player.select_opponent(turn.game.players)
+
+    def rethink(self, turn, action, victim):
+        return action in self.rethought and \
+               action in victim.calculate('probable', 'blocks') and \
+               turn.player.rng.random() < self.rethink_chance
+
+    def victim_blocks(self, turn, action, victim):
+        return self.victims_block and action in victim.valid_block_set
+
+    def savior(self, turn, action, victim):
+        return None
+
+    def unnoted(self, turn, action, victim):
+        """players not noted as failing to block action once it succeeds"""
+        return turn.player, victim
+
+    def block_doubter(self, turn, action, savior):
+        return None
+
+    def block_stands(self, turn, action, savior):
+        return True
+
+    def doubter(self, turn, action):
+        for doubter in self.others(turn, turn.player):
+            if doubter.will_callout(action, turn.player):
+                return doubter
@@ -31,7 +31,7 @@ class Coup_NN(object):
         from pybrain import SigmoidLayer
         from pybrain.supervised.trainers.backprop import BackpropTrainer
         from pybrain.datasets import SupervisedDataSet
-        from simulations import simulations
+        from duels import deal, batch_duel
         from collections import Counter
         
         INPUT_NEURONS_PER_PLAYER = 5
@@ -44,11 +44,14 @@ class Coup_NN(object):
         WINS = []
         POSITIONS = []
     
-        for _ in range(games):
-            game_result = simulations.duel(Play_Coup(2))
-            WINS.append(game_result.winner.alpha)
-            POSITIONS.append(game_result.influence_binary)
-            ds.addSample(game_result.influence_binary, game_result.winner.influence_binary)        
+        hands = deal(games)
+        winners = batch_duel(hands)
+        decided = winners >= 0 #duels still undecided after max_turns have no winner to learn
+        for hand, seat in zip(hands[decided].tolist(), winners[decided].tolist()):
+            binary = [tuple(int(inf.CODE in cards) for inf in INFLUENCES) for cards in hand]
+            WINS.append(' '.join(sorted(INFLUENCE_NAMES[code] for code in hand[seat])))
+            POSITIONS.append(binary[0] + binary[1])
+            ds.addSample(binary[0] + binary[1], binary[seat])
     
         trainer.trainEpochs(epochs)
 
@@ -0,0 +1,366 @@
+"""
+Python scripts to simulate the game "The Resistance: Coup designed by Rikki Tahta
+The purpose of this project is to model human personalities and predict/score
+behaviors and bluffs in order to win the game.
+
+Batched one-on-one duels: many games of simulations.duel played at once
+as NumPy arrays, each player following one_on_one_strategy against the
+opponent's dealt hand.
+
+"""
+
+from coup import *
+
+__author__ = "William Dizon"
+__license__ = "GNU GPL v3.0"
+__version__ = "0.0.1"
+__email__ = "wdchromium@gmail.com"
+
+DUEL_ACTIONS = ('income', 'foreign_aid', 'tax', 'steal', 'assassinate', 'coup')
+COIN_CLASSES = (0, 3, 7) #representative coins: <3, 3-6, 7+
+GAINS = {'income': 1, 'foreign_aid': 2, 'tax': 3}
+
+def duel_action(live_mask, opponent_pair, coins):
+    """
+    The action one_on_one_strategy plays first with these live influences
+    and coins against an opponent dealt opponent_pair (codes).
+    """
+    live = [inf for inf in INFLUENCES if live_mask & inf.MASK]
+    p = AI_Persona()
+    p.left, p.right = live[0](), live[-1]()
+    p.coins = coins
+    hand = ' '.join(sorted(INFLUENCE_NAMES[code] for code in opponent_pair))
+    return p.one_on_one_strategy(hand, True)[0]
+
+def decision_tables():
+    """
+    (action, blocked) lookup tables for the compact duel policy:
+    action[live_mask, opponent_pair, coin_class] indexes DUEL_ACTIONS and
+    blocked[action, opponent_live_mask] is whether it is blocked outright.
+    """
+    import numpy as np
+
+    masks = 1 << len(INFLUENCES)
+    action = np.zeros((masks, len(PAIRS), len(COIN_CLASSES)), dtype=np.int8)
+    for mask in range(1, masks):
+        for pair_idx, pair in enumerate(PAIRS):
+            for cls, coins in enumerate(COIN_CLASSES):
+                action[mask, pair_idx, cls] = DUEL_ACTIONS.index(duel_action(mask, pair, coins))
+
+    blocked = np.zeros((len(DUEL_ACTIONS), masks), dtype=bool)
+    for idx, name in enumerate(DUEL_ACTIONS):
+        for mask in range(masks):
+            blocked[idx, mask] = name in Influence.BLOCK_SETS[mask]
+    return action, blocked
+
+_TABLES = []
+
+def _tables():
+    if not _TABLES:
+        _TABLES.extend(decision_tables())
+    return _TABLES
+
+def deal(count, rng=None):
+    """hands (count, 2 players, 2 influences) dealt from count shuffled court decks"""
+    import numpy as np
+
+    rng = np.random.default_rng(rng)
+    deck = np.repeat(np.arange(len(INFLUENCES), dtype=np.int8), 3)
+    order = np.argsort(rng.random((count, len(deck))), axis=1)[:, :4]
+    return deck[order].reshape(count, 2, 2)
+
+def batch_duel(hands, coins=None, revealed=None, rng=None, max_turns=1000):
+    """
+    Plays len(hands) duels in lockstep, player 0 acting first, and returns
+    the winning seat of each (-1 if still undecided after max_turns).
+
+    hands is (N, 2, 2) influence codes; coins (N, 2) defaults to 2 each and
+    revealed (N, 2, 2) to nothing revealed.  rng is a numpy Generator or seed.
+    """
+    import numpy as np
+
+    action_table, blocked_table = _tables()
+    rng = np.random.default_rng(rng)
+
+    hands = np.asarray(hands, dtype=np.int8)
+    count = len(hands)
+    coins = np.full((count, 2), 2, dtype=np.int32) if coins is None else np.array(coins, dtype=np.int32)
+    alive = np.ones((count, 2, 2), dtype=bool) if revealed is None else ~np.asarray(revealed, dtype=bool)
+
+    pair_index = np.zeros((len(INFLUENCES), len(INFLUENCES)), dtype=np.int8)
+    for idx, (a, b) in enumerate(PAIRS):
+        pair_index[a, b] = pair_index[b, a] = idx
+    pairs = pair_index[hands[:, :, 0], hands[:, :, 1]]
+    card_masks = (1 << hands.astype(np.int32))
+
+    winner = np.full(count, -1, dtype=np.int8)
+    done = ~alive.any(axis=2).all(axis=1)
+    winner[done] = alive.any(axis=2).argmax(axis=1)[done]
+    rows = np.arange(count)
+    turn = 0
+
+    income, foreign_aid, tax, steal, assassinate, coup = range(len(DUEL_ACTIONS))
+
+    for _ in range(max_turns):
+        r = rows[~done]
+        if not len(r):
+            break
+        p, o = turn, 1 - turn
+
+        live = np.where(alive[r], card_masks[r], 0)
+        own_mask = live[:, p, 0] | live[:, p, 1]
+        opp_mask = live[:, o, 0] | live[:, o, 1]
+        cls = (coins[r, p] >= 3).astype(np.int8) + (coins[r, p] >= 7)
+
+        action = action_table[own_mask, pairs[r, o], cls]
+        go = ~blocked_table[action, opp_mask]
+
+        coins[r, p] += go * ((action == income) + 2 * (action == foreign_aid) + 3 * (action == tax))
+
+        stealing = r[go & (action == steal)]
+        taken = np.minimum(coins[stealing, o], 2)
+        coins[stealing, o] -= taken
+        coins[stealing, p] += taken
+
+        killing = go & ((action == assassinate) | (action == coup))
+        coins[r[killing], p] -= np.where(action[killing] == coup, 7, 3)
+        k = r[killing]
+        both = alive[k, o, 0] & alive[k, o, 1]
+        card = np.where(both, rng.random(len(k)) < .5, alive[k, o, 1]).astype(np.intp)
+        alive[k, o, card] = False
+
+        fallen = k[~alive[k, o].any(axis=1)]
+        winner[fallen] = p
+        done[fallen] = True
+        turn = o
+
+    return winner
+
+def duel_policy(hands, coins=None, rng=None):
+    """pure Python reference for one batch_duel game, returning the winning seat"""
+    from random import Random
+
+    rng = rng or Random()
+    alive = [[True, True], [True, True]]
+    coins = list(coins or (2, 2))
+    turn = 0
+
+    while all(any(a) for a in alive):
+        p, o = turn, 1 - turn
+        own = [hands[p][i] for i in (0, 1) if alive[p][i]]
+        opp = [hands[o][i] for i in (0, 1) if alive[o][i]]
+        own_mask = Influence.mask_for_influences([INFLUENCE_NAMES[c] for c in own])
+        opp_mask = Influence.mask_for_influences([INFLUENCE_NAMES[c] for c in opp])
+
+        action = duel_action(own_mask, hands[o], coins[p])
+        if action not in Influence.BLOCK_SETS[opp_mask]:
+            if action in GAINS:
+                coins[p] += GAINS[action]
+            elif action == 'steal':
+                taken = min(coins[o], 2)
+                coins[o] -= taken
+                coins[p] += taken
+            else:
+                coins[p] -= 7 if action == 'coup' else 3
+                if all(alive[o]):
+                    alive[o][int(rng.random() < .5)] = False
+                else:
+                    alive[o][alive[o].index(True)] = False
+        turn = o
+    return int(any(alive[1]))
+
+PAIR_INDEX = dict((pair, idx) for idx, pair in enumerate(PAIRS))
+
+def hand_key(player):
+    """
+    (PAIRS index, revealed pattern) of a player's two influences: the
+    pattern indexes Duel_Table.PATTERNS, or is 3 for a player out
+    """
+    low, high = sorted((player.left, player.right), key=lambda inf: inf.CODE)
+    return (PAIR_INDEX[(low.CODE, high.CODE)], low.revealed + 2 * high.revealed)
+
+def duel_key(player, opponent):
+    """canonical position of player moving first against opponent"""
+    return hand_key(player) + hand_key(opponent) + (player.coins, opponent.coins)
+
+_CHOICES = {}
+_WIN_PROBABILITY = {}
+
+def _choice(live, opponent_pair, coins):
+    cls = (coins >= 3) + (coins >= 7)
+    key = (live, opponent_pair, cls)
+    if key not in _CHOICES:
+        mask = Influence.mask_for_influences([INFLUENCE_NAMES[code] for code in live])
+        _CHOICES[key] = duel_action(mask, opponent_pair, COIN_CLASSES[cls])
+    return _CHOICES[key]
+
+def position_win_probability(pairs, live, coins, turn=0):
+    """
+    Exact chance seat 0 wins a duel with both seats following the
+    batch_duel policy.  pairs holds each seat's dealt influence codes
+    (sorted), live each seat's unrevealed codes (sorted), coins each
+    seat's coins and turn the seat to act.
+
+    The only chance event is which of two live influences falls to a
+    coup or assassination, so the duel is a Markov chain over these
+    positions, solved by memoized recursion.
+    """
+    key = (pairs, live, coins, turn)
+    if key in _WIN_PROBABILITY:
+        if _WIN_PROBABILITY[key] is None:
+            raise RuntimeError('duel policy revisits a position')
+        return _WIN_PROBABILITY[key]
+    elif not live[1]:
+        return 1.0
+    elif not live[0]:
+        return 0.0
+
+    _WIN_PROBABILITY[key] = None
+    p, o = turn, 1 - turn
+    action = _choice(live[p], pairs[o], coins[p])
+    opp_mask = Influence.mask_for_influences([INFLUENCE_NAMES[code] for code in live[o]])
+    coins = list(coins)
+    outcomes = [live]
+
+    if action in Influence.BLOCK_SETS[opp_mask]:
+        pass
+    elif action in GAINS:
+        coins[p] += GAINS[action]
+    elif action == 'steal':
+        taken = min(coins[o], 2)
+        coins[o] -= taken
+        coins[p] += taken
+    else:
+        coins[p] -= 7 if action == 'coup' else 3
+        outcomes = []
+        for idx in range(len(live[o])):
+            remaining = list(live)
+            remaining[o] = live[o][:idx] + live[o][idx+1:]
+            outcomes.append(tuple(remaining))
+
+    coins = tuple(coins)
+    value = sum(position_win_probability(pairs, after, coins, o) for after in outcomes) / len(outcomes)
+    _WIN_PROBABILITY[key] = value
+    return value
+
+def win_probability(player, opponent):
+    """exact chance player, moving first, wins a duel against opponent"""
+    seats = (player, opponent)
+    pairs = tuple(tuple(sorted((p.left.CODE, p.right.CODE))) for p in seats)
+    live = tuple(tuple(sorted(inf.CODE for inf in (p.left, p.right) if not inf.revealed)) for p in seats)
+    return position_win_probability(pairs, live, (player.coins, opponent.coins))
+
+class Duel_Table(object):
+    """
+    Chance the first mover wins a duel from every starting position:
+    both dealt hands, which of their influences are revealed and both
+    coin counts (clamped to 0..max_coins), estimated with batch_duel.
+
+    Build once, save, and load() + install() to have AI_Persona.wins_duel
+    look positions up here instead of evaluating them.
+    """
+    __slots__ = ('wins', 'max_coins')
+
+    #revealed flags of a hand's (lower, higher) influence code
+    PATTERNS = ((0, 0), (1, 0), (0, 1))
+
+    def __init__(self, wins):
+        self.wins = wins
+        self.max_coins = wins.shape[-1] - 1
+
+    @classmethod
+    def build(cls, samples=32, max_coins=12, rng=None, chunk=50000):
+        import numpy as np
+
+        rng = np.random.default_rng(rng)
+        shape = (len(PAIRS), len(cls.PATTERNS), len(PAIRS), len(cls.PATTERNS), max_coins + 1, max_coins + 1)
+        states = np.stack(np.unravel_index(np.arange(np.prod(shape)), shape), axis=1)
+        pairs = np.array(PAIRS, dtype=np.int8)
+        patterns = np.array(cls.PATTERNS, dtype=bool)
+
+        wins = np.zeros(len(states), dtype=np.float32)
+        for start in range(0, len(states), chunk):
+            s = np.repeat(states[start:start+chunk], samples, axis=0)
+            hands = np.stack([pairs[s[:, 0]], pairs[s[:, 2]]], axis=1)
+            revealed = np.stack([patterns[s[:, 1]], patterns[s[:, 3]]], axis=1)
+            winners = batch_duel(hands, s[:, 4:6], revealed, rng)
+            wins[start:start+chunk] = (winners == 0).reshape(-1, samples).mean(axis=1)
+        return cls(wins.reshape(shape))
+
+    @classmethod
+    def load(cls, path):
+        import numpy as np
+        return cls(np.load(path))
+
+    def save(self, path):
+        import numpy as np
+        np.save(path, self.wins)
+
+    def install(self):
+        AI_Persona.DUEL_TABLE = self
+        return self
+
+    def key(self, player, opponent):
+        """index of player moving first against opponent; both must still have influence"""
+        if not (player.influence_remaining and opponent.influence_remaining):
+            raise ValueError('duel tables hold no positions with a player out')
+        return hand_key(player) + hand_key(opponent) + \
+               (max(0, min(player.coins, self.max_coins)), max(0, min(opponent.coins, self.max_coins)))
+
+    def probability(self, player, opponent):
+        if not opponent.influence_remaining:
+            return 1.0
+        elif not player.influence_remaining:
+            return 0.0
+        return float(self.wins[self.key(player, opponent)])
+
+class Duel_Cache(object):
+    """
+    Bounded, thread-safe LRU of duel win probabilities keyed by duel_key,
+    shared by every AI_Persona in the process.  hits, misses and evictions count
+    lookups since the last clear().
+    """
+    __slots__ = ('maxsize', 'hits', 'misses', 'evictions', '_entries', '_lock')
+
+    def __init__(self, maxsize=100000):
+        from collections import OrderedDict
+        from threading import Lock
+
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._entries.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self._entries[key] = value
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = value
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    @property
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'size': len(self._entries), 'maxsize': self.maxsize}
+
+DUEL_CACHE = Duel_Cache()
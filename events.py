@@ -0,0 +1,417 @@
+"""
+Python scripts to simulate the game "The Resistance: Coup designed by Rikki Tahta
+The purpose of this project is to model human personalities and predict/score
+behaviors and bluffs in order to win the game.
+
+Compact event log of simulated games.  An Event_Writer observes games
+played by Play_Coup.play and packs every Outcome into a fixed-size binary
+record, buffering writes to the stream; read_events unpacks them again
+and a Replayer seeks straight to any turn of any logged game.
+
+Stream layout, every record led by its kind byte:
+
+    GAME    game index, comma-separated personalities of its seats and
+            the deal, as a STATE record holds it
+    STATE   game index, turns played, length-prefixed Game_State.to_bytes()
+            and the game rng's state, if it has one; written every
+            snapshot_every turns
+    EVENT   see EVENT_FORMAT: one resolved Outcome with seats in place of
+            players and codes in place of names
+    END     game index, winning seat
+
+"""
+
+__author__ = "William Dizon"
+__license__ = "GNU GPL v3.0"
+__version__ = "0.0.1"
+__email__ = "wdchromium@gmail.com"
+
+from coup import Play_Coup, Game_State, Observer, Outcome, INFLUENCES
+from collections import namedtuple
+from struct import Struct
+
+GAME, STATE, EVENT, END = range(4)
+
+RESULTS = (Outcome.SUCCEEDED, Outcome.BLOCKED, Outcome.CHALLENGED,
+           Outcome.ILLEGAL, Outcome.RETHINK, Outcome.LAPSED)
+ACTIONS = Game_State.LOGGED_ACTIONS + \
+          tuple('block_' + a for a in sorted(Play_Coup.ACTIONS['blockable']))
+NONE = 255 #seat, code or flag not applicable
+
+#kind, game, moves, result, action, performer, victim, spectator, doubter,
+#influence, doubter_is_correct, performer coins, victim coins
+EVENT_FORMAT = Struct('<BIHBBBBBBBBBB')
+GAME_FORMAT = Struct('<BIHHH') #names, state and rng lengths
+STATE_FORMAT = Struct('<BIHHH')
+END_FORMAT = Struct('<BIB')
+KIND_FORMAT = Struct('<B') #leads every record
+RNG_FORMAT = Struct('<625Id')
+
+Event = namedtuple('Event', ['game', 'moves', 'result', 'action', 'performer',
+                             'victim', 'spectator', 'doubter', 'influence',
+                             'doubter_is_correct', 'performer_coins', 'victim_coins'])
+
+def index_key(game, moves):
+    return game << 16 | moves
+
+def index_array():
+    """an empty array of 64-bit index keys or offsets; a list before python 3.3 gave array 'Q'"""
+    from array import array
+    try:
+        return array('Q')
+    except ValueError:
+        return []
+
+def pack_rng(rng):
+    """random.Random state as RNG_FORMAT bytes; empty for anything else"""
+    try:
+        version, internal, gauss_next = rng.getstate()
+    except (AttributeError, TypeError, ValueError):
+        return b''
+    if version != 3 or len(internal) != 625:
+        return b''
+    return RNG_FORMAT.pack(*(internal + (float('nan') if gauss_next is None else gauss_next,)))
+
+def unpack_rng(data):
+    """inverse of pack_rng: a state for random.Random.setstate, or None"""
+    if not data:
+        return None
+    values = RNG_FORMAT.unpack(as_bytes(data))
+    gauss_next = values[-1]
+    return 3, values[:-1], None if gauss_next != gauss_next else gauss_next
+
+class Event_Writer(Observer):
+    """
+    Observer packing each game's deal, outcomes, periodic snapshots and
+    winner into stream.
+
+    Records are gathered in memory and written once buffer_size bytes
+    are pending, or on flush/close.  Games are numbered in the order
+    they begin, starting at first_game.  The offset of every STATE
+    record is kept in keys/offsets for save_index.
+    """
+    __slots__ = ('stream', 'buffer_size', 'snapshot_every', 'game', 'game_index',
+                 'written', 'keys', 'offsets', '_seats', '_buffer')
+
+    RESULT_CODES = dict((r, i) for i, r in enumerate(RESULTS))
+    ACTION_CODES = dict((a, i) for i, a in enumerate(ACTIONS))
+    INFLUENCE_CODES = dict((i.__name__, i.CODE) for i in INFLUENCES)
+
+    def __init__(self, stream, buffer_size=1 << 16, first_game=0, snapshot_every=16):
+        self.stream = stream
+        self.buffer_size = buffer_size
+        self.snapshot_every = snapshot_every
+        self.game = None
+        self.game_index = first_game - 1
+        self.written = 0
+        self.keys = index_array()
+        self.offsets = index_array()
+        self._seats = {}
+        self._buffer = bytearray()
+
+    def begin(self, game):
+        self.game = game
+        self.game_index += 1
+        self._seats = dict((id(p), seat) for seat, p in enumerate(game.players))
+        names = ','.join(getattr(p, 'saved_personality', '') for p in game.players).encode('ascii')
+        self.snapshot(game, names)
+
+    def snapshot(self, game, names=None):
+        """a STATE record of game as it stands, or its GAME record given names"""
+        state = game.state.to_bytes()
+        rng = pack_rng(game.rng)
+        self.keys.append(index_key(self.game_index, game.moves))
+        self.offsets.append(self.written + len(self._buffer))
+        if names is None:
+            self._buffer += STATE_FORMAT.pack(STATE, self.game_index, game.moves, len(state), len(rng))
+        else:
+            self._buffer += GAME_FORMAT.pack(GAME, self.game_index, len(names), len(state), len(rng))
+            self._buffer += names
+        self._buffer += state
+        self._buffer += rng
+
+    def __call__(self, outcome):
+        seat = self._seats.get
+        victim = outcome.victim
+        correct = outcome.doubter_is_correct
+        self._buffer += EVENT_FORMAT.pack(
+            EVENT, self.game_index, self.game.moves,
+            self.RESULT_CODES[outcome.result],
+            self.ACTION_CODES[outcome.action],
+            seat(id(outcome.performer), NONE),
+            seat(id(victim), NONE),
+            seat(id(outcome.spectator), NONE),
+            seat(id(outcome.doubter), NONE),
+            self.INFLUENCE_CODES.get(outcome.influence, NONE),
+            NONE if correct is None else int(correct),
+            max(0, min(outcome.performer.coins, NONE - 1)),
+            NONE if victim is None else max(0, min(victim.coins, NONE - 1)))
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def moved(self, game):
+        if self.snapshot_every and not game.moves % self.snapshot_every:
+            self.snapshot(game)
+
+    def end(self, game):
+        winner = next(p for p in game.players if p.influence_remaining)
+        self._buffer += END_FORMAT.pack(END, self.game_index, self._seats[id(winner)])
+        self.game = None
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            self.stream.write(bytes(self._buffer))
+            self.written += len(self._buffer)
+            del self._buffer[:]
+        if hasattr(self.stream, 'flush'):
+            self.stream.flush()
+
+    def close(self):
+        self.flush()
+        if hasattr(self.stream, 'close'):
+            self.stream.close()
+
+    def save_index(self, stream):
+        """writes the snapshot index for Replayer, so it need not scan the log"""
+        from struct import pack
+        count = len(self.keys)
+        stream.write(pack('<Q', count))
+        stream.write(pack('<%dQ' % count, *self.keys))
+        stream.write(pack('<%dQ' % count, *self.offsets))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def view(data):
+    """a memoryview of data, to slice without copying; data itself where there is none (python 2 mmaps)"""
+    try:
+        return memoryview(data)
+    except TypeError:
+        return data
+
+def release(data):
+    if hasattr(data, 'release'):
+        data.release()
+
+def as_bytes(data):
+    """bytes, bytearray, mmap or memoryview contents as bytes (python 2 would bytes() a memoryview to its repr)"""
+    return data.tobytes() if isinstance(data, memoryview) else bytes(data)
+
+def read_record(data, offset):
+    """the record at offset in data, as read_events yields it, and the next offset"""
+    kind = KIND_FORMAT.unpack_from(data, offset)[0]
+    if kind == EVENT:
+        fields = [None if f == NONE else f for f in EVENT_FORMAT.unpack_from(data, offset)[1:]]
+        fields[2] = RESULTS[fields[2]]
+        fields[3] = ACTIONS[fields[3]]
+        if fields[8] is not None:
+            fields[8] = INFLUENCES[fields[8]].__name__
+        if fields[9] is not None:
+            fields[9] = bool(fields[9])
+        return Event(*fields), offset + EVENT_FORMAT.size
+    elif kind in (GAME, STATE):
+        if kind == GAME:
+            _, index, names_length, state_length, rng_length = GAME_FORMAT.unpack_from(data, offset)
+            offset += GAME_FORMAT.size
+            detail = as_bytes(data[offset:offset + names_length]).decode('ascii').split(',')
+            offset += names_length
+        else:
+            _, index, detail, state_length, rng_length = STATE_FORMAT.unpack_from(data, offset)
+            offset += STATE_FORMAT.size
+        state = Game_State.from_bytes(as_bytes(data[offset:offset + state_length]))
+        offset += state_length
+        rng = unpack_rng(data[offset:offset + rng_length])
+        return (kind, index, detail, state, rng), offset + rng_length
+    elif kind == END:
+        _, index, seat = END_FORMAT.unpack_from(data, offset)
+        return (END, index, seat), offset + END_FORMAT.size
+    raise ValueError('unknown record at offset {0}'.format(offset))
+
+def record_size(data, offset):
+    """length of the record at offset in data, or None if data ends before it does"""
+    remaining = len(data) - offset
+    kind = KIND_FORMAT.unpack_from(data, offset)[0]
+    if kind == EVENT:
+        size = EVENT_FORMAT.size
+    elif kind == END:
+        size = END_FORMAT.size
+    elif kind == GAME:
+        if remaining < GAME_FORMAT.size:
+            return None
+        _, _, names_length, state_length, rng_length = GAME_FORMAT.unpack_from(data, offset)
+        size = GAME_FORMAT.size + names_length + state_length + rng_length
+    elif kind == STATE:
+        if remaining < STATE_FORMAT.size:
+            return None
+        _, _, _, state_length, rng_length = STATE_FORMAT.unpack_from(data, offset)
+        size = STATE_FORMAT.size + state_length + rng_length
+    else:
+        raise ValueError('unknown record at offset {0}'.format(offset))
+    return size if size <= remaining else None
+
+def read_events(stream, chunk_size=1 << 20):
+    """
+    Yields (GAME, index, personalities, Game_State, rng state), (STATE,
+    index, moves, Game_State, rng state), Event and (END, index, seat)
+    records from a stream written
+    by Event_Writer, in order.  Seats, results and actions are decoded
+    back to their names; absent fields are None.
+
+    A stream backed by a file is mapped and read in place from its
+    current position; any other is read chunk_size bytes at a time, so
+    a log of any length is read in constant memory.
+    """
+    import mmap
+
+    try:
+        data = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+    except (AttributeError, EnvironmentError, ValueError): #not a file, or an empty one
+        data = None
+
+    if data is not None:
+        mapped = view(data)
+        offset = stream.tell()
+        try:
+            while offset < len(mapped):
+                record, offset = read_record(mapped, offset)
+                yield record
+        finally:
+            release(mapped)
+            data.close()
+        return
+
+    buffered = bytearray()
+    while 1:
+        chunk = stream.read(chunk_size)
+        buffered += chunk
+        offset = 0
+        while offset < len(buffered) and record_size(buffered, offset) is not None:
+            record, offset = read_record(buffered, offset)
+            yield record
+        del buffered[:offset]
+        if not chunk:
+            if buffered:
+                raise ValueError('log ends partway through a record')
+            return
+
+class Replayer(object):
+    """
+    Random access to the games of an event log.
+
+    data is the whole log as bytes or any buffer, typically an mmap (see
+    open); index is what Event_Writer.save_index wrote, or None to build
+    it with one pass over data.  Seeking bisects the index for the
+    nearest STATE record and reads only from there.
+    """
+    __slots__ = ('data', 'keys', 'offsets')
+
+    def __init__(self, data, index=None):
+        self.data = data
+        self.keys = index_array()
+        self.offsets = index_array()
+        if index is not None:
+            from struct import unpack_from
+            index = as_bytes(index)
+            count = unpack_from('<Q', index)[0]
+            self.keys.extend(unpack_from('<%dQ' % count, index, 8))
+            self.offsets.extend(unpack_from('<%dQ' % count, index, 8 + 8 * count))
+        else:
+            self._scan()
+
+    @classmethod
+    def open(cls, path, index_path=None):
+        """maps the log at path, with the index at index_path if there is one"""
+        import mmap
+        import os
+
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                data = b'' #an empty file cannot be mapped
+        index = None
+        if index_path and os.path.exists(index_path):
+            with open(index_path, 'rb') as f:
+                index = f.read()
+        return cls(data, index)
+
+    def _scan(self):
+        data = view(self.data)
+        offset = 0
+        pairs = []
+        while offset < len(data):
+            kind = KIND_FORMAT.unpack_from(data, offset)[0]
+            if kind == GAME:
+                pairs.append((index_key(GAME_FORMAT.unpack_from(data, offset)[1], 0), offset))
+            elif kind == STATE:
+                _, index, moves, _, _ = STATE_FORMAT.unpack_from(data, offset)
+                pairs.append((index_key(index, moves), offset))
+            size = record_size(data, offset)
+            if size is None:
+                raise ValueError('log ends partway through a record')
+            offset += size
+        release(data)
+        pairs.sort()
+        self.keys.extend(k for k, _ in pairs)
+        self.offsets.extend(o for _, o in pairs)
+
+    def _record(self, offset):
+        return read_record(view(self.data), offset)
+
+    def nearest(self, game, moves=0):
+        """offset of the last snapshot of game taken at or before moves"""
+        from bisect import bisect_right
+        pos = bisect_right(self.keys, index_key(game, moves)) - 1
+        if pos < 0 or self.keys[pos] >> 16 != game:
+            raise KeyError('game {0} is not in this log'.format(game))
+        return self.offsets[pos]
+
+    def snapshot(self, game, moves=0):
+        """(moves, Game_State, rng state) of the snapshot nearest moves"""
+        (kind, _, detail, state, rng), _ = self._record(self.nearest(game, moves))
+        return (0 if kind == GAME else detail), state, rng
+
+    def personalities(self, game):
+        """personality of each seat of game, from its GAME record"""
+        (_, _, names, _, _), _ = self._record(self.nearest(game, 0))
+        return names
+
+    def events(self, game, start=0, stop=None):
+        """Events of turns start up to (not including) stop of game"""
+        _, offset = self._record(self.nearest(game, start))
+        while offset < len(self.data):
+            record, offset = self._record(offset)
+            if isinstance(record, Event):
+                if stop is not None and record.moves >= stop:
+                    return
+                if record.moves >= start:
+                    yield record
+            elif record[1] != game or record[0] in (GAME, END):
+                return
+
+    def seek(self, game, moves, policy=None):
+        """
+        A Play_Coup exactly as game stood after moves turns.  Turns past
+        the nearest snapshot are played again by policy, which must be
+        the one that played the game, from the logged rng state.
+        """
+        at, state, rng = self.snapshot(game, moves)
+        coup_game = Play_Coup(len(state.coins))
+        for p, name in zip(coup_game.players, self.personalities(game)):
+            if name:
+                p.personalize(name)
+        coup_game.load_state(state)
+
+        if at < moves:
+            if policy is None or rng is None:
+                raise ValueError('turn {0} of game {1} was not snapshot; '
+                                 'replaying needs the policy and a logged rng'.format(moves, game))
+            coup_game.rng.setstate(rng)
+            while coup_game.moves < moves and coup_game.step(policy):
+                pass
+        return coup_game
@@ -1,22 +1,20 @@
-from random import random
-
 PERSONALITIES = {
     'obnoxious': {
         'honest_intervention': {
             'foreign_aid': {
-                'performer': lambda p: random() > .5
+                'performer': lambda p: p.rng.random() > .5
                 },
             'assassinate': {
-                'performer': lambda p: random() > .5,
+                'performer': lambda p: p.rng.random() > .5,
                 'victim': lambda v: v.coins < 7
                 },
             'steal': {
-                'performer': lambda p: random() > .5
+                'performer': lambda p: p.rng.random() > .5
                 }
             },
         'calculated_intervention': {
             'foreign_aid': {
-                'performer': lambda p: random() > .8
+                'performer': lambda p: p.rng.random() > .8
                 },
             },
         'callout': {
@@ -29,13 +27,13 @@ PERSONALITIES = {
     'cautious': {
         'honest_intervention': {
             'foreign_aid': {
-                'performer': lambda p: random() > .7
+                'performer': lambda p: p.rng.random() > .7
                 },
             'assassinate': {
                 'performer': lambda p: False
                 },
             'steal': {
-                'performer': lambda p: random() > .7
+                'performer': lambda p: p.rng.random() > .7
                 }
             },
         'calculated_intervention': {},
@@ -53,6 +51,88 @@ PERSONALITIES = {
         }
     }
 
+class Rule_Section(dict):
+    """
+    A nested dict of Rules; any change to it (or below it) makes the
+    Rules it belongs to compile again on next use.
+    """
+    __slots__ = ('_root',)
+
+    def __init__(self, root, items=()):
+        dict.__init__(self)
+        self._root = root
+        for k, v in dict(items).items():
+            dict.__setitem__(self, k, self._wrap(v))
+
+    def _wrap(self, value):
+        if isinstance(value, dict) and not isinstance(value, Rule_Section):
+            return Rule_Section(self._root, value)
+        return value
+
+    def _changed(self):
+        self._root._compiled = None
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, self._wrap(value))
+        self._changed()
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self._changed()
+
+    def pop(self, *args):
+        self._changed()
+        return dict.pop(self, *args)
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return dict.__getitem__(self, key)
+
+    def update(self, *args, **kwargs):
+        for k, v in dict(*args, **kwargs).items():
+            self[k] = v
+
+    def clear(self):
+        dict.clear(self)
+        self._changed()
+
+class Rules(Rule_Section):
+    """
+    One personality in the PERSONALITIES format, plus compiled: for each
+    intervention kind, a tuple of (role, check) per action with any rules,
+    where role indexes ROLES and entries without a check always pass;
+    and the callout numbers (min_actions, min_inactions, threshold), or
+    None unless all three are given.  Actions whose rules name anybody
+    but the ROLES are left out, as will_intervene always skipped them.
+    """
+    __slots__ = ('_compiled',)
+
+    ROLES = ('self', 'action', 'performer', 'victim')
+    INTERVENTIONS = ('honest_intervention', 'calculated_intervention')
+
+    def __init__(self, personality=()):
+        self._compiled = None
+        Rule_Section.__init__(self, self, personality)
+
+    @property
+    def compiled(self):
+        if self._compiled is None:
+            compiled = {}
+            for kind in self.INTERVENTIONS:
+                compiled[kind] = actions = {}
+                for action, rules in self.get(kind, {}).items():
+                    if rules and all(role in self.ROLES for role in rules):
+                        actions[action] = tuple((self.ROLES.index(role), check) \
+                                                for role, check in rules.items() if check)
+            callout = self.get('callout', {})
+            compiled['callout'] = tuple(callout[k] for k in ('min_actions', 'min_inactions', 'threshold')) \
+                                  if all(k in callout for k in ('min_actions', 'min_inactions', 'threshold')) else None
+            self._compiled = compiled
+        return self._compiled
+
+PERSONALITIES = dict((name, Rules(rules)) for name, rules in PERSONALITIES.items())
+
 """
 The following dictionaries indicate what information
 is implied or suggested by performing certain actions.
@@ -102,4 +182,23 @@ WEIGHTS = {
     }
     
     
-    
\ No newline at end of file
+
+"""
+The following dictionary sets how likely each observed event is for a
+player whose hand does not back it, relative to one whose hand does,
+for the Bayesian hand beliefs in beliefs.py.
+
+For example:
+bluffed = .25, a player without a Captain steals a quarter as often as one with
+passed_as_victim = .2, a Captain lets a steal on himself go a fifth as often as anybody else
+suboptimal_move = .7, somebody who incomes is somewhat less likely a Duke
+
+These must be between 0 and 1
+"""
+
+BELIEFS = {
+    'bluffed': .25,
+    'passed_as_victim': .2,
+    'passed_as_spectator': .8,
+    'suboptimal_move': .7
+    }
@@ -5,267 +5,146 @@ behaviors and bluffs in order to win the game.
 
 """
 from __future__ import print_function
-from itertools import cycle
 from collections import Counter, defaultdict
 from coup import *
 from heuristics import PERSONALITIES
-from random import random
+from simulations import Yomi_Policy, game_rng
 
 __author__ = "William Dizon"
 __license__ = "GNU GPL v3.0"
 __version__ = "0.0.1"
 __email__ = "wdchromium@gmail.com"
 
-ACTIONS = defaultdict(list)
-BLOCKS_SAVIOR = defaultdict(list)
-BLOCKS_VICTIM = defaultdict(list)
-DOUBTS_ACTIONS = defaultdict(list)
-DOUBTS_RIGHT = defaultdict(list)
-DOUBTS_ACTIONS_RIGHT = defaultdict(list)
-DOUBTS_THRESHOLD_RIGHT = defaultdict(list)
-DOUBTS_THRESHOLD_WRONG = defaultdict(list)
-WINS = defaultdict(int)
-ILL_ACT = defaultdict(list)
-ILL_TAR = defaultdict(list)
-    
-def simulation(players):
-    testgame = Play_Coup(players, PERSONALITIES.keys())
+class Statistics(Observer):
+    """
+    Running tallies of what happens in observed games.  Every field is a
+    Counter, or a defaultdict of Counters, over a fixed set of hands,
+    personalities, actions and judged scores, so it stays the same size
+    however many games are played; merge() adds another's tallies in,
+    as from a worker process.
+    """
+    __slots__ = ('hands', 'wins', 'actions', 'blocks_savior', 'blocks_victim', 'doubts_actions',
+                 'doubts_right', 'doubts_actions_right', 'doubts_threshold_right',
+                 'doubts_threshold_wrong', 'ill_act', 'ill_tar')
 
-    for acting_player in cycle(testgame.players):
-        if not acting_player.influence_remaining:
-            continue
-        elif len(testgame) == 1:
-            WINS[acting_player.saved_personality] += 1
-            return testgame
-            
-        action_plan = []
-        remaining_opponent = None
-        
-        if len(testgame) == 2:
-            remaining_opponent = acting_player.select_opponent(testgame.players)
-            action_plan = acting_player.one_on_one_strategy(remaining_opponent.best_guess, True)
-        
-        while 1:
-            try:
-                if action_plan:
-                    action = action_plan.pop(0)
-                else:
-                    action = acting_player.random_naive_priority()
+    THRESHOLD_LIMIT = 99 #judged scores beyond this are tallied as this
 
-                if action == 'income':
-                    acting_player.perform(action)
-                    ACTIONS[acting_player.alpha].append(action)
-                    break
-                if action == 'tax':
-                    acting_player.perform(action)
-                    ACTIONS[acting_player.alpha].append(action)
-                    break
-                elif action == 'coup':
-                    if remaining_opponent:
-                        victim = remaining_opponent
-                    else:
-                        for random_opponent in testgame.filter_out_players([acting_player]):
-                            if not acting_player.wins_duel(random_opponent):
-                                victim = random_opponent
-                                break
-                            else:
-                                victim = acting_player.select_opponent(testgame.players)
-                                
-                    position, random_target = victim.random_remaining_influence
-                    acting_player.perform(action, random_target)
-                    victim.remove_suspicion(str(random_target))
-                    ACTIONS[acting_player.alpha].append(action)
-                    break
-                elif action == 'foreign_aid':
-                    for savior in testgame.filter_out_players([acting_player]):
-                        if not savior.wins_duel(acting_player):
-                            opponent = savior
-                            break
-                    else:
-                        opponent = None
-                                
-                    if opponent and opponent.will_intervene(action, acting_player):
-                        for spectators in testgame.filter_out_players([acting_player, opponent]):
-                            spectators.didnt_block_as['spectator'].extend([action])
-                        
-                        if acting_player.will_callout('block_foreign_aid', opponent) and \
-                            acting_player.plays_numbers and \
-                            random() > AI_Persona.probability_player_influences(testgame.players, opponent, 'Duke', acting_player):                                    
-                            if action not in opponent.valid_blocks:
-                                acting_player.perform(action)
-                                ACTIONS[acting_player.alpha].append(action)
-                            raise QuestionInfluence(acting_player, opponent, 'Duke', testgame.court_deck, 'foreign_aid')
-                        elif action in opponent.valid_blocks:
-                            raise BlockedAction(action, acting_player, None, opponent)
+    def __init__(self):
+        self.hands = Counter()
+        self.wins = Counter()
+        for field in self.__slots__[2:]:
+            setattr(self, field, defaultdict(Counter))
 
-                    acting_player.perform(action)
-                    ACTIONS[acting_player.alpha].append(action)
-                    break
-                elif action == 'steal':
-                    if remaining_opponent:
-                        victim = remaining_opponent
-                    else:
-                        for opponent in testgame.filter_out_players([acting_player]):
-                            if not acting_player.wins_duel(opponent) and action not in opponent.calculate('judge', 'blocks'):
-                                victim = opponent
-                                break
-                        else:
-                            victim = acting_player.select_opponent(testgame.players)
+    def __call__(self, outcome):
+        if outcome.result == Outcome.SUCCEEDED:
+            self.actions[outcome.performer.alpha][outcome.action] += 1
+        elif outcome.result == Outcome.ILLEGAL:
+            if issubclass(outcome.reason[0], IllegalTarget):
+                self.ill_tar[outcome.performer.alpha][outcome.reason[1]] += 1
+            else:
+                self.ill_act[outcome.performer.alpha][outcome.reason[1]] += 1
+        elif outcome.result == Outcome.BLOCKED:
+            if outcome.spectator:
+                self.blocks_savior[outcome.spectator.saved_personality][outcome.action] += 1
+            else:
+                self.blocks_victim[outcome.victim.saved_personality][outcome.action] += 1
+        elif outcome.result == Outcome.CHALLENGED:
+            doubter = outcome.doubter.saved_personality
+            self.doubts_actions[doubter][outcome.action] += 1
+            self.doubts_right[doubter][outcome.doubter_is_correct] += 1
+            self.doubts_actions_right[outcome.action][outcome.doubter_is_correct] += 1
 
-                    if action in victim.valid_blocks:
-                        raise BlockedAction(action, acting_player, victim, None)
-                    else:
-                        for savior in testgame.filter_out_players([acting_player, victim]):
-                            representing = savior.will_intervene(action, acting_player, victim)
-                            if representing:
-                                #logic to doubt savior (ambassador doesnt leave hints, so excess failed callouts)
-                                '''for doubter in testgame.filter_out_players([acting_player, savior, victim]):
-                                    if doubter.will_callout('block_steal', savior):
-                                        if action not in savior.valid_blocks:
-                                            acting_player.perform(action, victim)
-                                            self.ACTIONS[acting_player.alpha].append(action)
-                                        raise QuestionInfluence(doubter, savior, representing, testgame.court_deck, 'block_steal')
-                                '''
-                                for spectators in testgame.filter_out_players([acting_player, savior, victim]):
-                                    spectators.didnt_block_as['spectator'].extend([action])  
-                                raise BlockedAction(action, acting_player, victim, savior)
-                                
-                        for doubter in testgame.filter_out_players([acting_player]):
-                            if doubter.will_callout(action, acting_player):
-                                if action in acting_player.valid_actions:
-                                    acting_player.perform(action, victim)
-                                    ACTIONS[acting_player.alpha].append(action)
-                                raise QuestionInfluence(doubter, acting_player, 'Captain', testgame.court_deck, 'steal')
-                    
-                        acting_player.perform(action, victim)
-                        ACTIONS[acting_player.alpha].append(action)
-                        for spectators in testgame.filter_out_players([acting_player]):
-                            spectators.didnt_block_as['spectator'].extend([action])
-                        break
-                elif action == 'assassinate':
-                    if remaining_opponent:
-                        victim = remaining_opponent
-                    else:
-                        for opponent in testgame.filter_out_players([acting_player]):
-                            if not acting_player.wins_duel(opponent) and \
-                                random() > AI_Persona.probability_player_influences(testgame.players, opponent, 'Contessa', acting_player):
-                                victim = opponent
-                                break
-                        else:
-                            victim = acting_player.select_opponent(testgame.players)
+            threshold = outcome.performer.judge_player.get(outcome.influence, 0)
+            threshold = max(-self.THRESHOLD_LIMIT, min(threshold, self.THRESHOLD_LIMIT))
+            if outcome.doubter_is_correct:
+                self.doubts_threshold_right[doubter][threshold] += 1
+            else:
+                self.doubts_threshold_wrong[doubter][threshold] += 1
 
-                    if action in victim.valid_blocks:
-                        raise BlockedAction(action, acting_player, victim, None)
-                    else:
-                        for savior in testgame.filter_out_players([acting_player, victim]):
-                            representing = savior.will_intervene(action, acting_player, victim)
-                            if representing:
-                                for spectators in testgame.filter_out_players([acting_player, savior, victim]):
-                                    spectators.didnt_block_as['spectator'].extend([action])
-                                #omitted logic to doubt savior (contessa doesnt leave hints, so excess failed callouts)
-                                raise BlockedAction(action, acting_player, victim, savior)
-                        
-                        for doubter in testgame.filter_out_players([acting_player]):
-                            if doubter.will_callout(action, acting_player):
-                                if action in acting_player.valid_actions:
-                                    position, random_target = victim.random_remaining_influence
-                                    acting_player.perform(action, random_target)
-                                    ACTIONS[acting_player.alpha].append(action)
-                                    victim.remove_suspicion(str(random_target))
-                                raise QuestionInfluence(doubter, acting_player, 'Assassin', testgame.court_deck, 'assassinate')
+    def end(self, game):
+        self.hands[game.winner.alpha] += 1
+        self.wins[game.winner.saved_personality] += 1
 
-                        position, random_target = victim.random_remaining_influence
-                        acting_player.perform(action, random_target)
-                        victim.remove_suspicion(str(random_target))
-                        ACTIONS[acting_player.alpha].append(action)
-                        for spectators in testgame.filter_out_players([acting_player, victim]):
-                            spectators.didnt_block_as['spectator'].extend([action])
-                        break
-                elif action == 'exchange':
-                    for doubter in testgame.filter_out_players([acting_player]):
-                        if doubter.will_callout(action, acting_player) and \
-                            doubter.plays_numbers and \
-                            random() > AI_Persona.probability_player_influences(testgame.players, acting_player, 'Ambassador', doubter):
-                            if action in acting_player.valid_actions:
-                                acting_player.perform(action, testgame.court_deck)
-                                ACTIONS[acting_player.alpha].append(action)
-                            raise QuestionInfluence(doubter, acting_player, 'Ambassador', testgame.court_deck, 'exchange')
-                            
-                    acting_player.perform(action, testgame.court_deck)
-                    ACTIONS[acting_player.alpha].append(action)
-                    break
-            except IllegalAction as e:
-                ILL_ACT[acting_player.alpha].append(e.message)
-            except IllegalTarget as e:
-                ILL_TAR[acting_player.alpha].append(e.message)
-            except BlockedAction as e:
-                if e.spectator:
-                    BLOCKS_SAVIOR[e.spectator.saved_personality].append(action)
-                else:
-                    BLOCKS_VICTIM[e.victim.saved_personality].append(action)
-                break
-            except QuestionInfluence as e:
-                DOUBTS_ACTIONS[e.doubter.saved_personality].append(e.action)
-                DOUBTS_RIGHT[e.doubter.saved_personality].append(e.doubter_is_correct)
-                DOUBTS_ACTIONS_RIGHT[e.action].append(e.doubter_is_correct)
-                
-                threshold = e.alleged_bluffer.judge_player.get(e.alleged_influence, 0)
-                if e.doubter_is_correct:
-                    DOUBTS_THRESHOLD_RIGHT[e.doubter.saved_personality].append(threshold)
-                else:
-                    DOUBTS_THRESHOLD_WRONG[e.doubter.saved_personality].append(threshold)
-                break
-                         
-        
-if __name__ == "__main__":
-    PLAYERS = 5
-    SIMULATIONS_TO_RUN = 1000
-    
-    c = Counter()
-    for _ in range(SIMULATIONS_TO_RUN):
-        c.update([simulation(PLAYERS).winner.alpha,])
-        
-    for i,v in c.most_common():
-        print('{0}{1}'.format(i.ljust(25), v))
-    
-    print()
-    print('ACTIONS')
-    for inf in ACTIONS:
-        print('  {0}{1}'.format(inf.ljust(25), dict(Counter(ACTIONS[inf]).most_common())))
+    def merge(self, other):
+        self.hands.update(other.hands)
+        self.wins.update(other.wins)
+        for field in self.__slots__[2:]:
+            mine = getattr(self, field)
+            for key, counts in getattr(other, field).items():
+                mine[key].update(counts)
+        return self
+
+    def __getstate__(self):
+        return dict((field, getattr(self, field)) for field in self.__slots__)
+
+    def __setstate__(self, state):
+        for field, value in state.items():
+            setattr(self, field, value)
+
+    def report(self):
+        """the lines play.py prints after its games"""
+        def histogram(counts):
+            return ''.join('{0}:{1}  '.format(str(k).rjust(3), str(v).ljust(3)) for k,v in sorted(counts.items()))
+
+        lines = ['{0}{1}'.format(i.ljust(25), v) for i,v in self.hands.most_common()]
+
+        lines += ['', 'ACTIONS']
+        lines += ['  {0}{1}'.format(inf.ljust(25), dict(c.most_common())) for inf, c in self.actions.items()]
+
+        lines.append('WINS')
+        lines += ['    {0}{1}'.format(pers.ljust(23), v) for pers, v in self.wins.items()]
 
-    print('WINS')
-    for pers in WINS:
-        print('    {0}{1}'.format(pers.ljust(23), WINS[pers]))
+        lines += ['BLOCKS', '  Spectator']
+        lines += ['    {0}{1}'.format(pers.ljust(23), dict(c.most_common())) for pers, c in self.blocks_savior.items()]
+        lines.append('  Victim')
+        lines += ['    {0}{1}'.format(pers.ljust(23), dict(c.most_common())) for pers, c in self.blocks_victim.items()]
 
-    print('BLOCKS')
-    print('  Spectator')
-    for pers in BLOCKS_SAVIOR:
-        print('    {0}{1}'.format(pers.ljust(23), dict(Counter(BLOCKS_SAVIOR[pers]).most_common())))
+        lines += ['CALLOUTS', '  Actions']
+        for pers, c in self.doubts_actions.items():
+            lines.append('    {0}{1}'.format(pers.ljust(25), dict(c.most_common())))
+            lines.append('    {0}{1}'.format(''.ljust(25), dict(self.doubts_right[pers].most_common())))
+        lines += ['    {0}{1}'.format(action.ljust(25), dict(c.most_common())) \
+                  for action, c in self.doubts_actions_right.items()]
 
-    print('  Victim')      
-    for pers in BLOCKS_VICTIM:
-        print('    {0}{1}'.format(pers.ljust(23), dict(Counter(BLOCKS_VICTIM[pers]).most_common())))
-    
-    print('CALLOUTS')
-    print('  Actions')
-    for pers in DOUBTS_ACTIONS:
-        print('    {0}{1}'.format(pers.ljust(25), dict(Counter(DOUBTS_ACTIONS[pers]).most_common())))
-        print('    {0}{1}'.format(''.ljust(25), dict(Counter(DOUBTS_RIGHT[pers]).most_common())))
-    for action in DOUBTS_ACTIONS_RIGHT:
-        print('    {0}{1}'.format(action.ljust(25), dict(Counter(DOUBTS_ACTIONS_RIGHT[action]).most_common())))        
-    
-    print('  DOUBTER WRONG- Threshold:Frequency')
-    for personality in DOUBTS_THRESHOLD_WRONG:
-        print('    {0}{1}'.format(personality.ljust(25), ''.join('{0}:{1}  '.format(str(k).rjust(3),str(v).ljust(3)) for k,v in sorted(Counter(DOUBTS_THRESHOLD_WRONG[personality]).most_common()))))
+        lines.append('  DOUBTER WRONG- Threshold:Frequency')
+        lines += ['    {0}{1}'.format(pers.ljust(25), histogram(c)) for pers, c in self.doubts_threshold_wrong.items()]
+        lines.append('  DOUBTER RIGHT- Threshold:Frequency')
+        lines += ['    {0}{1}'.format(pers.ljust(25), histogram(c)) for pers, c in self.doubts_threshold_right.items()]
+
+        lines += ['EXCEPTIONS', '  IllegalAction']
+        lines += ['    {0}{1}'.format(inf.ljust(25), dict(c.most_common())) for inf, c in self.ill_act.items()]
+        lines.append('  IllegalTarget')
+        lines += ['    {0}{1}'.format(inf.ljust(25), dict(c.most_common())) for inf, c in self.ill_tar.items()]
+        return lines
+
+STATISTICS = Statistics()
+
+def simulation(players, rng=None, statistics=STATISTICS):
+    return Play_Coup(players, PERSONALITIES.keys(), rng).play(Yomi_Policy(), statistics)
+
+def collect(chunk):
+    """Statistics of games start to stop of a seeded run, for merging"""
+    players, seed, start, stop = chunk
+    statistics = Statistics()
+    for game in range(start, stop):
+        simulation(players, game_rng(seed, game), statistics)
+    return statistics
+
+if __name__ == "__main__":
+    from multiprocessing.pool import Pool
+    from random import getrandbits
+
+    PLAYERS = 5
+    SIMULATIONS_TO_RUN = 1000
+    GAMES_PER_CHUNK = 250
 
-    print('  DOUBTER RIGHT- Threshold:Frequency')
-    for personality in DOUBTS_THRESHOLD_RIGHT:
-        print('    {0}{1}'.format(personality.ljust(25), ''.join('{0}:{1}  '.format(str(k).rjust(3),str(v).ljust(3)) for k,v in sorted(Counter(DOUBTS_THRESHOLD_RIGHT[personality]).most_common()))))
+    seed = getrandbits(64)
+    pool = Pool()
+    for partial in pool.imap_unordered(collect, [(PLAYERS, seed, start, min(start + GAMES_PER_CHUNK, SIMULATIONS_TO_RUN)) \
+                                                 for start in range(0, SIMULATIONS_TO_RUN, GAMES_PER_CHUNK)]):
+        STATISTICS.merge(partial)
+    pool.close()
+    pool.join()
 
-    print('EXCEPTIONS')
-    print('  IllegalAction')
-    for inf in ILL_ACT:
-        print('    {0}{1}'.format(inf.ljust(25), dict(Counter(ILL_ACT[inf]).most_common())))
-    print('  IllegalTarget')
-    for inf in ILL_TAR:
-        print('    {0}{1}'.format(inf.ljust(25), dict(Counter(ILL_TAR[inf]).most_common())))
+    for line in STATISTICS.report():
+        print(line)
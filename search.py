@@ -0,0 +1,189 @@
+"""
+Python scripts to simulate the game "The Resistance: Coup designed by Rikki Tahta
+The purpose of this project is to model human personalities and predict/score
+behaviors and bluffs in order to win the game.
+
+Information-set Monte Carlo search.  A Search_Persona picks its action
+and target by sampling the hands it cannot see, consistent with every
+revealed card, playing each candidate move in place and rolling the game
+out with a cheap policy; the candidates share the iterations by UCB1.
+Rollouts reaching a duel are scored by the exact duel odds instead.
+
+"""
+
+__author__ = "William Dizon"
+__license__ = "GNU GPL v3.0"
+__version__ = "0.0.1"
+__email__ = "wdchromium@gmail.com"
+
+from coup import Play_Coup, AI_Persona, Policy
+from simulations import Naive_Policy, Yomi_Policy
+from heuristics import PERSONALITIES
+
+class First_Move(object):
+    """the rollout policy, except that the acting player's first choice is move"""
+    __slots__ = ('move', 'rollout')
+
+    def __init__(self, move, rollout):
+        self.move = move
+        self.rollout = rollout
+
+    def __getattr__(self, name):
+        return getattr(self.rollout, name)
+
+    def plan(self, turn):
+        turn.plan = [self.move[0]]
+        turn.opponent = self.move[1]
+
+    def select_action(self, turn):
+        if turn.plan:
+            return turn.plan.pop(0)
+        return self.rollout.select_action(turn)
+
+    def target(self, turn, action):
+        if turn.opponent is not None:
+            return turn.opponent
+        return self.rollout.target(turn, action)
+
+class Search_Persona(AI_Persona):
+    """
+    AI_Persona choosing its own moves by information-set MCTS.
+
+    Each decision runs iterations samples, or as many as fit in
+    time_budget seconds if that is set; a rollout stops after depth
+    turns and is then scored by remaining influence and coins.  Given a
+    transpositions.Transposition_Table, the samples of each position are
+    kept there and resumed whenever the position recurs, positions keyed
+    by what this player can see of them (Play_Coup.zobrist_for).
+    """
+    __slots__ = ('iterations', 'time_budget', 'depth', 'exploration', 'rollout', 'table')
+
+    def __init__(self, personality='passive', iterations=48, time_budget=None, depth=12,
+                 exploration=.7, rollout=None, table=None):
+        AI_Persona.__init__(self, personality)
+        self.iterations = iterations
+        self.time_budget = time_budget
+        self.depth = depth
+        self.exploration = exploration
+        self.rollout = rollout or Naive_Policy()
+        self.table = table
+
+    @classmethod
+    def seat(cls, game, seat, **kwargs):
+        """replaces the AI_Persona at seat with a searcher holding the same cards and coins"""
+        old = game.players[seat]
+        searcher = cls(old.saved_personality, **kwargs)
+        searcher.rng = game.rng
+        searcher.coins = old.coins
+        searcher.hold('left', old.left)
+        searcher.hold('right', old.right)
+        game.players[seat] = searcher
+        return searcher
+
+    def moves(self, game):
+        """every (action, victim) this player may try, victim None if untargeted"""
+        opponents = [p for p in game.players if p is not self and p.influence_remaining]
+        if self.coins >= 10:
+            return [('coup', p) for p in opponents]
+
+        moves = []
+        for action in Policy.ACTIONS:
+            if action == 'coup' and self.coins < 7:
+                continue
+            elif action == 'assassinate' and self.coins < 3:
+                continue
+            elif action in Play_Coup.ACTIONS['targets_influence'] or \
+                 action in Play_Coup.ACTIONS['targets_player']:
+                moves.extend((action, p) for p in opponents)
+            else:
+                moves.append((action, None))
+        return moves
+
+    def determinize(self, game):
+        """deals the cards this player cannot see afresh among the unrevealed slots and deck"""
+        slots = [(p, position) for p in game.players if p is not self \
+                               for position in ('left', 'right') if not getattr(p, position).revealed]
+        hidden = [getattr(p, position) for p, position in slots] + game.court_deck
+        self.rng.shuffle(hidden)
+        for (p, position), card in zip(slots, hidden):
+            p.hold(position, card)
+        game.court_deck[:] = hidden[len(slots):]
+
+    def evaluate(self, game):
+        """this player's share of what remains: 1.0 if won, 0.0 if out"""
+        if not self.influence_remaining:
+            return 0.0
+        alive = [p for p in game.players if p.influence_remaining]
+        if len(alive) == 1:
+            return 1.0
+        elif len(alive) == 2:
+            opponent = alive[alive[0] is self]
+            if game.players[game.turn] is self:
+                return self.win_probability(opponent)
+            return 1.0 - opponent.win_probability(self)
+
+        def strength(p):
+            return p.influence_remaining + p.coins / 7.0
+        return strength(self) / sum(strength(p) for p in alive)
+
+    def search(self, game):
+        """the (action, victim) with the best average over sampled rollouts"""
+        from math import log, sqrt
+        from time import time
+
+        moves = self.moves(game)
+        if len(moves) == 1:
+            return moves[0]
+
+        visits = [0] * len(moves)
+        totals = [0.0] * len(moves)
+        if self.table is not None:
+            key = game.zobrist_for(self)
+            seen = self.table.get(key)
+            if seen is not None and len(seen[0]) == len(moves):
+                visits, totals = list(seen[0]), list(seen[1])
+        deadline = None if self.time_budget is None else time() + self.time_budget
+
+        iteration = 0
+        while (iteration < self.iterations) if deadline is None else (time() < deadline):
+            iteration += 1
+            if 0 in visits:
+                pick = visits.index(0)
+            else:
+                bound = self.exploration * sqrt(log(sum(visits)))
+                pick = max(range(len(moves)),
+                           key=lambda i: totals[i] / visits[i] + bound / sqrt(visits[i]))
+
+            game.push()
+            try:
+                self.determinize(game)
+                game.step(First_Move(moves[pick], self.rollout))
+                for _ in range(self.depth):
+                    if not game.step(self.rollout):
+                        break
+                totals[pick] += self.evaluate(game)
+            finally:
+                game.undo()
+            visits[pick] += 1
+
+        if self.table is not None:
+            self.table.put(key, (visits, totals), sum(visits))
+        return moves[max(range(len(moves)), key=lambda i: (visits[i], totals[i]))]
+
+class Search_Policy(Yomi_Policy):
+    """Yomi_Policy, but Search_Personas plan their own turns"""
+
+    def plan(self, turn):
+        if isinstance(turn.player, Search_Persona):
+            action, victim = turn.player.search(turn.game)
+            turn.plan = [action]
+            turn.opponent = victim
+        else:
+            Yomi_Policy.plan(self, turn)
+
+def sim_search_against_yomi(players, rng=None, observer=None, searchers=1, **kwargs):
+    """the first searchers seats search; everyone else plays sim_a_full_on_yomi"""
+    game = Play_Coup(players, PERSONALITIES.keys(), rng)
+    for seat in range(searchers):
+        Search_Persona.seat(game, seat, **kwargs)
+    return game.play(Search_Policy(), observer)
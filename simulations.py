@@ -11,18 +11,177 @@ __version__ = "0.0.1"
 __email__ = "wdchromium@gmail.com"
 
 from coup import *
-from itertools import cycle
+from itertools import cycle, islice
 from heuristics import PERSONALITIES
-from random import random, choice
 
-def run(simulation, players, iterations):
+def game_rng(seed, game):
+    """independent, reproducible stream for the game-th game of a seeded run"""
+    from random import Random
+    return Random('{0}:{1}'.format(seed, game))
+
+def run(simulation, players, iterations, seed=None, observer=None, processes=1, chunksize=1000, pool=None):
+    """
+    Wins per winning hand over iterations games of simulation.
+
+    Game n always plays from game_rng(seed, n), so a seeded run gives the
+    same counts however it is split.  With processes other than 1 (None
+    for every core) or an existing multiprocessing pool, the games are
+    dealt out in chunks of chunksize; each worker counts its own chunk
+    and only those counts come back.  observer only works serially.
+    """
     from collections import Counter
+    from random import getrandbits
+
+    if seed is None:
+        seed = getrandbits(64)
+
+    if processes == 1 and pool is None:
+        return run_chunk((simulation, players, seed, 0, iterations, observer))
+    elif observer is not None:
+        raise ValueError('an observer cannot follow games played in other processes')
+
+    chunks = [(simulation, players, seed, start, min(start + chunksize, iterations), None) \
+              for start in range(0, iterations, chunksize)]
     wins = Counter()
-    for _ in range(iterations):
-        wins.update([simulation(players).winner.alpha,])
+    if pool is None:
+        from multiprocessing.pool import Pool
+        workers = Pool(processes)
+        try:
+            for partial in workers.imap_unordered(run_chunk, chunks):
+                wins.update(partial)
+        finally:
+            workers.close()
+            workers.join()
+    else:
+        for partial in pool.imap_unordered(run_chunk, chunks):
+            wins.update(partial)
     return dict(wins)
 
-def sim_random_actions_random_targets_no_blocking(players):
+def run_chunk(chunk):
+    """wins per winning hand over games start to stop of a seeded run, as run() deals them out"""
+    from collections import Counter
+
+    simulation, players, seed, start, stop, observer = chunk
+    wins = Counter()
+    for game in range(start, stop):
+        wins[simulation(players, game_rng(seed, game), observer).winner.alpha] += 1
+    return dict(wins)
+
+class Selfish_Blocks_Policy(Policy):
+    victims_block = True
+
+    def savior(self, turn, action, victim):
+        if action == 'foreign_aid':
+            random_player = turn.player.select_opponent(turn.game.players)
+            if action in random_player.valid_block_set:
+                return random_player
+
+class Naive_Policy(Policy):
+    victims_block = True
+
+    def select_action(self, turn):
+        return turn.player.random_naive_priority()
+
+class Selfish_Naive_Policy(Naive_Policy):
+    rethought = frozenset(['steal'])
+
+    def savior(self, turn, action, victim):
+        if action == 'foreign_aid':
+            for savior in self.others(turn, turn.player):
+                if action in savior.valid_block_set:
+                    return savior
+
+class Calculated_Blocks_Policy(Naive_Policy):
+    rethought = frozenset(['steal', 'assassinate'])
+    forgets_revealed = True
+
+    def savior(self, turn, action, victim):
+        for savior in self.others(turn, turn.player, victim):
+            if savior.will_intervene(action, turn.player, victim):
+                return savior
+
+class More_Calculated_Blocks_Policy(Calculated_Blocks_Policy):
+    rethink_chance = .76
+
+class Systemic_Doubts_Policy(Calculated_Blocks_Policy):
+    doubted = frozenset(['steal', 'assassinate', 'exchange'])
+    lapses_undoubted = frozenset(['exchange'])
+    rethink_chance = .67
+    records_inaction = True
+    noted_interventions = frozenset(['foreign_aid'])
+
+    def unnoted(self, turn, action, victim):
+        if action == 'steal': #the original loop spared the last savior it asked, not the victim
+            return (turn.player,) + tuple(islice(self.others(turn, turn.player, victim), 1))
+        return turn.player, victim
+
+class Yomi_Policy(Systemic_Doubts_Policy):
+    rethought = frozenset()
+    lapses_undoubted = frozenset()
+    noted_interventions = Policy.noted_interventions
+
+    def unnoted(self, turn, action, victim):
+        if action == 'steal':
+            return turn.player,
+        return turn.player, victim
+
+    def plan(self, turn):
+        if len(turn.game) == 2:
+            turn.opponent = turn.player.select_opponent(turn.game.players)
+            turn.plan = turn.player.one_on_one_strategy(turn.opponent.best_guess, True)
+
+    def select_action(self, turn):
+        if turn.plan:
+            return turn.plan.pop(0)
+        return turn.player.random_naive_priority()
+
+    def target(self, turn, action):
+        if turn.opponent:
+            return turn.opponent
+
+        acting_player = turn.player
+        for opponent in self.others(turn, acting_player):
+            if acting_player.wins_duel(opponent):
+                continue
+            elif action == 'steal' and action in opponent.calculate('judge', 'blocks'):
+                continue
+            elif action == 'assassinate' and \
+                acting_player.rng.random() <= turn.game.cards.probability(acting_player, opponent, 'Contessa'):
+                continue
+            return opponent
+        return acting_player.select_opponent(turn.game.players)
+
+    def savior(self, turn, action, victim):
+        if action != 'foreign_aid':
+            return Systemic_Doubts_Policy.savior(self, turn, action, victim)
+
+        for savior in self.others(turn, turn.player):
+            if not savior.wins_duel(turn.player):
+                if savior.will_intervene(action, turn.player):
+                    return savior
+                break
+
+    def block_doubter(self, turn, action, savior):
+        acting_player = turn.player
+        if action == 'foreign_aid' and \
+            acting_player.will_callout('block_foreign_aid', savior) and \
+            acting_player.plays_numbers and \
+            acting_player.rng.random() > turn.game.cards.probability(acting_player, savior, 'Duke'):
+            return acting_player
+
+    def block_stands(self, turn, action, savior):
+        return action != 'foreign_aid' or action in savior.valid_block_set
+
+    def doubter(self, turn, action):
+        for doubter in self.others(turn, turn.player):
+            if doubter.will_callout(action, turn.player):
+                if action != 'exchange':
+                    return doubter
+                elif doubter.plays_numbers and \
+                    doubter.rng.random() > turn.game.cards.probability(doubter, turn.player, 'Ambassador'):
+                    return doubter
+
+def sim_random_actions_random_targets_no_blocking(players, rng=None, observer=None):
     """
     AI PROFILE:
 
@@ -36,40 +195,9 @@ def sim_random_actions_random_targets_no_blocking(players):
     exchange        yes         random      no
 
     """
-    testgame = Play_Coup(players, PERSONALITIES.keys())
-
-    for acting_player in cycle(testgame.players):
-        if not acting_player.influence_remaining:
-            continue
-        elif len(testgame) == 1:
-            return testgame
-
-        while 1:
-            try:
-                action = choice(list(Play_Coup.ACTIONS['all']))
-                if action == 'steal':
-                    random_player = acting_player.select_opponent(testgame.players)
-                    acting_player.perform(action, random_player)
-                elif action == 'assassinate':
-                    random_player = acting_player.select_opponent(testgame.players)
-                    position, random_target = random_player.random_remaining_influence
-                    acting_player.perform(action, random_target)
-                elif action == 'foreign_aid':
-                    acting_player.perform(action)
-                elif action == 'exchange':
-                    acting_player.perform(action, testgame.court_deck)
-                elif action == 'coup':
-                    random_player = acting_player.select_opponent(testgame.players)
-                    position, random_target = random_player.random_remaining_influence
-                    acting_player.perform(action, random_target)
-                else:
-                    acting_player.perform(action)
-            except (IllegalTarget, IllegalAction):
-                pass
-            else:
-                break
+    return Play_Coup(players, PERSONALITIES.keys(), rng).play(Policy(), observer)
 
-def sim_random_actions_random_targets_selfish_blocks_no_doubts(players):
+def sim_random_actions_random_targets_selfish_blocks_no_doubts(players, rng=None, observer=None):
     """
     AI PROFILE:
 
@@ -83,49 +211,9 @@ def sim_random_actions_random_targets_selfish_blocks_no_doubts(players):
     exchange        yes         random      no
 
     """
-    testgame = Play_Coup(players, PERSONALITIES.keys())
-
-    for acting_player in cycle(testgame.players):
-        if not acting_player.influence_remaining:
-            continue
-        elif len(testgame) == 1:
-            return testgame
-
-        while 1:
-            try:
-                action = choice(list(Play_Coup.ACTIONS['all']))
-                if action == 'steal':
-                    random_player = acting_player.select_opponent(testgame.players)
-                    if action in random_player.valid_blocks:
-                        raise BlockedAction(action, acting_player, random_player, None)
-                    acting_player.perform(action, random_player)
-                elif action == 'assassinate':
-                    random_player = acting_player.select_opponent(testgame.players)
-                    if action in random_player.valid_blocks:
-                        raise BlockedAction(action, acting_player, random_player, None)
-                    position, random_target = random_player.random_remaining_influence
-                    acting_player.perform(action, random_target)
-                elif action == 'foreign_aid':
-                    random_player = acting_player.select_opponent(testgame.players)
-                    if action in random_player.valid_blocks:
-                        raise BlockedAction(action, acting_player, None, random_player)
-                    acting_player.perform(action)
-                elif action == 'exchange':
-                    acting_player.perform(action, testgame.court_deck)
-                elif action == 'coup':
-                    random_player = acting_player.select_opponent(testgame.players)
-                    position, random_target = random_player.random_remaining_influence
-                    acting_player.perform(action, random_target)
-                else:
-                    acting_player.perform(action)
-            except (IllegalTarget, IllegalAction):
-                pass
-            except BlockedAction:
-                break
-            else:
-                break
+    return Play_Coup(players, PERSONALITIES.keys(), rng).play(Selfish_Blocks_Policy(), observer)
 
-def sim_naive_actions_calculated_targets_selfish_blocks_no_doubts(players):
+def sim_naive_actions_calculated_targets_selfish_blocks_no_doubts(players, rng=None, observer=None):
     """
     AI PROFILE:
 
@@ -139,53 +227,9 @@ def sim_naive_actions_calculated_targets_selfish_blocks_no_doubts(players):
     exchange        yes         unlikely    no
 
     """
-    testgame = Play_Coup(players, PERSONALITIES.keys())
-
-    for acting_player in cycle(testgame.players):
-        if not acting_player.influence_remaining:
-            continue
-        elif len(testgame) == 1:
-            return testgame
-
-        while 1:
-            try:
-                action = acting_player.random_naive_priority()
-                if action == 'steal':
-                    random_player = acting_player.select_opponent(testgame.players)
-                    if action in random_player.calculate('probable', 'blocks'):
-                        raise RethinkAction(action, acting_player, random_player)
-                    if action in random_player.valid_blocks:
-                        raise BlockedAction(action, acting_player, random_player, None)
-                    acting_player.perform(action, random_player)
-                elif action == 'assassinate':
-                    random_player = acting_player.select_opponent(testgame.players)
-                    if action in random_player.valid_blocks:
-                        raise BlockedAction(action, acting_player, random_player, None)
-                    position, random_target = random_player.random_remaining_influence
-                    acting_player.perform(action, random_target)
-                elif action == 'foreign_aid':
-                    for savior in testgame.filter_out_players([acting_player]):
-                        if action in savior.valid_blocks:
-                            raise BlockedAction(action, acting_player, None, savior)
-                    acting_player.perform(action)
-                elif action == 'exchange':
-                    acting_player.perform(action, testgame.court_deck)
-                elif action == 'coup':
-                    random_player = acting_player.select_opponent(testgame.players)
-                    position, random_target = random_player.random_remaining_influence
-                    acting_player.perform(action, random_target)
-                else:
-                    acting_player.perform(action)
-            except (IllegalTarget, IllegalAction):
-                pass
-            except RethinkAction:
-                pass
-            except BlockedAction:
-                break
-            else:
-                break
+    return Play_Coup(players, PERSONALITIES.keys(), rng).play(Selfish_Naive_Policy(), observer)
 
-def sim_naive_actions_calculated_targets_calculated_blocks_no_doubts(players):
+def sim_naive_actions_calculated_targets_calculated_blocks_no_doubts(players, rng=None, observer=None):
     """
     AI PROFILE:
 
@@ -199,65 +243,9 @@ def sim_naive_actions_calculated_targets_calculated_blocks_no_doubts(players):
     exchange        yes         random      no
 
     """
-    testgame = Play_Coup(players, PERSONALITIES.keys())
-
-    for acting_player in cycle(testgame.players):
-        if not acting_player.influence_remaining:
-            continue
-        elif len(testgame) == 1:
-            return testgame
-
-        while 1:
-            try:
-                action = acting_player.random_naive_priority()
-                if action == 'steal':
-                    random_player = acting_player.select_opponent(testgame.players)
-                    if action in random_player.calculate('probable', 'blocks'):
-                        raise RethinkAction(action, acting_player, random_player)
-                    if action in random_player.valid_blocks:
-                        raise BlockedAction(action, acting_player, random_player, None)
-
-                    for savior in testgame.filter_out_players([acting_player, random_player]):
-                        if savior.will_intervene(action, acting_player, random_player):
-                            raise BlockedAction(action, acting_player, random_player, savior)
-                    acting_player.perform(action, random_player)
-                elif action == 'assassinate':
-                    random_player = acting_player.select_opponent(testgame.players)
-                    if action in random_player.calculate('probable', 'blocks'):
-                        raise RethinkAction(action, acting_player, random_player)
-                    if action in random_player.valid_blocks:
-                        raise BlockedAction(action, acting_player, random_player, None)
-
-                    for savior in testgame.filter_out_players([acting_player, random_player]):
-                        if savior.will_intervene(action, acting_player, random_player):
-                            raise BlockedAction(action, acting_player, random_player, savior)
-                    position, random_target = random_player.random_remaining_influence
-                    acting_player.perform(action, random_target)
-                    random_player.remove_suspicion(str(random_target))
-                elif action == 'foreign_aid':
-                    for savior in testgame.filter_out_players([acting_player]):
-                        if savior.will_intervene(action, acting_player):
-                            raise BlockedAction(action, acting_player, None, savior)
-                    acting_player.perform(action)
-                elif action == 'exchange':
-                    acting_player.perform(action, testgame.court_deck)
-                elif action == 'coup':
-                    random_player = acting_player.select_opponent(testgame.players)
-                    position, random_target = random_player.random_remaining_influence
-                    acting_player.perform(action, random_target)
-                    random_player.remove_suspicion(str(random_target))
-                else:
-                    acting_player.perform(action)
-            except (IllegalTarget, IllegalAction):
-                pass
-            except BlockedAction:
-                break
-            except RethinkAction:
-                pass
-            else:
-                break
+    return Play_Coup(players, PERSONALITIES.keys(), rng).play(Calculated_Blocks_Policy(), observer)
 
-def sim_calculated_actions_calculated_targets_more_calculated_blocks_no_doubts(players):
+def sim_calculated_actions_calculated_targets_more_calculated_blocks_no_doubts(players, rng=None, observer=None):
     """
     AI PROFILE:
 
@@ -271,65 +259,9 @@ def sim_calculated_actions_calculated_targets_more_calculated_blocks_no_doubts(p
     exchange        yes         random      no
 
     """
-    testgame = Play_Coup(players, PERSONALITIES.keys())
-
-    for acting_player in cycle(testgame.players):
-        if not acting_player.influence_remaining:
-            continue
-        elif len(testgame) == 1:
-            return testgame
-
-        while 1:
-            try:
-                action = acting_player.random_naive_priority()
-                if action == 'steal':
-                    random_player = acting_player.select_opponent(testgame.players)
-                    if (action in random_player.calculate('probable', 'blocks') and random() > .24):
-                        raise RethinkAction(action, acting_player, random_player)
-                    if action in random_player.valid_blocks:
-                        raise BlockedAction(action, acting_player, random_player, None)
-
-                    for savior in testgame.filter_out_players([acting_player, random_player]):
-                        if savior.will_intervene(action, acting_player, random_player):
-                            raise BlockedAction(action, acting_player, random_player, savior)
-                    acting_player.perform(action, random_player)
-                elif action == 'assassinate':
-                    random_player = acting_player.select_opponent(testgame.players)
-                    if (action in random_player.calculate('probable', 'blocks') and random() > .24):
-                        raise RethinkAction(action, acting_player, random_player)
-                    if action in random_player.valid_blocks:
-                        raise BlockedAction(action, acting_player, random_player, None)
-
-                    for savior in testgame.filter_out_players([acting_player, random_player]):
-                        if savior.will_intervene(action, acting_player, random_player):
-                            raise BlockedAction(action, acting_player, random_player, savior)
-                    position, random_target = random_player.random_remaining_influence
-                    acting_player.perform(action, random_target)
-                    random_player.remove_suspicion(str(random_target))
-                elif action == 'foreign_aid':
-                    for savior in testgame.filter_out_players([acting_player]):
-                        if savior.will_intervene(action, acting_player):
-                            raise BlockedAction(action, acting_player, None, savior)
-                    acting_player.perform(action)
-                elif action == 'exchange':
-                    acting_player.perform(action, testgame.court_deck)
-                elif action == 'coup':
-                    random_player = acting_player.select_opponent(testgame.players)
-                    position, random_target = random_player.random_remaining_influence
-                    acting_player.perform(action, random_target)
-                    random_player.remove_suspicion(str(random_target))
-                else:
-                    acting_player.perform(action)
-            except (IllegalTarget, IllegalAction):
-                pass
-            except BlockedAction:
-                break
-            except RethinkAction:
-                pass
-            else:
-                break
+    return Play_Coup(players, PERSONALITIES.keys(), rng).play(More_Calculated_Blocks_Policy(), observer)
 
-def sim_calculated_actions_calculated_targets_more_calculated_blocks_systemic_doubts(players):
+def sim_calculated_actions_calculated_targets_more_calculated_blocks_systemic_doubts(players, rng=None, observer=None):
     """
     AI PROFILE:
 
@@ -343,276 +275,17 @@ def sim_calculated_actions_calculated_targets_more_calculated_blocks_systemic_do
     exchange        yes         random      no
 
     """
-    testgame = Play_Coup(players, PERSONALITIES.keys())
-
-    for acting_player in cycle(testgame.players):
-        if not acting_player.influence_remaining:
-            continue
-        elif len(testgame) == 1:
-            return testgame
-
-        while 1:
-            try:
-                action = acting_player.random_naive_priority()
-                #print '{0} performing {1} (coins={2})'.format(acting_player, action, acting_player.coins)
-
-                if action == 'income':
-                    acting_player.perform(action)
-                    break
-                if action == 'tax':
-                    acting_player.perform(action)
-                    break
-                elif action == 'coup':
-                    random_player = acting_player.select_opponent(testgame.players)
-                    position, random_target = random_player.random_remaining_influence
-                    acting_player.perform(action, random_target)
-                    random_player.remove_suspicion(str(random_target))
-                    break
-                elif action == 'foreign_aid':
-                    for savior in testgame.filter_out_players([acting_player]):
-                        if savior.will_intervene(action, acting_player):
-                            for spectators in testgame.filter_out_players([acting_player, savior]):
-                                spectators.didnt_block_as['spectator'].extend([action])
-                            raise BlockedAction(action, acting_player, None, savior)
-                    else:
-                        acting_player.perform(action)
-                        break
-                elif action == 'steal':
-                    random_player = acting_player.select_opponent(testgame.players)
-                    if action in random_player.calculate('probable', 'blocks') and random() > .33:
-                        raise RethinkAction(action, acting_player, random_player)
-                    elif action in random_player.valid_blocks:
-                        raise BlockedAction(action, acting_player, random_player, None)
-                    else:
-                        for savior in testgame.filter_out_players([acting_player, random_player]):
-                            if savior.will_intervene(action, acting_player, random_player):
-                                raise BlockedAction(action, acting_player, random_player, savior)
-
-                        for doubter in testgame.filter_out_players([acting_player]):
-                            if doubter.will_callout(action, acting_player):
-                                if action in acting_player.valid_actions:
-                                    acting_player.perform(action, random_player)
-                                raise QuestionInfluence(doubter, acting_player, 'Captain', testgame.court_deck, 'steal')
-
-                        acting_player.perform(action, random_player)
-                        for spectators in testgame.filter_out_players([acting_player, savior]):
-                            spectators.didnt_block_as['spectator'].extend([action])
-                        break
-                elif action == 'assassinate':
-                    random_player = acting_player.select_opponent(testgame.players)
-                    if action in random_player.calculate('probable', 'blocks') and random() > .33:
-                        raise RethinkAction(action, acting_player, random_player)
-                    elif action in random_player.valid_blocks:
-                        raise BlockedAction(action, acting_player, random_player, None)
-                    else:
-                        for savior in testgame.filter_out_players([acting_player, random_player]):
-                            if savior.will_intervene(action, acting_player, random_player):
-                                raise BlockedAction(action, acting_player, random_player, savior)
-
-                        for doubter in testgame.filter_out_players([acting_player]):
-                            if doubter.will_callout(action, acting_player):
-                                if action in acting_player.valid_actions:
-                                    position, random_target = random_player.random_remaining_influence
-                                    acting_player.perform(action, random_target)
-                                    random_player.remove_suspicion(str(random_target))
-                                raise QuestionInfluence(doubter, acting_player, 'Assassin', testgame.court_deck, 'assassinate')
-                        position, random_target = random_player.random_remaining_influence
-                        acting_player.perform(action, random_target)
-                        random_player.remove_suspicion(str(random_target))
-                        for spectators in testgame.filter_out_players([acting_player, random_player]):
-                            spectators.didnt_block_as['spectator'].extend([action])
-                        break
-                elif action == 'exchange':
-                    for doubter in testgame.filter_out_players([acting_player]):
-                        if doubter.will_callout(action, acting_player):
-                            if action in acting_player.valid_actions:
-                                acting_player.perform(action, testgame.court_deck)
-                            raise QuestionInfluence(doubter, acting_player, 'Ambassador', testgame.court_deck, 'block_exchange')
-                    break
-                elif action == 'coup':
-                    random_player = acting_player.select_opponent(testgame.players)
-                    position, random_target = random_player.random_remaining_influence
-                    acting_player.perform(action, random_target)
-                    random_player.remove_suspicion(str(random_target))
-                    break
-            except (IllegalAction, IllegalTarget):
-                pass
-            except BlockedAction:
-                break
-            except RethinkAction:
-                pass
-            except QuestionInfluence:
-                break
-
-def sim_a_full_on_yomi(players):
-    testgame = Play_Coup(players, PERSONALITIES.keys())
-
-    for acting_player in cycle(testgame.players):
-        if not acting_player.influence_remaining:
-            continue
-        elif len(testgame) == 1:
-            return testgame
-
-        action_plan = []
-        remaining_opponent = None
+    return Play_Coup(players, PERSONALITIES.keys(), rng).play(Systemic_Doubts_Policy(), observer)
 
-        if len(testgame) == 2:
-            remaining_opponent = acting_player.select_opponent(testgame.players)
-            action_plan = acting_player.one_on_one_strategy(remaining_opponent.best_guess, True)
-
-        while 1:
-            try:
-                if action_plan:
-                    action = action_plan.pop(0)
-                else:
-                    action = acting_player.random_naive_priority()
-
-                if action == 'income':
-                    acting_player.perform(action)
-                    break
-                if action == 'tax':
-                    acting_player.perform(action)
-                    break
-                elif action == 'coup':
-                    if remaining_opponent:
-                        victim = remaining_opponent
-                    else:
-                        for random_opponent in testgame.filter_out_players([acting_player]):
-                            if not acting_player.wins_duel(random_opponent):
-                                victim = random_opponent
-                                break
-                            else:
-                                victim = acting_player.select_opponent(testgame.players)
-
-                    position, random_target = victim.random_remaining_influence
-                    acting_player.perform(action, random_target)
-                    victim.remove_suspicion(str(random_target))
-                    break
-                elif action == 'foreign_aid':
-                    for savior in testgame.filter_out_players([acting_player]):
-                        if not savior.wins_duel(acting_player):
-                            opponent = savior
-                            break
-                    else:
-                        opponent = None
-
-                    if opponent and opponent.will_intervene(action, acting_player):
-                        for spectators in testgame.filter_out_players([acting_player, opponent]):
-                            spectators.didnt_block_as['spectator'].extend([action])
-
-                        if acting_player.will_callout('block_foreign_aid', opponent) and \
-                            acting_player.plays_numbers and \
-                            random() > AI_Persona.probability_player_influences(testgame.players, opponent, 'Duke', acting_player):
-                            if action not in opponent.valid_blocks:
-                                acting_player.perform(action)
-                            raise QuestionInfluence(acting_player, opponent, 'Duke', testgame.court_deck, 'foreign_aid')
-                        elif action in opponent.valid_blocks:
-                            raise BlockedAction(action, acting_player, None, opponent)
-
-                    acting_player.perform(action)
-                    break
-                elif action == 'steal':
-                    if remaining_opponent:
-                        victim = remaining_opponent
-                    else:
-                        for opponent in testgame.filter_out_players([acting_player]):
-                            if not acting_player.wins_duel(opponent) and action not in opponent.calculate('judge', 'blocks'):
-                                victim = opponent
-                                break
-                        else:
-                            victim = acting_player.select_opponent(testgame.players)
-
-                    if action in victim.valid_blocks:
-                        raise BlockedAction(action, acting_player, victim, None)
-                    else:
-                        for savior in testgame.filter_out_players([acting_player, victim]):
-                            representing = savior.will_intervene(action, acting_player, victim)
-                            if representing:
-                                #logic to doubt savior (ambassador doesnt leave hints, so excess failed callouts)
-                                '''for doubter in testgame.filter_out_players([acting_player, savior, victim]):
-                                    if doubter.will_callout('block_steal', savior):
-                                        if action not in savior.valid_blocks:
-                                            acting_player.perform(action, victim)
-                                            self.ACTIONS[acting_player.alpha].append(action)
-                                        raise QuestionInfluence(doubter, savior, representing, testgame.court_deck, 'block_steal')
-                                '''
-                                for spectators in testgame.filter_out_players([acting_player, savior, victim]):
-                                    spectators.didnt_block_as['spectator'].extend([action])
-                                raise BlockedAction(action, acting_player, victim, savior)
-
-                        for doubter in testgame.filter_out_players([acting_player]):
-                            if doubter.will_callout(action, acting_player):
-                                if action in acting_player.valid_actions:
-                                    acting_player.perform(action, victim)
-                                raise QuestionInfluence(doubter, acting_player, 'Captain', testgame.court_deck, 'steal')
-
-                        acting_player.perform(action, victim)
-                        for spectators in testgame.filter_out_players([acting_player]):
-                            spectators.didnt_block_as['spectator'].extend([action])
-                        break
-                elif action == 'assassinate':
-                    if remaining_opponent:
-                        victim = remaining_opponent
-                    else:
-                        for opponent in testgame.filter_out_players([acting_player]):
-                            if not acting_player.wins_duel(opponent) and \
-                                random() > AI_Persona.probability_player_influences(testgame.players, opponent, 'Contessa', acting_player):
-                                victim = opponent
-                                break
-                        else:
-                            victim = acting_player.select_opponent(testgame.players)
-
-                    if action in victim.valid_blocks:
-                        raise BlockedAction(action, acting_player, victim, None)
-                    else:
-                        for savior in testgame.filter_out_players([acting_player, victim]):
-                            representing = savior.will_intervene(action, acting_player, victim)
-                            if representing:
-                                for spectators in testgame.filter_out_players([acting_player, savior, victim]):
-                                    spectators.didnt_block_as['spectator'].extend([action])
-                                #omitted logic to doubt savior (contessa doesnt leave hints, so excess failed callouts)
-                                raise BlockedAction(action, acting_player, victim, savior)
-
-                        for doubter in testgame.filter_out_players([acting_player]):
-                            if doubter.will_callout(action, acting_player):
-                                if action in acting_player.valid_actions:
-                                    position, random_target = victim.random_remaining_influence
-                                    acting_player.perform(action, random_target)
-                                    victim.remove_suspicion(str(random_target))
-                                raise QuestionInfluence(doubter, acting_player, 'Assassin', testgame.court_deck, 'assassinate')
-
-                        position, random_target = victim.random_remaining_influence
-                        acting_player.perform(action, random_target)
-                        victim.remove_suspicion(str(random_target))
-                        for spectators in testgame.filter_out_players([acting_player, victim]):
-                            spectators.didnt_block_as['spectator'].extend([action])
-                        break
-                elif action == 'exchange':
-                    for doubter in testgame.filter_out_players([acting_player]):
-                        if doubter.will_callout(action, acting_player) and \
-                            doubter.plays_numbers and \
-                            random() > AI_Persona.probability_player_influences(testgame.players, acting_player, 'Ambassador', doubter):
-                            if action in acting_player.valid_actions:
-                                acting_player.perform(action, testgame.court_deck)
-                            raise QuestionInfluence(doubter, acting_player, 'Ambassador', testgame.court_deck, 'exchange')
-
-                    acting_player.perform(action, testgame.court_deck)
-                    break
-            except IllegalAction:
-                pass
-            except IllegalTarget:
-                pass
-            except BlockedAction:
-                break
-            except RethinkAction:
-                pass
-            except QuestionInfluence:
-                break
+def sim_a_full_on_yomi(players, rng=None, observer=None):
+    return Play_Coup(players, PERSONALITIES.keys(), rng).play(Yomi_Policy(), observer)
 
 def duel(coup_game):
-    duel = Play_Coup(2)
+    duel = Play_Coup(2, rng=coup_game.rng)
     duel.players[0] = coup_game.players[0].clone()
     duel.players[1] = coup_game.players[1].clone()
+    for p in duel.players:
+        p.rng = duel.rng
 
     for acting_player in cycle(duel.players):
         try:
@@ -627,9 +300,9 @@ def duel(coup_game):
 
             while 1:
                 action = action_plan.pop(0)
-                if action not in acting_player.valid_actions + ['foreign_aid','income','coup']:
+                if action not in acting_player.valid_action_set and action not in Play_Coup.ACTIONS['free']:
                     pass
-                elif action in opp.valid_blocks:
+                elif action in opp.valid_block_set:
                     break
                 else:
                     if action in ['income', 'tax', 'foreign_aid']:
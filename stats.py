@@ -5,8 +5,8 @@ behaviors and bluffs in order to win the game.
 
 """
 from __future__ import print_function
-import numpy
 import simulations
+from anova import Study, Sequential_Study
 
 __author__ = "William Dizon"
 __license__ = "GNU GPL v3.0"
@@ -16,6 +16,9 @@ __email__ = "wdchromium@gmail.com"
 PLAYERS = 5
 GAMES_PER_SAMPLE = 100
 SIMULATION_TIMEOUT = 25
+CONFIDENCE = .99    #sequential mode: level each pair is decided at
+TOLERANCE = 2.0     #sequential mode: wins per sample within which heuristics count as equal
+SAMPLE_BUDGET = 5000 #sequential mode: samples after which to stop regardless
 
 pairs = ['Ambassador Contessa',
      'Captain Duke',
@@ -35,33 +38,133 @@ pairs = ['Ambassador Contessa',
 
 def f(sim):
     return (sim.__name__, simulations.run(sim, PLAYERS, GAMES_PER_SAMPLE))
-    
+
+def guarded(sim):
+    """f(sim), or the exception it raised; python 2 pools take no error_callback"""
+    try:
+        return f(sim)
+    except Exception as e:
+        return e
+
+def report(study, heuristics, alpha=.05):
+    """lines summarizing study so far: samples per heuristic, then each pair's ANOVA and, if significant, Tukey HSD"""
+    lines = []
+    for idx, sim in enumerate(heuristics):
+        lines.append('Test: {0}, Iterations {1}, Heuristic: {2}'.format(idx, study.samples(sim), sim))
+
+    for pair in pairs:
+        lines += ['', pair]
+        if isinstance(study, Sequential_Study):
+            lines.append('Decided: {0}'.format(study.decided.get(pair, 'UNDECIDED')))
+        f, p = study.anova(pair)
+        lines.append('F-stat: {0} at sig {1}: {2}'.format(str(round(f, 3)).ljust(7),
+                                                          str(round(p, 3)).ljust(7),
+                                                          ['NULL','REJECT'][p <= alpha]))
+
+        if p <= alpha:
+            lines.append('Multiple Comparison of Means - Tukey HSD, FWER={0}'.format(alpha))
+            lines.append('group1 group2 meandiff p-adj lower upper reject')
+            for first, second, difference, p_adj, lower, upper, reject in study.tukey(pair, alpha):
+                lines.append('{0} {1} {2:.4f} {3:.4f} {4:.4f} {5:.4f} {6}'.format(
+                    heuristics.index(first), heuristics.index(second), difference, p_adj, lower, upper, reject))
+    return lines
+
+def sequential(sim_list, pool, budget=SAMPLE_BUDGET, outstanding=None, progress=None):
+    """
+    Samples sim_list in pool until every pair is decided, or budget
+    samples are in, keeping outstanding samples queued at a time.  Each
+    sample goes to the heuristic next_heuristic() picks, so the pool's
+    work follows the pairs still undecided.  Returns the Sequential_Study.
+
+    Pairs are re-tested after every round of samples, each look at a
+    stricter level (see Sequential_Study) so that a decision holds at
+    CONFIDENCE however many looks it took.  An exception in a worker is
+    raised here.
+    """
+    from multiprocessing import cpu_count
+    try:
+        from queue import Queue
+    except ImportError:
+        from Queue import Queue
+
+    study = Sequential_Study(pairs, CONFIDENCE, TOLERANCE)
+    names = [s.__name__ for s in sim_list]
+    funcs = dict(zip(names, sim_list))
+    results = Queue()
+    outstanding = outstanding or 2 * cpu_count()
+
+    def issue():
+        pool.apply_async(guarded, (funcs[study.next_heuristic(names)],),
+                         callback=results.put)
+
+    issued = 0
+    finished = False
+    while issued < min(outstanding, budget):
+        issue()
+        issued += 1
+
+    received = 0
+    while received < issued:
+        result = results.get(timeout=SIMULATION_TIMEOUT)
+        if isinstance(result, BaseException):
+            raise result
+        sim, wins = result
+        received += 1
+        study.add(sim, wins)
+        if progress:
+            progress(study)
+        if not finished and received % len(names) == 0:
+            finished = study.decide(names)
+        if not finished and issued < budget:
+            issue()
+            issued += 1
+    return study
+
 if __name__ == "__main__":
     import sys
     import inspect
-    from scipy.stats import f_oneway
-    from statsmodels.stats.multicomp import pairwise_tukeyhsd
-    from collections import defaultdict, Counter
     from multiprocessing.pool import Pool
     from itertools import cycle
 
-    completed = []
-    container = defaultdict(list)   
+    if '--help' in sys.argv:
+        print('usage: python stats.py [--sequential]')
+        print('')
+        print('  without options, samples every heuristic in turn until CTRL-c, then')
+        print('  reports the one-way ANOVA (and Tukey HSD where significant) of each pair')
+        print('')
+        print('  --sequential  samples where pairs are still undecided, stopping once every')
+        print('                pair is decided at {0} confidence or {1} samples are in;'.format(CONFIDENCE, SAMPLE_BUDGET))
+        print('                pairs are re-tested after every round, each look at a')
+        print('                Bonferroni-corrected level so the confidence holds overall')
+        sys.exit()
+
     pool = Pool()
 
     sim_list = [func for name,func in inspect.getmembers(simulations, inspect.isfunction) if name.startswith('sim_')]
 
+    if '--sequential' in sys.argv:
+        print('sampling until every pair is decided or {0} samples are in'.format(SAMPLE_BUDGET))
+        try:
+            study = sequential(sim_list, pool, progress=lambda study: sys.stdout.write('.'))
+        finally:
+            pool.terminate()
+            pool.join()
+        print('')
+        for line in report(study, [s.__name__ for s in sim_list], study.alpha):
+            print(line)
+        sys.exit()
+
+    study = Study(pairs)
+
     try:
         print('press CTRL-c to stop generating samples')
         it = pool.imap_unordered(f, cycle(sim_list))
-        
+
         while 1:
             sim, result = it.next(timeout=SIMULATION_TIMEOUT)
-            completed.append(sim)
             sys.stdout.write('.')
-            for p, wins in result.items():
-                container[p].append( (sim, wins) )
-            
+            study.add(sim, result)
+
     except KeyboardInterrupt:
         pool.close()
         print('stopping all simulations...')
@@ -69,25 +172,5 @@ if __name__ == "__main__":
         pool.terminate()
         pool.join()
 
-    c = dict(Counter(completed).most_common())
-    for idx, sim in enumerate([s.__name__ for s in sim_list]):
-        print('Test: {0}, Iterations {1}, Heuristic: {2}'.format(idx, c[sim], sim))
-        
-    for pair in pairs:
-        print('')
-        print(pair)
-        f, p = f_oneway(*[[i[1] for i in container[pair] if i[0] == sim] for sim in [s.__name__ for s in sim_list]])
-        print('F-stat: {0} at sig {1}: {2}'.format(str(round(f, 3)).ljust(7), 
-                                                   str(round(p, 3)).ljust(7),
-                                                   ['NULL','REJECT'][p <= .05]))
-    
-        if p <= .05:
-            dta2 = numpy.rec.array(container[pair],  
-                                dtype=[('test', '|S100'),
-                                       ('wins', int)])
-                                       
-            print(pairwise_tukeyhsd(dta2['wins'], dta2['test']))
-
-    
-
-    
+    for line in report(study, [s.__name__ for s in sim_list]):
+        print(line)
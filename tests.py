@@ -1341,6 +1341,1042 @@ class TestCoup(unittest.TestCase):
         self.assertFalse(p.left.revealed)
         self.assertEqual(len(testgame.court_deck), 5)
 
+    def test_game_state(self):
+        testgame = Play_Coup(5)
+        testgame.players[1].left.reveal()
+        testgame.players[2].coins = 9
+
+        state = testgame.state
+        self.assertEqual(len(state.hands), 10)
+        self.assertEqual(len(state.deck), 5)
+        self.assertEqual(state.hands[0], testgame.players[0].left.CODE)
+        self.assertEqual(state.revealed[2], 1)
+        self.assertEqual(state.coins[2], 9)
+        self.assertIs(INFLUENCES[state.deck[0]], type(testgame.court_deck[0]))
+
+        other = Play_Coup(5)
+        other.load_state(state)
+        self.assertEqual(other.state, state)
+        self.assertEqual([p.status for p in other.players], [p.status for p in testgame.players])
+        self.assertTrue(other.players[1].left.revealed)
+        self.assertEqual(other.players[2].coins, 9)
+
+    def test_compact_objects(self):
+        for obj in (Play_Coup(2), Player(), AI_Persona(), Duke(), Influence()):
+            self.assertFalse(hasattr(obj, '__dict__'))
+
+    def test_influence_masks(self):
+        self.assertEqual(Influence.mask_for_influences(''), 0)
+        self.assertEqual(Influence.mask_for_influences('Captain Duke'), Captain.MASK | Duke.MASK)
+        self.assertEqual(Influence.mask_for_influences(['Duke', 'Duke']), Duke.MASK)
+
+        p = Player()
+        p.left = Contessa()
+        p.right = Ambassador()
+        self.assertEqual(Influence.mask_for_influences(p), Contessa.MASK | Ambassador.MASK)
+
+        self.assertEqual(Influence.ACTIONS_BY_MASK[Captain.MASK | Duke.MASK], ('steal', 'tax'))
+        self.assertEqual(Influence.BLOCKS_BY_MASK[Contessa.MASK | Duke.MASK], ('assassinate', 'foreign_aid'))
+        self.assertEqual(Influence.CLAIMED_BY['exchange'], 'Ambassador')
+        self.assertEqual(Influence.BLOCKED_BY['assassinate'], 'Contessa')
+
+    def test_incremental_suspicion(self):
+        from random import choice
+
+        p = AI_Persona()
+        for _ in range(300):
+            log = choice([p.public_information['perform'], p.public_information['victim'],
+                          p.public_information['spectator'], p.didnt_block_as['victim'],
+                          p.didnt_block_as['spectator']])
+            log.append(choice(list(Play_Coup.ACTIONS['all'])))
+            if not choice(range(20)):
+                p.remove_suspicion(choice(['Ambassador', 'Assassin', 'Captain', 'Contessa', 'Duke']))
+
+            fresh = Player()
+            for k in p.public_information:
+                fresh.public_information[k].extend(p.public_information[k])
+            for k in p.didnt_block_as:
+                fresh.didnt_block_as[k].extend(p.didnt_block_as[k])
+            self.assertEqual(p.judge_player, fresh.judge_player)
+            self.assertEqual(p.probable_influences, fresh.probable_influences)
+
+        p.public_information = {'perform': ['tax'], 'victim': [], 'spectator': []}
+        p.didnt_block_as['spectator'] = []
+        p.didnt_block_as['victim'] = ['foreign_aid']
+        self.assertEqual(p.judge_player, {'Duke': 1 - 10})
+
+    def test_valid_mask_invalidation(self):
+        testgame = Play_Coup(5)
+        p = testgame.players[0]
+        p.left = Duke()
+        p.right = Ambassador()
+
+        self.assertEqual(p.live_mask, Duke.MASK | Ambassador.MASK)
+        self.assertEqual(p.valid_action_set, frozenset(['tax', 'exchange']))
+
+        p.left.reveal()
+        self.assertEqual(p.valid_action_set, frozenset(['exchange']))
+        self.assertEqual(p.valid_block_set, frozenset(['steal']))
+
+        p.restore('left', testgame.court_deck)
+        self.assertEqual(p.live_mask, type(p.left).MASK | Ambassador.MASK)
+
+        for _ in range(20):
+            p.perform('exchange', testgame.court_deck)
+            self.assertEqual(p.live_mask, type(p.left).MASK | type(p.right).MASK)
+            self.assertTrue(all(c.holder is not p for c in testgame.court_deck))
+
+    def test_outcome_records(self):
+        testgame = Play_Coup(5)
+        p, pp, ppp = testgame.players[0:3]
+        p.left = Assassin()
+        p.right = Duke()
+        pp.left = Contessa()
+        pp.right = Captain()
+
+        outcome = testgame.attempt(p, 'assassinate', pp.left)
+        self.assertEqual(outcome.result, Outcome.ILLEGAL)
+        self.assertIs(outcome.reason[0], IllegalAction)
+        self.assertIsNone(outcome.message)
+        self.assertEqual(p.public_information['perform'], [])
+
+        outcome = testgame.attempt(p, 'dance', trace=True)
+        self.assertEqual(outcome.result, Outcome.ILLEGAL)
+        self.assertEqual(outcome.message, 'no action dance')
+
+        outcome = testgame.attempt(p, 'tax')
+        self.assertEqual(outcome.result, Outcome.SUCCEEDED)
+        self.assertEqual(p.coins, 5)
+
+        outcome = testgame.attempt(p, 'steal', pp, trace=True)
+        self.assertIs(outcome.victim, pp)
+        self.assertEqual(outcome.message, '{0} performs steal on {1}'.format(p, pp))
+
+        outcome = testgame.block('assassinate', p, pp)
+        self.assertEqual(outcome.result, Outcome.BLOCKED)
+        self.assertIsNone(outcome.message)
+        self.assertEqual(p.coins, 4)
+        self.assertEqual(pp.public_information['victim'], ['assassinate'])
+
+        outcome = testgame.challenge(ppp, p, 'Duke', 'tax')
+        self.assertEqual(outcome.result, Outcome.CHALLENGED)
+        self.assertFalse(outcome.doubter_is_correct)
+        self.assertEqual(ppp.influence_remaining, 1)
+
+        outcome = testgame.challenge(p, pp, 'Duke', 'block_foreign_aid')
+        self.assertTrue(outcome.doubter_is_correct)
+        self.assertEqual(pp.influence_remaining, 1)
+
+    def test_play_with_policy(self):
+        class Income_Only(Policy):
+            def select_action(self, turn):
+                if turn.player.coins >= 7:
+                    return 'coup'
+                return 'income'
+
+        outcomes = []
+        testgame = Play_Coup(3).play(Income_Only(), outcomes.append)
+        self.assertEqual(len(testgame), 1)
+        self.assertIsNotNone(testgame.winner)
+        self.assertEqual(set(o.result for o in outcomes), set([Outcome.SUCCEEDED]))
+        self.assertEqual(sum(1 for o in outcomes if o.action == 'coup'), 6 - testgame.winner.influence_remaining)
+
+        testgame = Play_Coup(2)
+        p, pp = testgame.players
+        p.coins = 0
+        outcome = testgame.play_turn(p, Income_Only())
+        self.assertEqual(outcome.action, 'income')
+        self.assertEqual(p.coins, 1)
+
+    def test_play_doubter_falls_to_action(self):
+        class Doubted_Assassin(Policy):
+            doubted = frozenset(['assassinate'])
+            def select_action(self, turn):
+                return 'assassinate'
+            def target(self, turn, action):
+                return turn.game.players[1]
+            def doubter(self, turn, action):
+                return turn.game.players[1]
+
+        testgame = Play_Coup(2)
+        p, pp = testgame.players
+        p.left, p.right = Assassin(), Duke()
+        pp.left, pp.right = Captain(), Captain()
+        pp.left.reveal()
+        p.coins = 3
+        outcome = testgame.play_turn(p, Doubted_Assassin())
+        self.assertEqual(outcome.result, Outcome.SUCCEEDED)
+        self.assertEqual(pp.influence_remaining, 0)
+        self.assertEqual(p.influence_remaining, 2)
+
+    def test_seeded_games_repeat(self):
+        from random import Random
+        from simulations import sim_a_full_on_yomi, run
+
+        first = sim_a_full_on_yomi(5, Random(42))
+        second = sim_a_full_on_yomi(5, Random(42))
+        self.assertEqual(first.state, second.state)
+        self.assertEqual([p.saved_personality for p in first.players],
+                         [p.saved_personality for p in second.players])
+        self.assertIs(first.players[3].rng, first.rng)
+
+        self.assertEqual(run(sim_a_full_on_yomi, 3, 5, seed=1), run(sim_a_full_on_yomi, 3, 5, seed=1))
+
+    def test_batch_duel(self):
+        from duels import batch_duel, deal, duel_policy
+        from simulations import duel
+
+        hands = [[[a, a], [b, b]] for a in range(len(INFLUENCES)) for b in range(len(INFLUENCES))]
+        winners = batch_duel(hands)
+        for hand, seat in zip(hands, winners):
+            testgame = Play_Coup(2)
+            for p, cards in zip(testgame.players, hand):
+                p.left, p.right = INFLUENCES[cards[0]](), INFLUENCES[cards[1]]()
+            result = duel(testgame)
+            self.assertIs(result.players[seat], result.winner)
+            self.assertEqual(duel_policy(hand), seat)
+
+        hands = deal(500, 1)
+        self.assertEqual(hands.shape, (500, 2, 2))
+        winners = batch_duel(hands, rng=1)
+        self.assertFalse((winners == -1).any())
+        self.assertTrue((winners == batch_duel(hands, rng=1)).all())
+
+        self.assertEqual(list(batch_duel([[[4, 4], [0, 1]]], revealed=[[[1, 1], [0, 0]]])), [1])
+
+    def test_duel_table(self):
+        import os, tempfile
+        from duels import Duel_Table
+
+        table = Duel_Table.build(samples=2, max_coins=2, rng=1)
+        self.assertEqual(table.wins.shape, (15, 3, 15, 3, 3, 3))
+
+        p, pp = AI_Persona(), AI_Persona()
+        p.left, p.right = Duke(), Assassin()
+        pp.left, pp.right = Captain(), Captain()
+        pp.coins = 9
+        pp.right.reveal()
+        self.assertEqual(table.key(p, pp), (8, 0, 9, 2, 2, 2))
+        p.coins = -1
+        self.assertEqual(table.key(p, pp), (8, 0, 9, 2, 0, 2))
+        p.coins = 2
+
+        table.wins[table.key(p, pp)] = 1.0
+        path = os.path.join(tempfile.mkdtemp(), 'duels.npy')
+        table.save(path)
+        loaded = Duel_Table.load(path)
+        self.assertEqual(loaded.max_coins, 2)
+        self.assertEqual(loaded.probability(p, pp), 1.0)
+        pp.left.reveal()
+        self.assertEqual(loaded.probability(p, pp), 1.0)
+        self.assertEqual(loaded.probability(pp, p), 0.0)
+        self.assertRaises(ValueError, loaded.key, p, pp)
+        pp.left.reveal(False)
+
+        from duels import DUEL_CACHE
+        try:
+            DUEL_CACHE.clear()
+            loaded.install()
+            self.assertTrue(p.wins_duel(pp))
+            loaded.wins[loaded.key(pp, p)] = 0.0
+            self.assertFalse(pp.wins_duel(p))
+        finally:
+            AI_Persona.DUEL_TABLE = None
+            DUEL_CACHE.clear()
+
+    def test_duel_cache(self):
+        from duels import Duel_Cache, DUEL_CACHE, duel_key
+
+        cache = Duel_Cache(2)
+        cache.put('a', True)
+        cache.put('b', False)
+        self.assertTrue(cache.get('a'))
+        cache.put('c', True)
+        self.assertIsNone(cache.get('b'))
+        self.assertTrue(cache.get('c'))
+        self.assertEqual(cache.stats, {'hits': 2, 'misses': 1, 'evictions': 1, 'size': 2, 'maxsize': 2})
+
+        p, pp = AI_Persona(), AI_Persona()
+        p.left, p.right = Duke(), Duke()
+        pp.left, pp.right = Contessa(), Contessa()
+
+        DUEL_CACHE.clear()
+        self.assertTrue(p.wins_duel(pp))
+        self.assertEqual((DUEL_CACHE.hits, DUEL_CACHE.misses), (0, 1))
+
+        q = AI_Persona()
+        q.left, q.right = Duke(), Duke()
+        self.assertEqual(duel_key(q, pp), duel_key(p, pp))
+        self.assertTrue(q.wins_duel(pp))
+        self.assertEqual((DUEL_CACHE.hits, DUEL_CACHE.misses), (1, 1))
+
+        pp.coins = 3
+        q.wins_duel(pp)
+        self.assertEqual(DUEL_CACHE.misses, 2)
+
+    def test_win_probability(self):
+        from duels import win_probability, position_win_probability
+
+        p, pp = AI_Persona(), AI_Persona()
+        p.left, p.right = Ambassador(), Captain()
+        pp.left, pp.right = Duke(), Assassin()
+        self.assertEqual(win_probability(p, pp), .75)
+        self.assertEqual(p.win_probability(pp), .75)
+        self.assertTrue(p.wins_duel(pp))
+
+        ppp = AI_Persona()
+        ppp.left, ppp.right = Assassin(), Contessa()
+        self.assertEqual(win_probability(ppp, p), .25)
+        self.assertFalse(ppp.wins_duel(p))
+
+        pp.right.reveal()
+        self.assertEqual(win_probability(p, pp), position_win_probability(((0, 2), (1, 4)), ((0, 2), (4,)), (2, 2)))
+        pp.left.reveal()
+        self.assertEqual(win_probability(p, pp), 1.0)
+
+    def test_card_counter(self):
+        testgame = Play_Coup(5)
+        p, pp, ppp = testgame.players[0:3]
+        p.hold('left', Assassin())
+        p.hold('right', Assassin())
+        pp.hold('left', Contessa())
+        pp.hold('right', Contessa())
+        ppp.hold('left', Duke())
+        ppp.hold('right', Contessa())
+        counter = testgame.cards
+
+        self.assertAlmostEqual(counter.probability(p, pp, 'Contessa'), 0.423076923076923)
+        self.assertAlmostEqual(counter.probability(None, pp, 'Contessa'), 0.37142857142857144)
+        self.assertAlmostEqual(counter.probability(p, pp, 'Contessa', 2), 3 / 78.0)
+        self.assertAlmostEqual(counter.probability(p, pp, 'Assassin'), 12 / 78.0)
+        self.assertEqual(counter.probability(p, p, 'Assassin', 2), 1.0)
+
+        pp.right.reveal()
+        self.assertEqual(counter.revealed, [0, 0, 0, 1, 0])
+        self.assertAlmostEqual(counter.probability(p, pp, 'Contessa'), 2 / 12.0)
+        self.assertEqual(counter.probability(p, pp, 'Contessa', 2), 0.0)
+
+        pp.left.reveal()
+        matrix = counter.matrix(ppp)
+        self.assertEqual(len(matrix), 5)
+        self.assertEqual(matrix[1], [0.0] * 5)
+        self.assertEqual(matrix[2], [0.0, 0.0, 0.0, 1.0, 1.0])
+        self.assertEqual(matrix[0][3], 0.0)
+
+        ppp.right.reveal()
+        ppp.restore('right', testgame.court_deck)
+        self.assertEqual(counter.revealed, [0, 0, 0, 2, 0])
+
+        a = AI_Persona()
+        a.hold('left', Duke())
+        a.hold('right', Duke())
+        a.left.reveal()
+        testgame.players[4] = a
+        self.assertAlmostEqual(counter.probability(None, a, 'Duke'), 2 / 12.0)
+        self.assertEqual(counter.revealed, [0, 0, 0, 2, 1])
+        a.hold('left', Duke())
+        self.assertEqual(counter.revealed, [0, 0, 0, 2, 0])
+
+    def test_hand_belief(self):
+        from beliefs import PAIRS
+
+        testgame = Play_Coup(3)
+        p, pp, ppp = testgame.players
+        p.left, p.right = Duke(), Duke()
+        pp.left, pp.right = Captain(), Contessa()
+
+        belief = pp.belief
+        self.assertAlmostEqual(sum(belief.posterior(p)), 1.0)
+        self.assertAlmostEqual(belief.probability(p, 'Duke'), testgame.cards.probability(p, pp, 'Duke'))
+        self.assertAlmostEqual(belief.probability(None, 'Captain'), testgame.cards.probability(None, pp, 'Captain'))
+
+        before = belief.probability(p, 'Captain')
+        pp.public_information['perform'].extend(['steal', 'steal'])
+        self.assertGreater(belief.probability(p, 'Captain'), before)
+        self.assertIn('Captain', belief.best_guess(p))
+        self.assertIn('steal', pp.calculate('belief', 'actions', p))
+
+        pp.left.reveal()
+        self.assertEqual(belief.probability(p, 'Captain'), testgame.cards.probability(p, pp, 'Captain'))
+        self.assertEqual([w for pair, w in zip(PAIRS, belief.posterior(p)) if 2 not in pair], [0.0] * 10)
+
+        pp.public_information['victim'].append('assassinate')
+        self.assertGreater(belief.probability(p, 'Contessa'), testgame.cards.probability(p, pp, 'Contessa'))
+        pp.right = Duke()
+        belief.update()
+        self.assertEqual(belief.likelihood, [1.0] * 15)
+
+        p.rules = {'callout': {'belief_threshold': .1}}
+        self.assertFalse(p.will_callout('block_assassinate', pp))
+        self.assertTrue(p.will_callout('tax', pp))
+        self.assertFalse(p.will_callout('income', pp))
+
+    def test_hand_belief_reads_earlier_events(self):
+        p = AI_Persona()
+        p.left, p.right = Duke(), Captain()
+        p.public_information['perform'].extend(['tax', 'tax', 'tax'])
+        self.assertGreater(p.belief.probability(None, 'Duke'), .9)
+
+    def test_snapshot_restore(self):
+        from simulations import Yomi_Policy
+
+        testgame = Play_Coup(4)
+        testgame.players[1].left.reveal()
+        testgame.players[2].coins = 9
+        testgame.players[3].public_information['perform'].extend(['tax', 'steal'])
+        testgame.players[0].didnt_block_as['spectator'].append('foreign_aid')
+        testgame.turn = 2
+
+        snapshot = testgame.snapshot()
+        self.assertLess(len(snapshot), 100)
+        self.assertEqual(Game_State.from_bytes(snapshot), testgame.state)
+
+        cards = set(id(c) for c in testgame.court_deck + [c for p in testgame.players for c in (p.left, p.right)])
+        statuses = [p.status for p in testgame.players]
+        judged = [p.judge_player for p in testgame.players]
+        revealed = list(testgame.cards.revealed)
+
+        testgame.play(Yomi_Policy())
+        self.assertNotEqual(testgame.state, Game_State.from_bytes(snapshot))
+
+        testgame.restore(snapshot)
+        self.assertEqual(testgame.snapshot(), snapshot)
+        self.assertEqual([p.status for p in testgame.players], statuses)
+        self.assertEqual([p.judge_player for p in testgame.players], judged)
+        self.assertEqual(testgame.cards.revealed, revealed)
+        self.assertEqual(testgame.turn, 2)
+        self.assertEqual(testgame.players[2].coins, 9)
+        self.assertEqual(cards, set(id(c) for c in testgame.court_deck + \
+                                    [c for p in testgame.players for c in (p.left, p.right)]))
+        for p in testgame.players:
+            self.assertIs(p.left.holder, p)
+            self.assertEqual(p.live_mask, Influence.mask_for_influences([str(c) for c in (p.left, p.right) if not c.revealed]))
+
+        testgame.play(Yomi_Policy())
+        self.assertEqual(len(testgame), 1)
+
+    def test_event_log(self):
+        import io, tempfile
+        from events import Event_Writer, read_events, Event, GAME, END
+        from simulations import run, sim_a_full_on_yomi
+
+        stream = io.BytesIO()
+        writer = Event_Writer(stream, buffer_size=64)
+        wins = run(sim_a_full_on_yomi, 4, 5, seed=15, observer=writer)
+        writer.flush()
+
+        records = list(read_events(io.BytesIO(stream.getvalue())))
+        self.assertEqual(list(read_events(io.BytesIO(stream.getvalue()), chunk_size=7)), records)
+        self.assertRaises(ValueError, list, read_events(io.BytesIO(stream.getvalue()[:-1])))
+        with tempfile.TemporaryFile() as f:
+            f.write(b'\xff' + stream.getvalue())
+            f.seek(1)
+            self.assertEqual(list(read_events(f)), records)
+        games = [r for r in records if not isinstance(r, Event) and r[0] == GAME]
+        ends = [r for r in records if not isinstance(r, Event) and r[0] == END]
+        self.assertEqual([g[1] for g in games], list(range(5)))
+        self.assertEqual([e[1] for e in ends], list(range(5)))
+        self.assertEqual(sum(wins.values()), 5)
+        self.assertEqual(len(games[0][2]), 4)
+        self.assertEqual(len(games[0][3].coins), 4)
+
+        events = [r for r in records if isinstance(r, Event)]
+        self.assertTrue(events)
+        for e in events:
+            self.assertTrue(0 <= e.performer < 4)
+            if e.result == 'challenged':
+                self.assertIsNotNone(e.doubter)
+                self.assertIsNotNone(e.influence)
+                self.assertIsNotNone(e.doubter_is_correct)
+            self.assertEqual(e.victim is None, e.victim_coins is None)
+
+    def test_replay_seek(self):
+        import io, os, tempfile
+        from events import Event_Writer, Replayer
+        from simulations import run, sim_a_full_on_yomi, Yomi_Policy
+
+        every_turn = io.BytesIO()
+        writer = Event_Writer(every_turn, snapshot_every=1)
+        run(sim_a_full_on_yomi, 4, 3, seed=16, observer=writer)
+        writer.flush()
+        truth = Replayer(every_turn.getvalue())
+
+        path = tempfile.mktemp()
+        try:
+            with open(path, 'wb') as f, open(path + '.idx', 'wb') as idx:
+                writer = Event_Writer(f, snapshot_every=5)
+                run(sim_a_full_on_yomi, 4, 3, seed=16, observer=writer)
+                writer.flush()
+                writer.save_index(idx)
+            replayer = Replayer.open(path, path + '.idx')
+            self.assertEqual(list(replayer.keys), list(Replayer(replayer.data).keys))
+
+            for game in range(3):
+                self.assertEqual(replayer.personalities(game), truth.personalities(game))
+                last = max(k & 0xffff for k in truth.keys if k >> 16 == game)
+                for moves in (0, 3, 5, last):
+                    self.assertEqual(replayer.seek(game, moves, Yomi_Policy()).state,
+                                     truth.snapshot(game, moves)[1])
+                self.assertEqual(set(e.moves for e in replayer.events(game, 2, 4)), set([2, 3]))
+
+            self.assertRaises(ValueError, replayer.seek, 0, 3)
+            self.assertRaises(KeyError, replayer.seek, 3, 0)
+            replayer.data.close()
+        finally:
+            for p in (path, path + '.idx'):
+                if os.path.exists(p):
+                    os.remove(p)
+
+    def test_undo(self):
+        from random import Random
+        from heuristics import PERSONALITIES
+        from simulations import Yomi_Policy, Systemic_Doubts_Policy
+
+        def scores(game):
+            return [(p.judge_player, p.coins) for p in game.players]
+
+        for seed, policy in ((17, Yomi_Policy()), (18, Systemic_Doubts_Policy())):
+            testgame = Play_Coup(5, PERSONALITIES.keys(), Random(seed))
+            while 1:
+                before, judged = testgame.state, scores(testgame)
+                revealed = list(testgame.cards.revealed)
+                for _ in range(4):
+                    testgame.apply_turn(policy)
+                for _ in range(4):
+                    testgame.undo()
+                self.assertEqual(testgame.state, before)
+                self.assertEqual(scores(testgame), judged)
+                self.assertEqual(testgame.cards.revealed, revealed)
+                for p in testgame.players:
+                    self.assertIs(p.left.holder, p)
+                    self.assertIs(p.right.holder, p)
+                for card in testgame.court_deck:
+                    self.assertIsNone(card.holder)
+                if not testgame.step(policy):
+                    break
+
+        testgame = Play_Coup(3, rng=Random(19))
+        testgame.players[1].coins = 7
+        before = testgame.state
+        outcome = testgame.apply(testgame.players[0], 'exchange')
+        self.assertEqual(outcome.result, Outcome.SUCCEEDED)
+        outcome = testgame.apply(testgame.players[1], 'coup', testgame.players[0].left)
+        self.assertEqual(outcome.result, Outcome.SUCCEEDED)
+        self.assertNotEqual(testgame.state, before)
+        testgame.undo()
+        testgame.undo()
+        self.assertEqual(testgame.state, before)
+
+        first, second = testgame.players[:2]
+        testgame.push()
+        first.left, second.left = second.left, first.left
+        second.left.reveal()
+        testgame.undo()
+        self.assertEqual(testgame.state, before)
+        self.assertEqual(testgame.cards.revealed, [0] * len(INFLUENCES))
+
+    def test_search_persona(self):
+        from random import Random
+        from heuristics import PERSONALITIES
+        from search import Search_Persona, sim_search_against_yomi
+
+        testgame = Play_Coup(5, PERSONALITIES.keys(), Random(18))
+        searcher = Search_Persona.seat(testgame, 0, iterations=20)
+        searcher.coins = 3
+        before = testgame.state
+
+        action, victim = searcher.search(testgame)
+        self.assertEqual(testgame.state, before)
+        self.assertIn((action, victim), searcher.moves(testgame))
+        self.assertNotIn('coup', [a for a, _ in searcher.moves(testgame)])
+
+        searcher.coins = 10
+        self.assertEqual(set(a for a, _ in searcher.moves(testgame)), set(['coup']))
+        self.assertEqual(len(searcher.moves(testgame)), 4)
+
+        first = sim_search_against_yomi(4, Random(18), iterations=8)
+        second = sim_search_against_yomi(4, Random(18), iterations=8)
+        self.assertEqual(len(first), 1)
+        self.assertEqual(first.state, second.state)
+
+    def test_zobrist(self):
+        from random import Random
+        from heuristics import PERSONALITIES
+        from simulations import Systemic_Doubts_Policy
+        from transpositions import State_Hash
+
+        policy = Systemic_Doubts_Policy()
+        testgame = Play_Coup(4, PERSONALITIES.keys(), Random(19))
+        seen = {}
+        while 1:
+            key = testgame.zobrist
+            self.assertEqual(key, State_Hash(testgame).sync())
+            testgame.push()
+            testgame.step(policy)
+            testgame.undo()
+            self.assertEqual(testgame.zobrist, key)
+            seen.setdefault(key, testgame.snapshot())
+            if not testgame.step(policy):
+                break
+        self.assertEqual(len(seen), testgame.moves + 1)
+
+        copy = Play_Coup(4, rng=Random(20))
+        copy.restore(seen[key])
+        self.assertEqual(copy.zobrist, key)
+        copy.players[1].coins += 1
+        self.assertNotEqual(copy.zobrist, key)
+        copy.players[1].coins -= 1
+        copy.players[2].public_information['perform'].append('tax')
+        self.assertNotEqual(copy.zobrist, key)
+        copy.players[2].public_information['perform'].pop()
+        self.assertEqual(copy.zobrist, key)
+
+        log = copy.players[3].public_information['perform']
+        copy.players[3].public_information['perform'] = ['tax'] * len(log)
+        self.assertEqual(copy.zobrist, State_Hash(copy).sync())
+        copy.players[3].public_information['perform'] = log
+        self.assertEqual(copy.zobrist, key)
+
+    def test_transposition_table(self):
+        from transpositions import Transposition_Table
+
+        table = Transposition_Table(4)
+        self.assertEqual(table.size, 4)
+        table.put(1, 'deep', depth=5)
+        table.put(5, 'shallow', depth=1)
+        self.assertEqual(table.get(1), 'deep')
+        self.assertEqual(table.get(5), 'shallow')
+        table.put(9, 'newer', depth=0)
+        self.assertEqual(table.get(1), 'deep')
+        self.assertIsNone(table.get(5))
+        self.assertEqual(table.get(9), 'newer')
+        table.put(13, 'deeper', depth=6)
+        self.assertEqual(table.get(13), 'deeper')
+        self.assertEqual(table.get(1), 'deep')
+        self.assertIsNone(table.get(9))
+        table.put(1, 'updated', depth=0)
+        self.assertEqual(table.get(1), 'updated')
+        self.assertEqual(table.get(13), 'deeper')
+        self.assertEqual(len(table), 2)
+        self.assertEqual(table.stats['overwrites'], 2)
+        table.clear()
+        self.assertEqual(len(table), 0)
+
+        from random import Random
+        from search import Search_Persona
+        testgame = Play_Coup(3, rng=Random(19))
+        searcher = Search_Persona.seat(testgame, 0, iterations=10, table=table)
+        searcher.search(testgame)
+        searcher.search(testgame)
+        visits, totals = table.get(testgame.zobrist_for(searcher))
+        self.assertEqual(sum(visits), 20)
+
+        key, viewed = testgame.zobrist, testgame.zobrist_for(searcher)
+        other = testgame.players[1]
+        swap = [c for c in testgame.court_deck if c.CODE != other.left.CODE][0]
+        testgame.court_deck[testgame.court_deck.index(swap)] = other.left
+        other.hold('left', swap)
+        self.assertNotEqual(testgame.zobrist, key)
+        self.assertEqual(testgame.zobrist_for(searcher), viewed)
+        self.assertNotEqual(testgame.zobrist_for(other), testgame.zobrist_for(searcher))
+        searcher.search(testgame)
+        visits, totals = table.get(testgame.zobrist_for(searcher))
+        self.assertEqual(sum(visits), 30)
+
+        other.left.revealed = True
+        self.assertNotEqual(testgame.zobrist_for(searcher), viewed)
+
+    def test_compiled_rules(self):
+        from heuristics import Rules, PERSONALITIES
+
+        self.assertIsInstance(PERSONALITIES['obnoxious'], Rules)
+        p = AI_Persona()
+        p.left = Duke()
+        p.right = Contessa()
+        pp = AI_Persona()
+        pp.left = Captain()
+        pp.right = Assassin()
+
+        p.rules = {'honest_intervention': {'foreign_aid': {'performer': lambda a: a.coins > 2}},
+                   'calculated_intervention': {},
+                   'callout': {'min_actions': 0, 'min_inactions': 0, 'threshold': 5}}
+        self.assertIsInstance(p.rules, Rules)
+        self.assertIsNone(p.will_intervene('foreign_aid', pp))
+        pp.coins = 3
+        self.assertEqual(p.will_intervene('foreign_aid', pp), 'Duke')
+
+        p.rules['honest_intervention']['foreign_aid']['performer'] = lambda a: a.coins > 3
+        self.assertIsNone(p.will_intervene('foreign_aid', pp))
+        p.rules['honest_intervention']['foreign_aid'] = {'performer': None}
+        self.assertEqual(p.will_intervene('foreign_aid', pp), 'Duke')
+        p.rules['honest_intervention']['foreign_aid'] = {'bystander': lambda b: True}
+        self.assertIsNone(p.will_intervene('foreign_aid', pp))
+        p.rules['honest_intervention']['foreign_aid'] = {}
+        self.assertIsNone(p.will_intervene('foreign_aid', pp))
+        p.rules['calculated_intervention']['assassinate'] = {'victim': lambda v: v is p}
+        self.assertEqual(p.will_intervene('assassinate', pp, p), 'Contessa')
+        self.assertIsNone(p.will_intervene('assassinate', pp, pp))
+
+        pp.public_information['perform'].append('steal')
+        self.assertTrue(p.will_callout('steal', pp))
+        p.rules['callout']['threshold'] = -5
+        self.assertFalse(p.will_callout('steal', pp))
+        del p.rules['callout']['threshold']
+        self.assertFalse(p.will_callout('steal', pp))
+
+    def test_alive_seats(self):
+        from collections import Counter
+        from random import Random
+
+        testgame = Play_Coup(4, rng=Random(21))
+        p, pp, ppp, pppp = testgame.players
+        self.assertEqual(testgame.cards.alive, [0, 1, 2, 3])
+
+        pp.left.reveal()
+        pp.right.reveal()
+        self.assertEqual(testgame.cards.alive, [0, 2, 3])
+        self.assertEqual(len(testgame), 3)
+        pp.right.reveal(False)
+        self.assertEqual(len(testgame), 4)
+        pp.hold('right', Duke())
+        pp.hold('left', Captain())
+        self.assertEqual(len(testgame), 4)
+
+        first = Counter()
+        for _ in range(400):
+            order = list(testgame.remaining_players([p]))
+            self.assertEqual(sorted(order, key=testgame.players.index), [pp, ppp, pppp])
+            first[order[0]] += 1
+        self.assertTrue(all(first[x] > 90 for x in (pp, ppp, pppp)))
+
+        a = AI_Persona()
+        a.left = Contessa()
+        a.right = Contessa()
+        a.left.reveal()
+        a.right.reveal()
+        testgame.players[2] = a
+        self.assertIs(a.counter, testgame.cards)
+        self.assertEqual(testgame.cards.alive, [0, 1, 3])
+        self.assertEqual(testgame.cards.revealed[Contessa.CODE], 2)
+
+        testgame.players = [p, a]
+        self.assertIsInstance(testgame.players, Seats)
+        self.assertIs(testgame.winner, p)
+        self.assertIsNone(pp.counter)
+
+    def test_parallel_run(self):
+        from multiprocessing.pool import Pool
+        from simulations import run, sim_naive_actions_calculated_targets_selfish_blocks_no_doubts
+
+        sim = sim_naive_actions_calculated_targets_selfish_blocks_no_doubts
+        serial = run(sim, 4, 60, seed=22)
+        self.assertEqual(sum(serial.values()), 60)
+        self.assertEqual(run(sim, 4, 60, seed=22, processes=2, chunksize=7), serial)
+
+        pool = Pool(3)
+        try:
+            self.assertEqual(run(sim, 4, 60, seed=22, chunksize=25, pool=pool), serial)
+        finally:
+            pool.close()
+            pool.join()
+        self.assertRaises(ValueError, run, sim, 4, 10, 22, lambda outcome: None, 2)
+
+    def test_play_statistics(self):
+        import pickle
+        from play import Statistics, collect
+
+        whole = collect((4, 23, 0, 12))
+        merged = collect((4, 23, 0, 5)).merge(pickle.loads(pickle.dumps(collect((4, 23, 5, 12)))))
+        self.assertEqual(sum(whole.hands.values()), 12)
+        self.assertEqual(sum(whole.wins.values()), 12)
+        self.assertEqual(merged.report(), whole.report())
+        self.assertIn('EXCEPTIONS', whole.report())
+
+        statistics = Statistics()
+        outcome = Outcome(Outcome.CHALLENGED, 'tax', AI_Persona('passive'))
+        outcome.performer.left = Captain()
+        outcome.performer.right = Captain()
+        outcome.performer.public_information['perform'].extend(['tax'] * 200)
+        outcome.doubter = AI_Persona('obnoxious')
+        outcome.influence = 'Duke'
+        outcome.doubter_is_correct = True
+        statistics(outcome)
+        self.assertEqual(statistics.doubts_threshold_right['obnoxious'], {99: 1})
+        self.assertEqual(statistics.doubts_actions_right['tax'], {True: 1})
+
+    def test_running_anova(self):
+        import pickle
+        from random import Random
+        from anova import Running_Mean, Study, f_sf, studentized_range
+
+        self.assertAlmostEqual(f_sf(4.103, 2, 10), .05, places=4)
+        self.assertAlmostEqual(studentized_range(3, 10)(3.877), .05, places=4)
+        self.assertAlmostEqual(studentized_range(5, 20)(4.232), .05, places=4)
+
+        rng = Random(24)
+        samples = dict((h, [rng.randint(0, 10) + 3 * (h == 'c') for _ in range(20)]) for h in 'abc')
+        study = Study(['pair'])
+        for h, values in samples.items():
+            for v in values[:8]:
+                study.add(h, {'pair': v})
+        rest = Study(['pair'])
+        for h, values in samples.items():
+            for v in values[8:]:
+                rest.add(h, {'pair': v} if v else {})
+        study.merge(pickle.loads(pickle.dumps(rest)))
+
+        direct = Running_Mean()
+        for v in samples['a']:
+            direct.add(v)
+        group = study.groups[('pair', 'a')]
+        self.assertEqual(group.count, 20)
+        self.assertAlmostEqual(group.mean, direct.mean)
+        self.assertAlmostEqual(group.m2, direct.m2)
+        self.assertEqual(study.samples('b'), 20)
+
+        values = sum(samples.values(), [])
+        grand = sum(values) / 60.0
+        between = sum(20 * (sum(v) / 20.0 - grand) ** 2 for v in samples.values()) / 2
+        within = sum(sum((x - sum(v) / 20.0) ** 2 for x in v) for v in samples.values()) / 57
+        f, p = study.anova('pair')
+        self.assertAlmostEqual(f, between / within)
+        self.assertAlmostEqual(p, f_sf(between / within, 2, 57))
+
+        rows = study.tukey('pair')
+        self.assertEqual([r[:2] for r in rows], [('a', 'b'), ('a', 'c'), ('b', 'c')])
+        for first, second, difference, p, lower, upper, reject in rows:
+            self.assertAlmostEqual(difference, sum(samples[second]) / 20.0 - sum(samples[first]) / 20.0)
+            self.assertTrue(lower < difference < upper)
+            self.assertEqual(reject, p <= .05)
+            self.assertEqual(reject, not lower <= 0 <= upper)
+
+    def test_sequential_study(self):
+        from random import Random
+        from anova import Sequential_Study
+
+        rng = Random(25)
+        heuristics = ['steady', 'noisy', 'better']
+        study = Sequential_Study(['apart', 'alike'], confidence=.99, tolerance=3.0, stable=2, minimum=4)
+
+        def sample(h):
+            spread = 3 if h == 'noisy' else 1
+            return {'apart': rng.gauss(10 + 5 * (h == 'better'), spread), 'alike': rng.gauss(10, 1)}
+
+        picked = [study.next_heuristic(heuristics) for _ in range(12)]
+        self.assertEqual(sorted(picked), sorted(heuristics * 4))
+        self.assertFalse(study.decide(heuristics))
+        for h in picked:
+            study.add(h, sample(h))
+        self.assertEqual(study.pending, {'steady': 0, 'noisy': 0, 'better': 0})
+
+        self.assertEqual(study.next_heuristic(heuristics), 'noisy')
+        study.add('noisy', sample('noisy'))
+
+        samples = 13
+        while not study.decide(heuristics):
+            for _ in range(3):
+                h = study.next_heuristic(heuristics)
+                study.add(h, sample(h))
+                samples += 1
+            self.assertTrue(samples < 100)
+        self.assertEqual(study.decided, {'apart': 'REJECT', 'alike': 'NULL'})
+        self.assertTrue(study.samples('noisy') > study.samples('steady'))
+
+    def test_sequential_oversubscribed(self):
+        from multiprocessing.pool import ThreadPool
+        from anova import Sequential_Study
+        import simulations
+        import stats
+
+        study = Sequential_Study(['pair'], minimum=4)
+        heuristics = ['a', 'b', 'c']
+        picked = [study.next_heuristic(heuristics) for _ in range(40)]
+        self.assertEqual(sorted(set(picked)), heuristics)
+        study.add('a', {'pair': 1})
+        study.add('a', {'pair': 2})
+        self.assertNotEqual(study.next_heuristic(heuristics), 'a')
+
+        self.assertAlmostEqual(study.alpha, .01 / 2)
+        study.looks = 9
+        self.assertAlmostEqual(study.alpha, .01 / 90)
+
+        def broken(players, rng=None, observer=None):
+            raise ValueError('broken heuristic')
+
+        sims = [simulations.sim_random_actions_random_targets_no_blocking,
+                simulations.sim_random_actions_random_targets_selfish_blocks_no_doubts]
+        games = stats.GAMES_PER_SAMPLE
+        pool = ThreadPool(4)
+        try:
+            stats.GAMES_PER_SAMPLE = 5
+            study = stats.sequential(sims, pool, budget=30, outstanding=40)
+            self.assertEqual(sum(study.samples(s.__name__) for s in sims), 30)
+            self.assertEqual(sum(study.pending.values()), 0)
+
+            self.assertRaises(ValueError, stats.sequential, sims + [broken], pool, budget=12, outstanding=12)
+        finally:
+            stats.GAMES_PER_SAMPLE = games
+            pool.terminate()
+            pool.join()
+
+    def test_selfish_blocks(self):
+        from simulations import Selfish_Blocks_Policy
+
+        class Scripted(Selfish_Blocks_Policy):
+            def select_action(self, turn):
+                return self.action
+
+            def target(self, turn, action):
+                return turn.game.players[1]
+
+        policy = Scripted()
+        testgame = Play_Coup(3)
+        p, pp, ppp = testgame.players
+        p.left, p.right = Assassin(), Duke()
+        pp.left, pp.right = Contessa(), Duke()
+        ppp.left, ppp.right = Captain(), Ambassador()
+
+        policy.action = 'assassinate'
+        outcome = testgame.play_turn(p, policy)
+        self.assertEqual(outcome.result, Outcome.BLOCKED)
+        self.assertEqual(p.coins, -1)
+        self.assertEqual(Game_State.from_bytes(testgame.state.to_bytes()), testgame.state)
+
+        p.coins = 2
+        policy.action = 'steal'
+        outcome = testgame.play_turn(p, policy)
+        self.assertEqual(outcome.result, Outcome.SUCCEEDED)
+        self.assertEqual((p.coins, pp.coins), (4, 0))
+
+        policy.checks_legality_first = True
+        policy.action = 'assassinate'
+        outcome = testgame.play_turn(p, policy)
+        self.assertEqual(outcome.result, Outcome.BLOCKED)
+        self.assertEqual(p.coins, 1)
+
+    def test_undoubted_exchange(self):
+        from random import Random
+        from heuristics import PERSONALITIES
+        from simulations import Systemic_Doubts_Policy, Yomi_Policy
+
+        class Exchanging(Systemic_Doubts_Policy):
+            def select_action(self, turn):
+                return 'exchange'
+
+            def doubter(self, turn, action):
+                return None
+
+        class Yomi_Exchanging(Exchanging, Yomi_Policy):
+            pass
+
+        testgame = Play_Coup(3, PERSONALITIES.keys(), Random(20))
+        p = testgame.players[0]
+        before = testgame.state
+        outcome = testgame.play_turn(p, Exchanging())
+        self.assertEqual(outcome.result, Outcome.LAPSED)
+        self.assertEqual(testgame.state, before)
+        self.assertEqual(p.public_information['perform'], [])
+
+        outcome = testgame.play_turn(p, Yomi_Exchanging())
+        self.assertEqual(outcome.result, Outcome.SUCCEEDED)
+        self.assertEqual(p.public_information['perform'], ['exchange'])
+
+    def test_inaction_after_steal(self):
+        from random import Random
+        from heuristics import PERSONALITIES
+        from simulations import Systemic_Doubts_Policy, Yomi_Policy
+
+        class Stealing(object):
+            saves = False
+
+            def select_action(self, turn):
+                return 'steal'
+
+            def target(self, turn, action):
+                return turn.game.players[1]
+
+            def rethink(self, turn, action, victim):
+                return False
+
+            def victim_blocks(self, turn, action, victim):
+                return False
+
+            def savior(self, turn, action, victim):
+                if self.saves:
+                    return turn.game.players[2]
+
+            def doubter(self, turn, action):
+                return None
+
+        class Systemic_Stealing(Stealing, Systemic_Doubts_Policy):
+            pass
+
+        class Yomi_Stealing(Stealing, Yomi_Policy):
+            pass
+
+        def noted(game):
+            return [p.didnt_block_as['spectator'].count('steal') for p in game.players]
+
+        testgame = Play_Coup(4, PERSONALITIES.keys(), Random(21))
+        p = testgame.players[0]
+        p.coins = 0
+        testgame.play_turn(p, Yomi_Stealing())
+        self.assertEqual(noted(testgame), [0, 1, 1, 1])
+        testgame.play_turn(p, Systemic_Stealing())
+        self.assertEqual(noted(testgame)[:2], [0, 2])
+        self.assertEqual(sum(noted(testgame)[2:]), 3)
+
+        for policy, added in ((Systemic_Stealing(), [0, 0, 0, 0]), (Yomi_Stealing(), [0, 0, 0, 1])):
+            policy.saves = True
+            before = noted(testgame)
+            testgame.play_turn(p, policy)
+            self.assertEqual([n - b for n, b in zip(noted(testgame), before)], added)
+
+    def test_alive_direct_writes(self):
+        from random import Random
+
+        testgame = Play_Coup(2, rng=Random(22))
+        p, pp = testgame.players
+        self.assertEqual(len(testgame), 2)
+        p.left = Duke()
+        p.right = Duke()
+        p.left.reveal()
+        p.right.reveal()
+        self.assertEqual(p.influence_remaining, 0)
+        self.assertEqual(len(testgame), 1)
+        self.assertIs(testgame.winner, pp)
+
+        testgame = Play_Coup(3, rng=Random(22))
+        a, b, c = testgame.players
+        self.assertEqual(len(testgame), 3)
+        b.left.revealed = b.right.revealed = True
+        self.assertEqual(testgame.cards.alive, [0, 2])
+        self.assertEqual(sorted(testgame.remaining_players([a]), key=testgame.players.index), [c])
+        b.right.revealed = False
+        self.assertEqual(len(testgame), 3)
+        self.assertIsNone(testgame.winner)
+
+    def test_card_counter_direct_writes(self):
+        from random import Random
+
+        testgame = Play_Coup(3, rng=Random(23))
+        p, pp, ppp = testgame.players
+        counter = testgame.cards
+        self.assertEqual(counter.revealed, [0] * len(INFLUENCES))
+
+        p.left = Contessa()
+        p.left.revealed = True
+        ppp.right.revealed = True
+        self.assertEqual(counter.revealed[Contessa.CODE], 1 + (type(ppp.right) is Contessa))
+        self.assertEqual(sum(counter.revealed), 2)
+        matrix = counter.matrix(pp)
+        counter.recount()
+        self.assertEqual(counter.matrix(pp), matrix)
+
+        p.left = Duke()
+        ppp.right.revealed = False
+        self.assertEqual(counter.revealed, [0] * len(INFLUENCES))
+
 def gameplay_suite():
     suite = unittest.TestSuite()
     gameplay_tests = list(m for m in dir(TestCoup) \
@@ -0,0 +1,232 @@
+"""
+Python scripts to simulate the game "The Resistance: Coup designed by Rikki Tahta
+The purpose of this project is to model human personalities and predict/score
+behaviors and bluffs in order to win the game.
+
+Zobrist hashing of Play_Coup positions and a fixed-size transposition
+table keyed by it.  Every feature of a position (a card in a seat's
+slot, revealed or not; a seat's coins; the seat to move; how often each
+action appears in each of a seat's suspicion logs) owns a random 64-bit
+key, and a position hashes to the XOR of its features' keys.  Changing
+one feature is then two XORs, whatever the size of the game.
+State_Hash.viewed_by() masks the cards one seat cannot see, so that
+positions a player cannot tell apart share a key.
+
+"""
+
+__author__ = "William Dizon"
+__license__ = "GNU GPL v3.0"
+__version__ = "0.0.1"
+__email__ = "wdchromium@gmail.com"
+
+from coup import Player, Game_State, INFLUENCES
+
+MAX_SEATS = 6
+MAX_COINS = 63 #more coins hash as this many, and debts as none
+MAX_COUNT = 63 #likewise for repeats of one action in one log
+ACTION_INDEX = dict((a, i) for i, a in enumerate(Game_State.LOGGED_ACTIONS))
+
+class Zobrist_Keys(object):
+    """the random key of every feature, drawn once from a fixed seed"""
+    __slots__ = ('cards', 'coins', 'turn', 'logs', 'hidden')
+
+    def __init__(self, seed=0x2013c0):
+        from random import Random
+        draw = Random(seed).getrandbits
+
+        self.cards = [draw(64) for _ in range(MAX_SEATS * 2 * len(INFLUENCES) * 2)]
+        self.coins = [draw(64) for _ in range(MAX_SEATS * (MAX_COINS + 1))]
+        self.turn = [draw(64) for _ in range(MAX_SEATS)]
+        self.logs = [0 if count == 0 else draw(64) \
+                     for _ in range(MAX_SEATS * len(Player.SUSPICION_LOGS) * len(ACTION_INDEX)) \
+                     for count in range(MAX_COUNT + 1)]
+        self.hidden = [draw(64) for _ in range(MAX_SEATS * 2)]
+
+    def card(self, seat, slot, card):
+        return self.cards[((seat * 2 + slot) * len(INFLUENCES) + card.CODE) * 2 + bool(card.revealed)]
+
+    def coin(self, seat, coins):
+        return self.coins[seat * (MAX_COINS + 1) + max(0, min(coins, MAX_COINS))]
+
+    def log(self, seat, idx, action, count):
+        row = (seat * len(Player.SUSPICION_LOGS) + idx) * len(ACTION_INDEX) + action
+        return self.logs[row * (MAX_COUNT + 1) + min(count, MAX_COUNT)]
+
+class State_Hash(object):
+    """
+    Zobrist hash of one game, brought up to date by sync().
+
+    The engine, and tests, change coins and logs by plain assignment and
+    append, so rather than hook every write, sync() compares each seat's
+    few cached features with the game and XORs in only those that moved:
+    cards and coins by value, logs by the entries appended since (or from
+    scratch once Player._edits shows one was rewritten, or a log is no
+    longer the list it was or has shrunk in place).
+    """
+    __slots__ = ('game', 'value', '_turn', '_seats')
+
+    KEYS = None
+
+    def __init__(self, game):
+        if State_Hash.KEYS is None:
+            State_Hash.KEYS = Zobrist_Keys()
+        self.game = game
+        self.value = 0
+        self._turn = None
+        self._seats = []
+
+    def _logs(self, seat, p):
+        """counts of each action per log, each log with its length, and their combined key"""
+        keys = self.KEYS
+        counts, lengths, value = [], [], 0
+        for idx, (attr, key) in enumerate(Player.SUSPICION_LOGS):
+            log = getattr(p, attr)[key]
+            lengths.append((log, len(log)))
+            tally = [0] * len(ACTION_INDEX)
+            for action in log:
+                if action in ACTION_INDEX:
+                    tally[ACTION_INDEX[action]] += 1
+            for action, count in enumerate(tally):
+                value ^= keys.log(seat, idx, action, count)
+            counts.append(tally)
+        return counts, lengths, value
+
+    def _seat(self, seat, p):
+        keys = self.KEYS
+        counts, lengths, logs = self._logs(seat, p)
+        cached = [p, keys.card(seat, 0, p.left), keys.card(seat, 1, p.right),
+                  keys.coin(seat, p.coins), p._edits, lengths, counts, logs]
+        return cached, cached[1] ^ cached[2] ^ cached[3] ^ logs
+
+    def sync(self):
+        keys = self.KEYS
+        value = self.value
+        turn = self.game.turn
+        if turn != self._turn:
+            if self._turn is not None:
+                value ^= keys.turn[self._turn]
+            value ^= keys.turn[turn]
+            self._turn = turn
+
+        for seat, p in enumerate(self.game.players):
+            if seat == len(self._seats):
+                self._seats.append(None)
+            cached = self._seats[seat]
+            if cached is None or cached[0] is not p:
+                if cached is not None:
+                    value ^= cached[1] ^ cached[2] ^ cached[3] ^ cached[7]
+                self._seats[seat], seat_value = self._seat(seat, p)
+                value ^= seat_value
+                continue
+
+            for slot, card in ((0, p.left), (1, p.right)):
+                key = keys.card(seat, slot, card)
+                if key != cached[1 + slot]:
+                    value ^= cached[1 + slot] ^ key
+                    cached[1 + slot] = key
+
+            key = keys.coin(seat, p.coins)
+            if key != cached[3]:
+                value ^= cached[3] ^ key
+                cached[3] = key
+
+            if p._edits != cached[4]:
+                value ^= cached[7]
+                cached[6], cached[5], cached[7] = self._logs(seat, p)
+                cached[4] = p._edits
+                value ^= cached[7]
+                continue
+
+            lengths, counts = cached[5], cached[6]
+            logs = [getattr(p, attr)[name] for attr, name in Player.SUSPICION_LOGS]
+            if any(log is not known or len(log) < length for log, (known, length) in zip(logs, lengths)):
+                value ^= cached[7]
+                cached[6], cached[5], cached[7] = self._logs(seat, p)
+                value ^= cached[7]
+                continue
+
+            for idx, log in enumerate(logs):
+                if len(log) == lengths[idx][1]:
+                    continue
+                tally = counts[idx]
+                for action in log[lengths[idx][1]:]:
+                    if action in ACTION_INDEX:
+                        a = ACTION_INDEX[action]
+                        change = keys.log(seat, idx, a, tally[a]) ^ keys.log(seat, idx, a, tally[a] + 1)
+                        tally[a] += 1
+                        cached[7] ^= change
+                        value ^= change
+                lengths[idx] = (log, len(log))
+
+        self.value = value
+        return value
+
+    def viewed_by(self, viewer):
+        """the hash as seat viewer sees it: every other seat's unrevealed cards hash by slot alone"""
+        keys = self.KEYS
+        value = self.sync()
+        for seat, cached in enumerate(self._seats[:len(self.game.players)]):
+            if seat == viewer:
+                continue
+            p = cached[0]
+            for slot, card in ((0, p.left), (1, p.right)):
+                if not card.revealed:
+                    value ^= cached[1 + slot] ^ keys.hidden[seat * 2 + slot]
+        return value
+
+class Transposition_Table(object):
+    """
+    Fixed-size table of values keyed by 64-bit hashes such as
+    Play_Coup.zobrist.  Each key maps to a bucket of two entries: the
+    first keeps whichever entry came from the deepest search, the second
+    always takes the newest, so shallow entries cannot evict deep ones.
+    hits, misses, stores and overwrites count since the last clear().
+    """
+    __slots__ = ('size', 'keys', 'values', 'depths', 'hits', 'misses', 'stores', 'overwrites')
+
+    def __init__(self, size=1 << 16):
+        self.size = 1 << max(size - 1, 1).bit_length() #buckets, rounded up to a power of two
+        self.clear()
+
+    def clear(self):
+        self.keys = [None] * (self.size * 2)
+        self.values = [None] * (self.size * 2)
+        self.depths = [-1] * (self.size * 2)
+        self.hits = self.misses = self.stores = self.overwrites = 0
+
+    def get(self, key, default=None):
+        slot = (key & (self.size - 1)) * 2
+        if self.keys[slot] == key:
+            self.hits += 1
+            return self.values[slot]
+        elif self.keys[slot + 1] == key:
+            self.hits += 1
+            return self.values[slot + 1]
+        self.misses += 1
+        return default
+
+    def put(self, key, value, depth=0):
+        keys, values, depths = self.keys, self.values, self.depths
+        slot = (key & (self.size - 1)) * 2
+        if keys[slot + 1] == key:
+            keys[slot + 1], values[slot + 1], depths[slot + 1] = None, None, -1
+
+        if keys[slot] == key or depth >= depths[slot]:
+            if keys[slot] is not None and keys[slot] != key:
+                if keys[slot + 1] is not None:
+                    self.overwrites += 1
+                keys[slot + 1], values[slot + 1], depths[slot + 1] = keys[slot], values[slot], depths[slot]
+        else:
+            slot += 1
+            if keys[slot] is not None:
+                self.overwrites += 1
+        keys[slot], values[slot], depths[slot] = key, value, depth
+        self.stores += 1
+
+    def __len__(self):
+        return sum(1 for k in self.keys if k is not None)
+
+    @property
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'stores': self.stores,
+                'overwrites': self.overwrites, 'size': len(self), 'maxsize': self.size * 2}